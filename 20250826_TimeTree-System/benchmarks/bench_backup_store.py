@@ -0,0 +1,95 @@
+"""エクスポート履歴の保存サイズと時間
+
+大きなカレンダーを --days 日分、毎日 --changes 件の予定を変更して（DTSTAMP は
+毎回すべて変わる）バックアップ履歴に保存し、次の保存サイズを比べる。
+
+- copies : 毎日ICSをそのままコピーした場合
+- gzip   : 毎日ICSを gzip して保存した場合
+- history: BackupStore（予定ごとに重複を除いて圧縮）
+
+あわせて1日分の保存時間と、最も古い日の復元時間を表示する。
+
+    python benchmarks/bench_backup_store.py --events 10000 100000 --days 30 --changes 20
+"""
+
+import argparse
+import gzip
+import random
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from loguru import logger  # noqa: E402
+
+from bench_suite import START_DATE  # noqa: E402
+from ics_generator import generate_ics  # noqa: E402
+from timetree_notifier.core.backup_store import BackupStore  # noqa: E402
+
+
+_DTSTAMP = re.compile(rb"DTSTAMP:\d{8}T\d{6}Z")
+
+
+def daily_exports(source: Path, workdir: Path, days: int, changes: int, events: int):
+    """1日ごとに changes 件の予定タイトルを変え、DTSTAMP を更新したエクスポートを順に作る"""
+    rng = random.Random(0)
+    data = source.read_bytes()
+    output = workdir / "export.ics"
+    for day in range(days):
+        for i in rng.sample(range(events), changes):
+            data = re.sub(rb"SUMMARY:([^\r\n]*) %d\r\n" % i, rb"SUMMARY:\1 %d+\r\n" % i, data, count=1)
+        data = _DTSTAMP.sub(b"DTSTAMP:20250901T%02d0000Z" % (day % 24), data)
+        output.write_bytes(data)
+        yield output, data
+
+
+def run(events: int, days: int, changes: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        source = generate_ics(workdir / "source.ics", events, start_date=START_DATE, days=365,
+                              recurring_ratio=0.02, all_day_ratio=0.1, description_size=40)
+        store = BackupStore(workdir / "history.sqlite3")
+        copies = gzipped = 0
+        save_times = []
+        first = None
+        for export, data in daily_exports(source, workdir, days, changes, events):
+            copies += len(data)
+            gzipped += len(gzip.compress(data))
+            started = time.perf_counter()
+            snapshot = store.save("bench", export)
+            save_times.append(time.perf_counter() - started)
+            first = first or (snapshot.id, data)
+
+        started = time.perf_counter()
+        if store.read(first[0]) != first[1]:
+            raise SystemExit("Restored export differs from the original")
+        restore = time.perf_counter() - started
+
+        stats = store.stats()
+        on_disk = (workdir / "history.sqlite3").stat().st_size
+        return copies, gzipped, stats["stored_bytes"], on_disk, save_times, restore
+
+
+def main():
+    parser = argparse.ArgumentParser(description="バックアップ履歴 ベンチマーク")
+    parser.add_argument("--events", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--changes", type=int, default=20, help="1日に変更する予定の数")
+    args = parser.parse_args()
+
+    logger.remove()
+    print(f"{'events':>7} | {'copies MiB':>10} | {'gzip MiB':>8} | {'history MiB':>11} | {'db file MiB':>11} | "
+          f"{'1st save s':>10} | {'next save s':>11} | {'restore s':>9}")
+    for count in args.events:
+        copies, gzipped, stored, on_disk, save_times, restore = run(count, args.days, args.changes)
+        later = sorted(save_times[1:])[len(save_times[1:]) // 2] if len(save_times) > 1 else 0.0
+        mib = 1024 * 1024
+        print(f"{count:>7} | {copies / mib:>10.1f} | {gzipped / mib:>8.1f} | {stored / mib:>11.2f} | "
+              f"{on_disk / mib:>11.2f} | {save_times[0]:>10.2f} | {later:>11.3f} | {restore:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
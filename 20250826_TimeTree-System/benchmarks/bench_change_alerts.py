@@ -0,0 +1,93 @@
+"""予定変更の確認1回あたりの時間
+
+大きなカレンダーについて、変更の確認（poll）1回の時間を次の場合で表示する。
+エクスポート（擬似エクスポーターのファイルコピー）の時間を含む。
+
+- unchanged: エクスポートの内容が前回と同じ（ハッシュの比較だけ）
+- changed  : --changes 件の予定を変更（変わったVEVENTだけを取り込み、期間内の予定を比べる）
+- rebuild  : 参考として、同じエクスポートを全件解析し直した場合のインデックス作成時間
+
+    python benchmarks/bench_change_alerts.py --events 10000 100000 --changes 10
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from loguru import logger  # noqa: E402
+
+from bench_suite import START_DATE, TARGET_DATE, build_config  # noqa: E402
+from ics_generator import generate_ics  # noqa: E402
+from timetree_notifier.core.change_alerts import ChangeAlertNotifier  # noqa: E402
+from timetree_notifier.core.daily_notifier import DailySummaryNotifier  # noqa: E402
+from timetree_notifier.core.event_index import EventIndex  # noqa: E402
+
+
+def edit_titles(ics_file: Path, round_no: int, changes: int):
+    """先頭 changes 件の予定タイトルを書き換える（round_no ごとに違う内容にする）"""
+    with open(ics_file, encoding="utf-8", newline="") as f:
+        text = f.read()
+    for i in range(changes):
+        start = text.index(f"UID:bench-{i}@timetree")
+        line = text.index("SUMMARY:", start)
+        end = text.index("\r\n", line)
+        text = text[:line] + f"SUMMARY:予定 {i} 変更{round_no}" + text[end:]
+    ics_file.write_text(text, encoding="utf-8", newline="")
+
+
+async def run(ics_file: Path, workdir: Path, changes: int, repeat: int):
+    config = build_config(workdir, ics_file, "http://127.0.0.1:9", 1)
+    notifier = DailySummaryNotifier(config)
+    alerts = ChangeAlertNotifier(notifier)
+    try:
+        await alerts.poll(TARGET_DATE)
+
+        unchanged = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            await alerts.poll(TARGET_DATE)
+            unchanged = min(unchanged, time.perf_counter() - started)
+
+        changed = float("inf")
+        found = 0
+        for round_no in range(repeat):
+            edit_titles(ics_file, round_no, changes)
+            started = time.perf_counter()
+            found = len(await alerts.poll(TARGET_DATE))
+            changed = min(changed, time.perf_counter() - started)
+        alerts._pending.clear()
+        return unchanged, changed, found
+    finally:
+        await alerts.close()
+        await notifier.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="予定変更の確認 ベンチマーク")
+    parser.add_argument("--events", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--changes", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    logger.remove()
+    print(f"{'events':>7} | {'unchanged ms':>12} | {'changed ms':>10} | {'rebuild ms':>10} | {'alerts':>6}")
+    for count in args.events:
+        with tempfile.TemporaryDirectory() as tmp:
+            ics_file = generate_ics(Path(tmp) / "bench.ics", count, start_date=START_DATE, days=365,
+                                    recurring_ratio=0.02, all_day_ratio=0.1, description_size=40)
+            unchanged, changed, found = asyncio.run(run(ics_file, Path(tmp), args.changes, args.repeat))
+
+            started = time.perf_counter()
+            EventIndex(Path(tmp) / "rebuild.sqlite3", "Asia/Tokyo").rebuild(ics_file)
+            rebuild = time.perf_counter() - started
+        print(f"{count:>7} | {unchanged * 1000:>12.1f} | {changed * 1000:>10.1f} | {rebuild * 1000:>10.1f} | "
+              f"{found:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""エクスポート内容が変わらない場合の送信内容の生成時間
+
+同じICSを続けてエクスポートした場合（毎朝の大半・手動での再実行）について、
+次の場合の _prepare_deliveries の時間を表示する。
+
+- cold    : 初回（インデックス作成を含む）
+- reingest: 取り込み済みの内容を確認しない場合（インデックスの差分確認・抽出・生成を行う）
+- restart : 別プロセスで同じ日（手動での再実行。インデックスの取り込みを省略）
+- next day: 別プロセスで翌日（毎朝の実行。インデックスの取り込みを省略）
+- cached  : 常駐中の同じ日の再実行（メモリ上のキャッシュで解析・抽出・生成を省略）
+
+    python benchmarks/bench_content_cache.py --events 10000 100000
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from loguru import logger  # noqa: E402
+
+from bench_suite import START_DATE, TARGET_DATE, build_config  # noqa: E402
+from ics_generator import generate_ics  # noqa: E402
+from timetree_notifier.core.daily_notifier import DailySummaryNotifier  # noqa: E402
+
+
+async def prepare(notifier: DailySummaryNotifier, export_results, target_date):
+    send_at = datetime.combine(target_date, datetime.min.time())
+    started = time.perf_counter()
+    deliveries = await notifier._prepare_deliveries(export_results, target_date, send_at)
+    return time.perf_counter() - started, [d.messages for d in deliveries]
+
+
+async def run(ics_file: Path, workdir: Path, repeat: int):
+    config = build_config(workdir, ics_file, "http://127.0.0.1:9", 1)
+    notifier = DailySummaryNotifier(config)
+    try:
+        export_results = await notifier.export_pool.export_all()
+        cold, expected = await prepare(notifier, export_results, TARGET_DATE)
+
+        cached = float("inf")
+        for _ in range(repeat):
+            elapsed, messages = await prepare(notifier, export_results, TARGET_DATE)
+            cached = min(cached, elapsed)
+            if messages != expected:
+                raise SystemExit("Cached deliveries differ from the freshly rendered ones")
+    finally:
+        await notifier.close()
+
+    async def fresh(target_date, reingest: bool = False):
+        """新しいプロセスを模して、キャッシュのない notifier で生成する"""
+        best, messages = float("inf"), None
+        for _ in range(repeat):
+            notifier = DailySummaryNotifier(config)
+            if reingest:
+                notifier._index_hashes = {name: None for name in export_results}
+            try:
+                elapsed, messages = await prepare(notifier, export_results, target_date)
+            finally:
+                await notifier.close()
+            best = min(best, elapsed)
+        return best, messages
+
+    reingest, _ = await fresh(TARGET_DATE, reingest=True)
+    restart, messages = await fresh(TARGET_DATE)
+    if messages != expected:
+        raise SystemExit("Deliveries after a restart differ from the freshly rendered ones")
+    next_day, _ = await fresh(TARGET_DATE + timedelta(days=1))
+    return cold, reingest, restart, next_day, cached
+
+
+def main():
+    parser = argparse.ArgumentParser(description="内容ハッシュのキャッシュ ベンチマーク")
+    parser.add_argument("--events", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    logger.remove()
+    print(f"{'events':>7} | {'cold ms':>8} | {'reingest ms':>11} | {'restart ms':>10} | {'next day ms':>11} | "
+          f"{'cached ms':>9}")
+    for count in args.events:
+        with tempfile.TemporaryDirectory() as tmp:
+            ics_file = generate_ics(Path(tmp) / "bench.ics", count, start_date=START_DATE, days=365,
+                                    recurring_ratio=0.02, all_day_ratio=0.1, description_size=40)
+            cold, reingest, restart, next_day, cached = asyncio.run(run(ics_file, Path(tmp), args.repeat))
+        print(f"{count:>7} | {cold * 1000:>8.1f} | {reingest * 1000:>11.1f} | {restart * 1000:>10.1f} | "
+              f"{next_day * 1000:>11.1f} | {cached * 1000:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
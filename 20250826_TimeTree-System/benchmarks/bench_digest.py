@@ -0,0 +1,80 @@
+"""週間・月間まとめの生成時間の比較
+
+同じICSから期間の日数を変えてまとめを生成し、1回の問い合わせと日ごとの振り分けで
+作る send_digest の方式と、1日ずつ抽出・生成を繰り返す方式の処理時間
+（インデックス更新後の抽出・メッセージ生成）を表示する。
+どちらの方式でも日ごとの予定が一致することも確認する。
+
+    python benchmarks/bench_digest.py --events 50000 --days 1 7 30
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from loguru import logger  # noqa: E402
+
+from bench_suite import START_DATE, TARGET_DATE, build_config  # noqa: E402
+from ics_generator import generate_ics  # noqa: E402
+from timetree_notifier.config.settings import DigestConfig  # noqa: E402
+from timetree_notifier.core.daily_notifier import DailySummaryNotifier, _merge_events  # noqa: E402
+
+
+async def run(ics_file: Path, workdir: Path, days_list, repeat: int):
+    notifier = DailySummaryNotifier(build_config(workdir, ics_file, "http://127.0.0.1:9", 1))
+    send_at = datetime.combine(TARGET_DATE, datetime.min.time())
+    try:
+        export_results = await notifier.export_pool.export_all()
+        # 初回のインデックス構築は計測に含めない
+        await notifier._prepare_deliveries(export_results, TARGET_DATE, send_at)
+        account = next(iter(notifier.event_indexes))
+
+        print(f"{'days':>5} | {'events':>7} | {'digest ms':>9} | {'per-day ms':>10}")
+        for days in days_list:
+            digest = DigestConfig(name="bench", days=days)
+            best = float("inf")
+            for _ in range(repeat):
+                started = time.perf_counter()
+                batch = _merge_events([notifier._extract_today_events(account, ics_file, TARGET_DATE, days)])
+                notifier._generate_digest(digest, TARGET_DATE, batch, send_at)
+                best = min(best, time.perf_counter() - started)
+
+            # 1日ずつ抽出・生成する場合
+            started = time.perf_counter()
+            per_day = []
+            for offset in range(days):
+                day = TARGET_DATE + timedelta(days=offset)
+                events = _merge_events([notifier._extract_today_events(account, ics_file, day)])
+                notifier._generate_daily_summary(day, events, send_at)
+                per_day.append(events.to_events())
+            per_day_time = time.perf_counter() - started
+
+            if [day.to_events() for day in batch.split_days(TARGET_DATE, days)] != per_day:
+                raise SystemExit(f"Digest days differ from per-day extraction ({days} days)")
+            print(f"{days:>5} | {len(batch):>7} | {best * 1000:>9.1f} | {per_day_time * 1000:>10.1f}")
+    finally:
+        await notifier.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="週間・月間まとめ ベンチマーク")
+    parser.add_argument("--events", type=int, default=50000)
+    parser.add_argument("--days", type=int, nargs="+", default=[1, 7, 30])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    logger.remove()
+    with tempfile.TemporaryDirectory() as tmp:
+        ics_file = generate_ics(Path(tmp) / "bench.ics", args.events, start_date=START_DATE, days=365,
+                                recurring_ratio=0.02, all_day_ratio=0.1, description_size=40)
+        asyncio.run(run(ics_file, Path(tmp), args.days, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""予定の保持形式ごとのメモリ量・並べ替え時間の比較
+
+以前の dataclass 版 Event のリスト、__slots__ 版 Event のリスト、EventBatch の
+それぞれで同じ予定を保持し、1件あたりのメモリ量（tracemalloc）と
+時刻順の並べ替え・日付での絞り込みの時間を表示する。並べ替え結果が
+3形式で一致することも確認する。
+
+    python benchmarks/bench_event_batch.py --events 200000
+"""
+
+import argparse
+import gc
+import random
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from timetree_notifier.core.daily_notifier import _event_sort_key  # noqa: E402
+from timetree_notifier.core.event_batch import EventBatch  # noqa: E402
+from timetree_notifier.core.models import Event  # noqa: E402
+
+
+@dataclass
+class LegacyEvent:
+    """__slots__ 導入前の Event（比較用）"""
+    title: str
+    start_time: datetime
+    end_time: Optional[datetime] = None
+    description: str = ""
+    location: str = ""
+
+
+TITLES = ["定例会議", "1on1", "ランチ", "通院", "歯医者", "買い物", "ジム", "打ち合わせ", "出張", "誕生日"]
+LOCATIONS = ["", "", "", "会議室A", "会議室B", "渋谷", "オンライン"]
+
+
+def iter_rows(count: int, seed: int, description_size: int, days: int):
+    """予定の元データ（タイトル・場所は実データのように繰り返す）
+
+    生成するたびに新しいオブジェクトを作るので、保持形式ごとのメモリ量に
+    文字列・日時オブジェクトの分も含めて比較できる。
+    """
+    rnd = random.Random(seed)
+    tz = ZoneInfo("Asia/Tokyo")
+    start_date = date(2025, 1, 1)
+    for i in range(count):
+        day = start_date + timedelta(days=rnd.randrange(days))
+        if rnd.random() < 0.1:
+            start, end = day, day + timedelta(days=1)
+        else:
+            start = datetime(day.year, day.month, day.day, rnd.randrange(24), rnd.choice((0, 15, 30, 45)), tzinfo=tz)
+            end = start + timedelta(minutes=rnd.choice((30, 60, 90)))
+        # タイトル・説明は予定ごとに別の文字列オブジェクトになる（ICSの解析結果と同じ）
+        title = "".join([rnd.choice(TITLES), f" #{i % 50}"])
+        description = "".join(["メモ", "あ" * rnd.randrange(description_size + 1)])
+        location = "".join([rnd.choice(LOCATIONS)])
+        yield title, start, end, description, location
+
+
+def measure_memory(build):
+    """build() が確保したメモリ量（生成後も生きている分）"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def timeit(func, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EventBatch ベンチマーク")
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--description-size", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    def rows():
+        return iter_rows(args.events, args.seed, args.description_size, args.days)
+
+    target = date(2025, 6, 15)
+
+    def on_date(events):
+        return [e for e in events if (e.start_time.date() if isinstance(e.start_time, datetime)
+                                      else e.start_time) == target]
+
+    legacy, legacy_bytes = measure_memory(lambda: [LegacyEvent(*row) for row in rows()])
+    slotted, slotted_bytes = measure_memory(lambda: [Event(*row) for row in rows()])
+    batch, batch_bytes = measure_memory(lambda: EventBatch(Event(*row) for row in rows()))
+
+    legacy_sorted, legacy_sort = timeit(lambda: sorted(legacy, key=_event_sort_key), args.repeat)
+    slotted_sorted, slotted_sort = timeit(lambda: sorted(slotted, key=_event_sort_key), args.repeat)
+    # リストの sorted は参照を並べ替えるだけなので、比較対象は行番号の並べ替え（argsort）
+    order, batch_sort = timeit(batch.argsort, args.repeat)
+    batch_sorted, batch_take = timeit(lambda: batch.take(order), args.repeat)
+
+    _, legacy_filter = timeit(lambda: on_date(legacy_sorted), args.repeat)
+    _, slotted_filter = timeit(lambda: on_date(slotted_sorted), args.repeat)
+    batch_today, batch_filter = timeit(lambda: batch_sorted.on_date(target), args.repeat)
+
+    if batch_sorted.to_events() != slotted_sorted:
+        raise SystemExit("EventBatch order differs from sorted(Event)")
+    if [e.title for e in legacy_sorted] != [e.title for e in slotted_sorted]:
+        raise SystemExit("Legacy order differs from sorted(Event)")
+    if batch_today.to_events() != on_date(slotted_sorted):
+        raise SystemExit("EventBatch.on_date differs from list filter")
+
+    n = args.events
+    print(f"events={n} description~{args.description_size} chars")
+    print(f"{'format':>10} | {'bytes/event':>11} | {'sort ms':>8} | {'on_date ms':>10}")
+    for name, size, sort_time, filter_time in (
+        ("dataclass", legacy_bytes, legacy_sort, legacy_filter),
+        ("slots", slotted_bytes, slotted_sort, slotted_filter),
+        ("batch", batch_bytes, batch_sort, batch_filter),
+    ):
+        print(f"{name:>10} | {size / n:>11.1f} | {sort_time * 1000:>8.1f} | {filter_time * 1000:>10.3f}")
+    print(f"(batch: copying columns into sorted order takes another {batch_take * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""複数アカウントの並行エクスポートのベンチマーク
+
+擬似エクスポーター（fake_exporter.py）を使い、アカウントを1つずつ順に
+エクスポートした場合と ExportPool で並行実行した場合の所要時間を比較する。
+1アカウントだけ遅くしても、他のアカウントの完了が遅れないことも確認する。
+
+    python benchmarks/bench_export_pool.py --accounts 8 --delay 0.5 --slow-delay 3
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from loguru import logger  # noqa: E402
+
+from timetree_notifier.config.settings import TimeTreeConfig  # noqa: E402
+from timetree_notifier.core.export_pool import ExportPool, run_exporter  # noqa: E402
+
+
+FAKE_EXPORTER = Path(__file__).resolve().parent / "fake_exporter.py"
+
+
+def build_config(accounts: int, delay: float, slow_delay: float, max_parallel: int) -> TimeTreeConfig:
+    """擬似エクスポーターを使う設定（最後のアカウントだけ slow_delay 秒かかる）"""
+    return TimeTreeConfig(
+        accounts=[
+            {
+                "name": f"account{i}",
+                "email": f"user{i}@example.com",
+                "password": "bench",
+                "extra_args": ["--delay", str(slow_delay if i == accounts - 1 else delay)],
+            }
+            for i in range(accounts)
+        ],
+        exporter={
+            "command": f"{sys.executable} {FAKE_EXPORTER}",
+            "timeout": int(slow_delay) + 30,
+            "max_parallel": max_parallel,
+        },
+    )
+
+
+async def export_serial(config: TimeTreeConfig, pool: ExportPool) -> float:
+    """従来方式（1アカウントずつ順に実行）"""
+    started = time.perf_counter()
+    for account in config.get_accounts():
+        result = await run_exporter(
+            config.exporter.command, account.email, account.password,
+            pool.output_file(account), config.exporter.timeout, account.extra_args
+        )
+        if not result.success:
+            raise SystemExit(f"Export failed: {result.error_message}")
+    return time.perf_counter() - started
+
+
+async def export_parallel(pool: ExportPool) -> float:
+    """ExportPool で並行実行し、アカウントごとの完了時刻を表示"""
+    started = time.perf_counter()
+    finished = {}
+
+    async def export(account):
+        result = await pool.export(account)
+        if not result.success:
+            raise SystemExit(f"Export failed: {result.error_message}")
+        finished[account.name] = (time.perf_counter() - started, result)
+
+    await asyncio.gather(*(export(account) for account in pool.config.get_accounts()))
+    for name, (elapsed, result) in sorted(finished.items(), key=lambda item: item[1][0]):
+        print(f"  {name:<10} done at {elapsed:6.2f} s "
+              f"(run {result.execution_time:5.2f} s, queued {result.queued_time:5.2f} s)")
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="並行エクスポート ベンチマーク")
+    parser.add_argument("--accounts", type=int, default=8)
+    parser.add_argument("--delay", type=float, default=0.5)
+    parser.add_argument("--slow-delay", type=float, default=3.0)
+    parser.add_argument("--max-parallel", type=int, default=4)
+    args = parser.parse_args()
+
+    logger.remove()
+    config = build_config(args.accounts, args.delay, args.slow_delay, args.max_parallel)
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = ExportPool(config, Path(tmp) / "export.ics")
+        serial = asyncio.run(export_serial(config, pool))
+        print(f"parallel (max_parallel={args.max_parallel}):")
+        parallel = asyncio.run(export_parallel(pool))
+
+    print(f"accounts={args.accounts} delay={args.delay}s slow={args.slow_delay}s")
+    print(f"serial   : {serial:8.2f} s")
+    print(f"parallel : {parallel:8.2f} s ({serial / parallel:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
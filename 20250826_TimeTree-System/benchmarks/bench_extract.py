@@ -0,0 +1,120 @@
+"""_extract_today_events のベンチマーク
+
+従来の Calendar.from_ical による全体読み込み、VEVENTのストリーミング読み込み、
+DTSTARTによるmmap事前絞り込みの処理時間・ピークメモリを比較する。
+
+    python benchmarks/bench_extract.py --events 1000 10000 50000
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from icalendar import Calendar  # noqa: E402
+
+from ics_generator import generate_ics  # noqa: E402
+from timetree_notifier.config import Config  # noqa: E402
+from timetree_notifier.core.daily_notifier import DailySummaryNotifier, _event_sort_key  # noqa: E402
+from timetree_notifier.core.ics_stream import iter_vevent_blocks, parse_vevent_block  # noqa: E402
+
+
+TARGET_DATE = date(2022, 6, 15)
+
+
+def build_notifier(workdir: Path) -> DailySummaryNotifier:
+    """ベンチマーク用の通知クラスを生成（作業ファイルは workdir 配下に置く）"""
+    config = Config(
+        timetree={"email": "bench@example.com", "password": "bench"},
+        notification={"line_channel_access_token": "bench", "line_user_id": "bench"},
+        paths={
+            "temp_ics": str(workdir / "export.ics"),
+            "backup_data": str(workdir / "backup.ics"),
+            "event_index": str(workdir / "event_index.sqlite3"),
+            "logs": str(workdir / "logs"),
+        },
+    )
+    return DailySummaryNotifier(config)
+
+
+def extract_legacy(notifier: DailySummaryNotifier, ics_file: Path, target_date: date):
+    """従来方式（ファイル全体を Calendar.from_ical で展開）"""
+    events = []
+    with open(ics_file, "rb") as f:
+        calendar = Calendar.from_ical(f.read())
+    for component in calendar.walk():
+        if component.name == "VEVENT":
+            event = notifier._parse_event_component(component, target_date)
+            if event:
+                events.append(event)
+    events.sort(key=_event_sort_key)
+    return events
+
+
+def extract_stream(notifier: DailySummaryNotifier, ics_file: Path, target_date: date):
+    """VEVENTを1件ずつ全件解析する方式（事前絞り込みなし）"""
+    events = []
+    for block in iter_vevent_blocks(ics_file):
+        event = notifier._parse_event_component(parse_vevent_block(block), target_date)
+        if event:
+            events.append(event)
+    events.sort(key=_event_sort_key)
+    return events
+
+
+def measure(func, *args):
+    """処理時間(秒)とピークメモリ(MB)を計測"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="_extract_today_events ベンチマーク")
+    parser.add_argument("--events", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument(
+        "--full-parse-limit", type=int, default=20000,
+        help="この件数を超えるファイルでは全件解析方式を省略する"
+    )
+    args = parser.parse_args()
+
+    methods = [
+        ("legacy", extract_legacy),
+        ("stream", extract_stream),
+        ("prefilter", lambda n, f, d: n._scan_today_events(f, d)),
+    ]
+    header = " | ".join(f"{name + ' s':>12} | {name + ' MB':>12}" for name, _ in methods)
+    print(f"{'events':>8} | {header}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        notifier = build_notifier(Path(tmp))
+        for count in args.events:
+            ics_file = generate_ics(Path(tmp) / f"bench_{count}.ics", count)
+
+            expected = None
+            columns = []
+            for name, func in methods:
+                if name != "prefilter" and count > args.full_parse_limit:
+                    columns.append(f"{'-':>12} | {'-':>12}")
+                    continue
+                events, elapsed, peak = measure(func, notifier, ics_file, TARGET_DATE)
+                titles = [e.title for e in events]
+                if expected is None:
+                    expected = titles
+                elif titles != expected:
+                    raise SystemExit(f"Result mismatch for {count} events ({name})")
+                columns.append(f"{elapsed:>12.3f} | {peak:>12.1f}")
+
+            print(f"{count:>8} | " + " | ".join(columns))
+
+if __name__ == "__main__":
+    main()
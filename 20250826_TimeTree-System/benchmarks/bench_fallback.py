@@ -0,0 +1,73 @@
+"""エクスポートが遅い場合に最初のメッセージが届くまでの時間
+
+前回取得できた予定を保持した状態で、擬似エクスポーターの書き出しを --delay 秒遅らせて
+send_daily_summary を実行し、次の2つの場合を比べる。
+
+- wait    : エクスポートの完了を待って送る（fallback_days: 0）
+- fallback: fallback_wait_seconds 秒で保持している予定を送り、完了後に確認する
+
+first はメッセージを送り終えるまで、settled は最新の予定の確認（訂正）まで含めた時間。
+
+    python benchmarks/bench_fallback.py --delay 5 20 --wait 1
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from loguru import logger  # noqa: E402
+
+from bench_suite import START_DATE, TARGET_DATE, build_config  # noqa: E402
+from fake_line_server import FakeLineServer  # noqa: E402
+from ics_generator import generate_ics  # noqa: E402
+from timetree_notifier.core.daily_notifier import DailySummaryNotifier  # noqa: E402
+from timetree_notifier.core.export_pool import ExportPool  # noqa: E402
+
+
+async def run(ics_file: Path, workdir: Path, delay: float, wait: float, fallback: bool):
+    async with FakeLineServer() as server:
+        config = build_config(workdir, ics_file, server.base_url, 1)
+        config.daily_summary.fallback_days = 3 if fallback else 0
+        config.daily_summary.fallback_wait_seconds = wait
+        notifier = DailySummaryNotifier(config)
+        try:
+            # 前回分の取得（ここで保持した予定を遅延時に使う）
+            await notifier.send_daily_summary(TARGET_DATE)
+
+            config.timetree.exporter.command += f" --delay {delay}"
+            notifier.export_pool = ExportPool(config.timetree, config.paths.temp_ics)
+            started = time.perf_counter()
+            await notifier.send_daily_summary(TARGET_DATE)
+            first = time.perf_counter() - started
+            await notifier.wait_revalidations()
+            settled = time.perf_counter() - started
+            return first, settled
+        finally:
+            await notifier.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="取得遅延時の代替送信 ベンチマーク")
+    parser.add_argument("--delay", type=float, nargs="+", default=[5.0, 20.0], help="エクスポートの遅延（秒）")
+    parser.add_argument("--wait", type=float, default=1.0, help="fallback_wait_seconds")
+    parser.add_argument("--events", type=int, default=10000)
+    args = parser.parse_args()
+
+    logger.remove()
+    print(f"{'delay s':>7} | {'mode':>8} | {'first s':>7} | {'settled s':>9}")
+    for delay in args.delay:
+        for fallback in (False, True):
+            with tempfile.TemporaryDirectory() as tmp:
+                ics_file = generate_ics(Path(tmp) / "bench.ics", args.events, start_date=START_DATE, days=365)
+                first, settled = asyncio.run(run(ics_file, Path(tmp), delay, args.wait, fallback))
+            mode = "fallback" if fallback else "wait"
+            print(f"{delay:>7.1f} | {mode:>8} | {first:>7.2f} | {settled:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
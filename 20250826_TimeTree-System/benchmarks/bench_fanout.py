@@ -0,0 +1,69 @@
+"""複数送信先への送信ベンチマーク
+
+ローカルの代替サーバーに対して、同じメッセージを多数の送信先に送る場合の
+順次push・並行push（個別メッセージ）・multicastのスループットを比較する。
+
+    python benchmarks/bench_fanout.py --recipients 1000 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from fake_line_server import FakeLineServer  # noqa: E402
+from timetree_notifier.core.line_notifier import LineNotifier  # noqa: E402
+
+
+async def run(recipient_count: int, latency: float, concurrency: int, sequential_limit: int):
+    recipients = [f"U{i:032d}" for i in range(recipient_count)]
+
+    async with FakeLineServer(latency=latency) as server:
+        notifier = LineNotifier(
+            "bench-token", api_base_url=server.base_url,
+            recipients=recipients, max_concurrency=concurrency,
+        )
+
+        rows = []
+
+        sequential = recipients[:sequential_limit]
+        started = time.perf_counter()
+        for user_id in sequential:
+            await notifier.send_message("おはようございます", recipients=[user_id])
+        rows.append(("sequential push", len(sequential), time.perf_counter() - started, len(sequential)))
+
+        before = server.requests
+        started = time.perf_counter()
+        result = await notifier.send_personalized({u: f"{u} さん、おはようございます" for u in recipients})
+        rows.append(("concurrent push", recipient_count, time.perf_counter() - started, server.requests - before))
+        assert result.success, result.error_message
+
+        before = server.requests
+        started = time.perf_counter()
+        result = await notifier.send_message("おはようございます")
+        rows.append(("multicast", recipient_count, time.perf_counter() - started, server.requests - before))
+        assert result.success and len(result.recipient_results) == recipient_count
+
+        await notifier.close()
+
+    print(f"recipients={recipient_count} server latency={latency * 1000:.0f} ms concurrency={concurrency}")
+    print(f"{'mode':<16} | {'sent':>6} | {'requests':>8} | {'seconds':>8} | {'recipients/s':>12}")
+    for mode, sent, elapsed, requests in rows:
+        print(f"{mode:<16} | {sent:>6} | {requests:>8} | {elapsed:>8.3f} | {sent / elapsed:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="複数送信先への送信 ベンチマーク")
+    parser.add_argument("--recipients", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.05, help="代替サーバーの応答遅延(秒)")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--sequential-limit", type=int, default=50, help="順次pushで送る件数")
+    args = parser.parse_args()
+    asyncio.run(run(args.recipients, args.latency, args.concurrency, args.sequential_limit))
+
+
+if __name__ == "__main__":
+    main()
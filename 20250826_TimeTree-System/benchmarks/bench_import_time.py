@@ -0,0 +1,150 @@
+"""起動時のimport時間の予算チェック
+
+`python -X importtime` でモードごとの起動処理を別プロセスで実行し、
+import にかかった時間（何もimportしないインタプリタ起動分を除く）と、
+そのモードで読み込んではいけない重いライブラリが読み込まれていないかを確認する。
+予算を超えた、または読み込んではいけないライブラリがあれば終了コード1で終わる。
+
+- cli    : timetree_notifier.main の import（引数解析前）
+- status : --mode status の実行（設定の読み込みのみ）
+- notify : 手動実行・デーモンで使う通知処理の import（解析・送信の前まで）
+
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --budget cli=100 --budget status=300
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+
+SRC_DIR = Path(__file__).resolve().parents[1] / "src"
+
+# シナリオ: (起動引数, 読み込んではいけないトップレベルのモジュール, 予算ms)
+SCENARIOS = {
+    "cli": (
+        ["-c", "import timetree_notifier.main"],
+        {"pydantic", "yaml", "icalendar", "dateutil", "apscheduler", "aiohttp"},
+        150.0,
+    ),
+    "status": (
+        ["-m", "timetree_notifier.main", "--mode", "status", "--config", "{config}"],
+        {"icalendar", "dateutil", "apscheduler", "aiohttp"},
+        350.0,
+    ),
+    "notify": (
+        ["-c", "import timetree_notifier.core.scheduler"],
+        {"icalendar", "dateutil", "apscheduler", "aiohttp"},
+        400.0,
+    ),
+}
+
+STATUS_CONFIG = """\
+timetree:
+  email: bench@example.com
+  password: bench
+notification:
+  line_channel_access_token: bench
+  line_user_id: U0000
+logging:
+  file: {workdir}/logs/daily_notifier.log
+paths:
+  temp_ics: {workdir}/export.ics
+  backup_data: {workdir}/backup.ics
+  event_index: {workdir}/event_index.sqlite3
+  outbox: {workdir}/outbox.sqlite3
+  logs: {workdir}/logs
+"""
+
+
+def parse_importtime(stderr: str) -> Tuple[float, Set[str]]:
+    """-X importtime の出力から、トップレベルのimportの合計時間(ms)と読み込まれたモジュール名"""
+    total_us = 0
+    modules = set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        name = name[1:]
+        modules.add(name.strip())
+        if not name.startswith(" "):
+            total_us += int(cumulative)
+    return total_us / 1000, modules
+
+
+def run_importtime(args: List[str], cwd: Path) -> Tuple[float, Set[str]]:
+    env = dict(os.environ, PYTHONPATH=str(SRC_DIR))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=cwd, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"{' '.join(args)} failed:\n{result.stdout}{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def measure(args: List[str], cwd: Path, repeat: int) -> Tuple[float, Set[str]]:
+    """repeat 回実行したimport時間の中央値と、読み込まれたモジュール名"""
+    times = []
+    modules: Set[str] = set()
+    for _ in range(repeat):
+        elapsed, modules = run_importtime(args, cwd)
+        times.append(elapsed)
+    return statistics.median(times), modules
+
+
+def parse_budgets(values: List[str]) -> Dict[str, float]:
+    budgets = {name: budget for name, (_, _, budget) in SCENARIOS.items()}
+    for value in values:
+        name, _, ms = value.partition("=")
+        if name not in SCENARIOS or not ms:
+            raise SystemExit(f"Invalid --budget {value!r} (expected one of {', '.join(SCENARIOS)}=MS)")
+        budgets[name] = float(ms)
+    return budgets
+
+
+def main():
+    parser = argparse.ArgumentParser(description="起動時import時間 ベンチマーク")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--budget", action="append", default=[], metavar="NAME=MS",
+                        help="シナリオごとの予算（ミリ秒）を上書き")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    budgets = parse_budgets(args.budget)
+
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        config_file = workdir / "config.yaml"
+        config_file.write_text(STATUS_CONFIG.format(workdir=workdir), encoding="utf-8")
+
+        # 1回目はバイトコードの生成を含むため計測しない
+        for name in args.scenarios:
+            run_importtime([arg.format(config=config_file) for arg in SCENARIOS[name][0]], workdir)
+        baseline, _ = measure(["-c", "pass"], workdir, args.repeat)
+
+        print(f"baseline (interpreter startup imports): {baseline:.1f} ms")
+        print(f"{'scenario':>8} | {'import ms':>9} | {'budget':>7} | forbidden modules loaded")
+        for name in args.scenarios:
+            scenario_args, forbidden, _ = SCENARIOS[name]
+            elapsed, modules = measure([arg.format(config=config_file) for arg in scenario_args], workdir, args.repeat)
+            elapsed = max(0.0, elapsed - baseline)
+            loaded = sorted(forbidden & modules)
+            print(f"{name:>8} | {elapsed:>9.1f} | {budgets[name]:>7.0f} | {', '.join(loaded) or '-'}")
+            if elapsed > budgets[name]:
+                failures.append(f"{name}: {elapsed:.1f} ms > budget {budgets[name]:.0f} ms")
+            if loaded:
+                failures.append(f"{name}: imports {', '.join(loaded)}")
+
+    if failures:
+        print("\nCold start budget exceeded:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
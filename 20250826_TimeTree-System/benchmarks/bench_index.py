@@ -0,0 +1,60 @@
+"""予定インデックスのベンチマーク
+
+カレンダーの規模を変えて、インデックス構築時間と1日分・30日分の検索時間を計測する。
+検索時間がカレンダーの規模によらずほぼ一定であることを確認する。
+
+    python benchmarks/bench_index.py --events 1000 10000 50000
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from loguru import logger  # noqa: E402
+
+from bench_extract import TARGET_DATE  # noqa: E402
+from ics_generator import generate_ics  # noqa: E402
+from timetree_notifier.core.event_index import EventIndex  # noqa: E402
+
+
+LOOKUPS = 200
+
+
+def main():
+    parser = argparse.ArgumentParser(description="予定インデックス ベンチマーク")
+    parser.add_argument("--events", type=int, nargs="+", default=[1000, 10000, 50000])
+    args = parser.parse_args()
+
+    logger.remove()
+    print(f"{'events':>8} | {'build s':>8} | {'1 day ms':>9} | {'30 days ms':>10} | {'hits':>5}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in args.events:
+            ics_file = generate_ics(Path(tmp) / f"bench_{count}.ics", count)
+            index = EventIndex(Path(tmp) / f"index_{count}.sqlite3", "Asia/Tokyo")
+
+            started = time.perf_counter()
+            index.rebuild(ics_file)
+            build_time = time.perf_counter() - started
+
+            started = time.perf_counter()
+            for i in range(LOOKUPS):
+                hits = len(index.events_on(TARGET_DATE + timedelta(days=i)))
+            day_ms = (time.perf_counter() - started) / LOOKUPS * 1000
+
+            started = time.perf_counter()
+            for i in range(LOOKUPS):
+                start = TARGET_DATE + timedelta(days=i)
+                index.events_between(start, start + timedelta(days=30))
+            month_ms = (time.perf_counter() - started) / LOOKUPS * 1000
+
+            print(f"{count:>8} | {build_time:>8.2f} | {day_ms:>9.3f} | {month_ms:>10.3f} | {hits:>5}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""差分取り込みのベンチマーク
+
+大きなカレンダーを一度取り込んだ後、少数の予定だけを変更したエクスポートを
+再取り込みし、全件再構築と差分取り込みの時間を比較する。
+
+    python benchmarks/bench_ingest.py --events 10000 --changes 10
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from loguru import logger  # noqa: E402
+
+from ics_generator import generate_ics  # noqa: E402
+from timetree_notifier.core.event_index import EventIndex  # noqa: E402
+
+
+def mutate_export(source: Path, output: Path, changes: int) -> Path:
+    """先頭 changes 件の予定タイトルを変更し、1件を削除したエクスポートを作る"""
+    with open(source, encoding="utf-8", newline="") as f:
+        text = f.read()
+    for i in range(changes):
+        text = text.replace(f"SUMMARY:予定 {i}\r\n", f"SUMMARY:予定 {i}（変更）\r\n", 1)
+    start = text.index(f"UID:bench-{changes}@timetree")
+    start = text.rindex("BEGIN:VEVENT", 0, start)
+    end = text.index("END:VEVENT\r\n", start) + len("END:VEVENT\r\n")
+    with open(output, "w", encoding="utf-8", newline="") as f:
+        f.write(text[:start] + text[end:])
+    return output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="差分取り込み ベンチマーク")
+    parser.add_argument("--events", type=int, default=10000)
+    parser.add_argument("--changes", type=int, default=10)
+    args = parser.parse_args()
+
+    logger.remove()
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        first = generate_ics(tmp / "day1.ics", args.events)
+        second = mutate_export(first, tmp / "day2.ics", args.changes)
+
+        index = EventIndex(tmp / "index.sqlite3", "Asia/Tokyo")
+        started = time.perf_counter()
+        index.rebuild(first)
+        initial = time.perf_counter() - started
+
+        started = time.perf_counter()
+        diff = index.ingest(second)
+        incremental = time.perf_counter() - started
+
+        started = time.perf_counter()
+        index.rebuild(second)
+        full = time.perf_counter() - started
+
+    print(f"events={args.events} {diff.summary()}")
+    print(f"initial build : {initial:8.3f} s")
+    print(f"full rebuild  : {full:8.3f} s")
+    print(f"incremental   : {incremental:8.3f} s ({full / incremental:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
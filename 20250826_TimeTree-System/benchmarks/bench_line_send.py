@@ -0,0 +1,65 @@
+"""LINE送信のベンチマーク
+
+ローカルの代替サーバーに対して連続送信し、送信レイテンシのヒストグラムと、
+送信中もイベントループが止まらないこと（ループ遅延）を確認する。
+
+    python benchmarks/bench_line_send.py --messages 200 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from fake_line_server import FakeLineServer  # noqa: E402
+from timetree_notifier.core.line_notifier import LineNotifier  # noqa: E402
+
+
+async def watch_loop_lag(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """interval ごとに起床し、最大の遅れ(秒)を返す"""
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
+
+
+async def run(messages: int, latency: float):
+    async with FakeLineServer(latency=latency) as server:
+        notifier = LineNotifier("bench-token", "U-bench", api_base_url=server.base_url)
+        stop = asyncio.Event()
+        watcher = asyncio.create_task(watch_loop_lag(stop))
+
+        started = time.perf_counter()
+        for i in range(messages):
+            result = await notifier.send_message(f"ベンチマーク {i}")
+            if not result.success:
+                raise SystemExit(result.error_message)
+        elapsed = time.perf_counter() - started
+
+        stop.set()
+        worst_lag = await watcher
+        await notifier.close()
+
+    histogram = notifier.send_latency
+    print(f"messages={messages} server latency={latency * 1000:.0f} ms")
+    print(f"total         : {elapsed:8.3f} s ({messages / elapsed:.1f} msg/s)")
+    print(f"send latency  : p50={histogram.quantile(0.5) * 1000:.1f} ms "
+          f"p99={histogram.quantile(0.99) * 1000:.1f} ms mean={histogram.sum / histogram.count * 1000:.1f} ms")
+    print(f"worst loop lag: {worst_lag * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LINE送信 ベンチマーク")
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05, help="代替サーバーの応答遅延(秒)")
+    args = parser.parse_args()
+    asyncio.run(run(args.messages, args.latency))
+
+
+if __name__ == "__main__":
+    main()
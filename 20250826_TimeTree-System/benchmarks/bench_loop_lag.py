@@ -0,0 +1,86 @@
+"""日次サマリー処理中のイベントループ遅延の計測
+
+大きなICSで send_daily_summary を実行しながら LoopLagMonitor で
+ループの遅延を測り、CPU処理をスレッドプール・プロセスプールで実行した
+場合と、従来どおりループ上で実行した場合（inline）を比較する。
+
+    python benchmarks/bench_loop_lag.py --events 50000
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from loguru import logger  # noqa: E402
+
+from bench_suite import TARGET_DATE, build_config, START_DATE  # noqa: E402
+from fake_line_server import FakeLineServer  # noqa: E402
+from ics_generator import generate_ics  # noqa: E402
+from timetree_notifier.core.daily_notifier import DailySummaryNotifier  # noqa: E402
+from timetree_notifier.utils.loop_monitor import LoopLagMonitor  # noqa: E402
+
+
+class InlineExecutors:
+    """プールを使わずループ上でそのまま実行（比較用）"""
+
+    cpu_is_process = False
+
+    async def run_io(self, func, *args, **kwargs):
+        return func(*args, **kwargs)
+
+    run_cpu = run_io
+
+    def shutdown(self, wait: bool = True):
+        pass
+
+
+async def measure(kind: str, workdir: Path, ics_file: Path, recipients: int):
+    """1回分の送信中のループ遅延を計測"""
+    async with FakeLineServer() as server:
+        config = build_config(workdir, ics_file, server.base_url, recipients)
+        config.executors.cpu_kind = "thread" if kind == "inline" else kind
+        notifier = DailySummaryNotifier(config)
+        if kind == "inline":
+            notifier.executors = InlineExecutors()
+
+        monitor = LoopLagMonitor(interval=0.01, threshold=10.0)
+        monitor.start()
+        started = time.perf_counter()
+        try:
+            if not await notifier.send_daily_summary(TARGET_DATE):
+                raise SystemExit(f"send_daily_summary failed ({kind})")
+        finally:
+            elapsed = time.perf_counter() - started
+            await monitor.stop()
+            await notifier.close()
+
+    return elapsed, monitor.lag
+
+
+def main():
+    parser = argparse.ArgumentParser(description="イベントループ遅延 ベンチマーク")
+    parser.add_argument("--events", type=int, default=50000)
+    parser.add_argument("--recipients", type=int, default=10)
+    parser.add_argument("--kinds", nargs="+", default=["inline", "thread", "process"])
+    args = parser.parse_args()
+
+    logger.remove()
+    print(f"{'kind':>8} | {'total s':>8} | {'lag p50 ms':>10} | {'lag p99 ms':>10} | {'samples':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        ics_file = generate_ics(Path(tmp) / "bench.ics", args.events, start_date=START_DATE, days=365,
+                                recurring_ratio=0.02, description_size=80)
+        for kind in args.kinds:
+            workdir = Path(tmp) / kind
+            workdir.mkdir()
+            elapsed, lag = asyncio.run(measure(kind, workdir, ics_file, args.recipients))
+            print(f"{kind:>8} | {elapsed:>8.2f} | {lag.quantile(0.5) * 1000:>10.1f} | "
+                  f"{lag.quantile(0.99) * 1000:>10.1f} | {lag.count:>7}")
+
+
+if __name__ == "__main__":
+    main()
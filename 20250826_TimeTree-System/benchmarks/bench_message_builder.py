@@ -0,0 +1,111 @@
+"""予定の多い日のサマリー生成のスループット
+
+1日に数百件の予定がある場合に、以前の方式（全予定を整形してから文字数の上限で
+切り詰める）と、MessageBuilder で上限まで整形して最大5通に分ける方式の
+1回あたりの生成時間を比較する。MessageBuilder は予定の表示行のキャッシュが
+空の場合（cold）と、前回の実行で整形済みの場合（warm）を測る。
+
+    python benchmarks/bench_message_builder.py --events 100 300 1000
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from loguru import logger  # noqa: E402
+
+from bench_suite import build_config  # noqa: E402
+from timetree_notifier.core.daily_notifier import DailySummaryNotifier, _merge_events  # noqa: E402
+from timetree_notifier.core.message_builder import EventLineFormatter  # noqa: E402
+from timetree_notifier.core.models import Event  # noqa: E402
+
+
+TARGET_DATE = date(2025, 6, 15)
+
+
+def make_events(count: int):
+    """1日に count 件の予定（説明・場所付き）"""
+    tz = ZoneInfo("Asia/Tokyo")
+    start = datetime(2025, 6, 15, 0, 0, tzinfo=tz)
+    events = []
+    for i in range(count):
+        begin = start + timedelta(minutes=(i * 7) % (24 * 60))
+        events.append(Event(
+            title=f"打ち合わせ {i}",
+            start_time=begin,
+            end_time=begin + timedelta(minutes=30),
+            description=f"議題{i}: 進捗確認と次回までの宿題の整理 " * 3,
+            location=f"会議室{i % 8}",
+        ))
+    return _merge_events([events])
+
+
+def legacy_summary(notifier: DailySummaryNotifier, events, send_at: datetime) -> str:
+    """以前の方式：全予定を整形してから上限で切り詰める"""
+    config = notifier.config.daily_summary
+    notification = notifier.config.notification
+    parts = [notification.greeting, "", f"📅 {TARGET_DATE.strftime('%Y年%m月%d日')}（日）", "", "⏰ 今日の予定:"]
+    for event in events[:config.max_events_display]:
+        parts.append(f"・{event.format_time_range()} {event.title}")
+        if config.include_description and event.description.strip():
+            parts.append(f"  {event.description.strip()[:100]}")
+        if config.include_location and event.location.strip():
+            parts.append(f"  📍 {event.location}")
+    if len(events) > config.max_events_display:
+        parts.append(f"  ... 他{len(events) - config.max_events_display}件の予定")
+    parts.extend(["", notification.closing, "", "---", f"{notification.footer} | {send_at.strftime('%H:%M')}送信"])
+    message = "\n".join(parts)
+    if len(message) > notification.max_message_length:
+        message = message[:notification.max_message_length - 10] + "...(省略)"
+    return message
+
+
+def best_of(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="メッセージ生成 ベンチマーク")
+    parser.add_argument("--events", type=int, nargs="+", default=[100, 300, 1000])
+    parser.add_argument("--max-display", type=int, default=0, help="表示件数の上限（0なら全件）")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    logger.remove()
+    send_at = datetime(2025, 6, 15, 7, 0)
+    with tempfile.TemporaryDirectory() as tmp:
+        notifier = DailySummaryNotifier(build_config(Path(tmp), Path(tmp) / "unused.ics", "http://127.0.0.1:9", 1))
+        summary_config = notifier.config.daily_summary
+
+        print(f"{'events':>6} | {'legacy ms':>9} | {'cold ms':>8} | {'warm ms':>8} | {'msgs':>4} | {'shown':>5}")
+        for count in args.events:
+            events = make_events(count)
+            summary_config.max_events_display = args.max_display or count
+
+            def build_cold():
+                notifier.event_formatter = EventLineFormatter()
+                return notifier._generate_daily_summary(TARGET_DATE, events, send_at)
+
+            legacy = best_of(lambda: legacy_summary(notifier, events, send_at), args.repeat)
+            cold = best_of(build_cold, args.repeat)
+            summary = notifier._generate_daily_summary(TARGET_DATE, events, send_at)
+            warm = best_of(lambda: notifier._generate_daily_summary(TARGET_DATE, events, send_at), args.repeat)
+
+            shown = sum(line.startswith("・") for message in summary.messages for line in message.split("\n"))
+            print(f"{count:>6} | {legacy * 1000:>9.2f} | {cold * 1000:>8.2f} | {warm * 1000:>8.2f} | "
+                  f"{len(summary.messages):>4} | {shown:>5}")
+
+
+if __name__ == "__main__":
+    main()
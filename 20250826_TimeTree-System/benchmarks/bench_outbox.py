@@ -0,0 +1,91 @@
+"""アウトボックスの再送処理のベンチマーク
+
+LINE API（fake_line_server.py）が停止している間に溜まったメッセージを、
+復旧後にまとめて送り切るまでの時間を計測する。送信途中で異常終了した
+場合を模擬し、再起動後の再送で重複配信されないこと、同じ内容のメッセージを
+続けて記録してもそれぞれ送られることも確認する。
+
+    python benchmarks/bench_outbox.py --messages 10000
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from loguru import logger  # noqa: E402
+
+from fake_line_server import FakeLineServer  # noqa: E402
+from timetree_notifier.core.line_notifier import LineNotifier  # noqa: E402
+from timetree_notifier.core.outbox import Outbox, OutboxWorker  # noqa: E402
+
+
+async def run(messages: int, batch_size: int, concurrency: int, crashed: int, workdir: Path):
+    async with FakeLineServer() as server:
+        notifier = LineNotifier("bench", api_base_url=server.base_url, max_concurrency=concurrency,
+                                max_connections=concurrency)
+        outbox = Outbox(workdir / f"outbox_{batch_size}.sqlite3")
+        worker = OutboxWorker(outbox, notifier, retry_delay=60.0, batch_size=batch_size)
+
+        started = time.perf_counter()
+        outbox.enqueue_many(([f"U{i:06d}"], f"今日の予定 {i}", None) for i in range(messages))
+        enqueue_time = time.perf_counter() - started
+
+        # 障害中: 全て失敗して再送待ちになる
+        server.fail_status = 503
+        await worker.drain()
+        outage = outbox.counts()
+
+        # 送信中に異常終了: LINE側は受け付けたが結果を記録する前に落ちた
+        server.fail_status = None
+        in_flight = outbox.claim_due(crashed, now=time.time() + 3600)
+        for entry in in_flight:
+            await notifier.send_request(entry.recipients, entry.messages, entry.retry_key)
+
+        # 再起動後: 送信中のまま残ったものを戻してまとめて送る
+        outbox = Outbox(outbox.db_path)
+        worker = OutboxWorker(outbox, notifier, batch_size=batch_size)
+        recovered = worker.resume()
+        started = time.perf_counter()
+        # 障害中に積まれた再送待ちも含めて送り切る
+        await worker.drain(now=time.time() + 3600)
+        drain_time = time.perf_counter() - started
+        counts, delivered = outbox.counts(), server.delivered
+
+        # 同じ内容を続けて記録しても（手動の再実行など）それぞれ送られること
+        repeated = outbox.enqueue_many([(["U000000"], "今日の予定 0", None)] * 2)
+        if not all([await worker.deliver(ids) for ids in repeated]) or server.delivered != delivered + 2:
+            raise SystemExit(f"Identical messages were not sent twice: {server.delivered - delivered}")
+
+        await notifier.close()
+        return enqueue_time, outage, recovered, drain_time, counts, delivered
+
+
+def main():
+    parser = argparse.ArgumentParser(description="アウトボックス ベンチマーク")
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 50, 200])
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--crashed", type=int, default=100, help="異常終了時に送信中だった件数")
+    args = parser.parse_args()
+
+    logger.remove()
+    print(f"messages={args.messages} concurrency={args.concurrency}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for batch_size in args.batch_sizes:
+            enqueue_time, outage, recovered, drain_time, counts, delivered = asyncio.run(
+                run(args.messages, batch_size, args.concurrency, args.crashed, Path(tmp))
+            )
+            if delivered != args.messages or counts.get("sent") != args.messages:
+                raise SystemExit(f"Delivered {delivered} / recorded {counts}, expected {args.messages}")
+            print(f"batch={batch_size:>4} | enqueue {enqueue_time:6.2f} s | outage {outage} | "
+                  f"recovered {recovered} | drain {drain_time:6.2f} s "
+                  f"({args.messages / drain_time:7.0f} msg/s) | delivered {delivered}")
+
+
+if __name__ == "__main__":
+    main()
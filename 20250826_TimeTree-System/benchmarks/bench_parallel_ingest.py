@@ -0,0 +1,94 @@
+"""予定インデックスへの取り込みの並列解析ベンチマーク
+
+同じICSを逐次解析と、プロセス数を変えた並列解析でそれぞれ空のインデックスへ
+取り込み、処理時間と逐次に対する速度比を表示する。取り込んだ内容が
+逐次解析と完全に一致することも確認する。
+
+    python benchmarks/bench_parallel_ingest.py --events 200000 --workers 1 2 4 8
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from loguru import logger  # noqa: E402
+
+from ics_generator import generate_ics  # noqa: E402
+from timetree_notifier.core.event_index import EventIndex  # noqa: E402
+
+
+TIMEZONE = "Asia/Tokyo"
+
+
+def dump(db_path: Path) -> list:
+    """インデックスの全レコード（比較用）"""
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT * FROM events ORDER BY id").fetchall()
+    finally:
+        conn.close()
+
+
+def default_workers() -> list:
+    """1からCPUコア数までの2の累乗"""
+    workers, n = [], 1
+    while n <= (os.cpu_count() or 1):
+        workers.append(n)
+        n *= 2
+    return workers
+
+
+def main():
+    parser = argparse.ArgumentParser(description="並列解析 ベンチマーク")
+    parser.add_argument("--events", type=int, default=100000)
+    parser.add_argument("--workers", type=int, nargs="+", default=default_workers())
+    parser.add_argument("--recurring-ratio", type=float, default=0.02)
+    parser.add_argument("--description-size", type=int, default=200)
+    args = parser.parse_args()
+
+    logger.remove()
+    with tempfile.TemporaryDirectory() as tmp:
+        ics_file = generate_ics(
+            Path(tmp) / "bench.ics", args.events, start_date=date(2025, 1, 1), days=365,
+            recurring_ratio=args.recurring_ratio, all_day_ratio=0.1,
+            timezones=["Asia/Tokyo", "UTC", "America/New_York"], description_size=args.description_size,
+        )
+        size_mb = ics_file.stat().st_size / 1024 / 1024
+        print(f"events={args.events} size={size_mb:.1f} MB cpus={os.cpu_count()}")
+
+        serial_index = EventIndex(Path(tmp) / "serial.sqlite3", TIMEZONE)
+        started = time.perf_counter()
+        serial_index.ingest(ics_file)
+        serial_time = time.perf_counter() - started
+        expected = dump(serial_index.db_path)
+        sample_days = [date(2025, 1, 1) + timedelta(days=d) for d in range(0, 365, 30)]
+        expected_events = [serial_index.events_on(day) for day in sample_days]
+
+        print(f"{'mode':>12} | {'seconds':>8} | {'speedup':>7}")
+        print(f"{'serial':>12} | {serial_time:>8.2f} | {1.0:>7.2f}")
+        for workers in args.workers:
+            index = EventIndex(Path(tmp) / f"parallel_{workers}.sqlite3", TIMEZONE)
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                # プロセス起動時間は計測に含めない
+                list(pool.map(abs, range(workers)))
+                started = time.perf_counter()
+                index.ingest(ics_file, pool, workers)
+                elapsed = time.perf_counter() - started
+
+            if dump(index.db_path) != expected:
+                raise SystemExit(f"Index contents differ from serial ingest ({workers} workers)")
+            if [index.events_on(day) for day in sample_days] != expected_events:
+                raise SystemExit(f"Query results differ from serial ingest ({workers} workers)")
+            print(f"{f'{workers} proc':>12} | {elapsed:>8.2f} | {serial_time / elapsed:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
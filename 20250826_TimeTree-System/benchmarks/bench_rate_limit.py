@@ -0,0 +1,68 @@
+"""LINE APIのレート制限への追従のベンチマーク
+
+1秒あたりのリクエスト数を制限した fake_line_server.py に大量の個別メッセージを
+送り、レート制御なし・あり（初期レートが低い/高い、X-RateLimit-* ヘッダーあり）で
+届いた件数、429の回数、実効レート、送信枠の待ち時間を比較する。
+
+    python benchmarks/bench_rate_limit.py --messages 3000 --quota 200
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from loguru import logger  # noqa: E402
+
+from fake_line_server import FakeLineServer  # noqa: E402
+from timetree_notifier.core.line_notifier import LineNotifier  # noqa: E402
+
+
+async def run(messages: int, quota: int, concurrency: int, rate_limit, rate_headers: bool):
+    async with FakeLineServer(latency=0.01, rate_limit=quota, rate_headers=rate_headers) as server:
+        notifier = LineNotifier("bench", api_base_url=server.base_url, max_concurrency=concurrency,
+                                max_connections=concurrency, rate_limit=rate_limit)
+        started = time.perf_counter()
+        result = await notifier.send_personalized({f"U{i:06d}": f"今日の予定 {i}" for i in range(messages)})
+        elapsed = time.perf_counter() - started
+        await notifier.close()
+
+    delivered = messages - len(result.failed_recipients)
+    return delivered, server.throttled, elapsed, notifier.rate_limiter
+
+
+def main():
+    parser = argparse.ArgumentParser(description="レート制御 ベンチマーク")
+    parser.add_argument("--messages", type=int, default=3000)
+    parser.add_argument("--quota", type=int, default=200, help="fake server の1秒あたりの上限")
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    logger.remove()
+    cases = [
+        ("no limiter", None, False),
+        ("adaptive, start 50/s", 50.0, False),
+        ("adaptive, start 1000/s", 1000.0, False),
+        ("rate headers", 1000.0, True),
+    ]
+    print(f"messages={args.messages} quota={args.quota}/s concurrency={args.concurrency}")
+    print(f"{'case':<24} | {'delivered':>9} | {'429s':>5} | {'time s':>7} | {'req/s':>7} | "
+          f"{'final rate':>10} | {'wait p50':>8} | {'wait p95':>8}")
+    for name, rate_limit, rate_headers in cases:
+        delivered, throttled, elapsed, limiter = asyncio.run(
+            run(args.messages, args.quota, args.concurrency, rate_limit, rate_headers)
+        )
+        if limiter:
+            stats = limiter.snapshot()
+            extra = f"{stats['rate']:>10.1f} | {stats['wait_p50']:>8.3f} | {stats['wait_p95']:>8.3f}"
+        else:
+            extra = f"{'-':>10} | {'-':>8} | {'-':>8}"
+        print(f"{name:<24} | {delivered:>9} | {throttled:>5} | {elapsed:>7.2f} | "
+              f"{delivered / elapsed:>7.1f} | {extra}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""繰り返し予定展開のベンチマーク
+
+数千件の繰り返し予定を含むカレンダーで、30日分を1日ずつ検索する。
+毎回展開し直す場合（キャッシュなし）と、発生キャッシュを使う場合を比較する。
+
+    python benchmarks/bench_recurrence.py --series 5000
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from loguru import logger  # noqa: E402
+
+from ics_generator import generate_ics  # noqa: E402
+from timetree_notifier.core.event_index import EventIndex  # noqa: E402
+
+
+FIRST_DAY = date(2023, 4, 1)
+DAYS = 30
+
+
+def query_days(index: EventIndex, clear_cache: bool) -> tuple:
+    """DAYS日分を1日ずつ検索し、(秒, 件数) を返す"""
+    total = 0
+    started = time.perf_counter()
+    for i in range(DAYS):
+        if clear_cache:
+            index.recurrence.clear()
+        total += len(index.events_on(FIRST_DAY + timedelta(days=i)))
+    return time.perf_counter() - started, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="繰り返し予定展開 ベンチマーク")
+    parser.add_argument("--series", type=int, default=5000)
+    parser.add_argument("--events", type=int, default=10000)
+    args = parser.parse_args()
+
+    logger.remove()
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        ics_file = generate_ics(
+            tmp / "bench.ics", args.events, start_date=date(2020, 1, 1),
+            days=365 * 4, recurring_count=args.series,
+        )
+        index = EventIndex(tmp / "index.sqlite3", "Asia/Tokyo")
+
+        started = time.perf_counter()
+        index.rebuild(ics_file)
+        build = time.perf_counter() - started
+
+        naive, naive_count = query_days(index, clear_cache=True)
+        index.recurrence.clear()
+        index.recurrence.hits = index.recurrence.misses = 0
+        cached, cached_count = query_days(index, clear_cache=False)
+
+    if naive_count != cached_count:
+        raise SystemExit(f"Result mismatch: {naive_count} != {cached_count}")
+
+    print(f"series={args.series} events={args.events} occurrences={cached_count}")
+    print(f"index build       : {build:8.3f} s")
+    print(f"{DAYS} days, no cache : {naive:8.3f} s ({naive / DAYS * 1000:.1f} ms/day)")
+    print(f"{DAYS} days, cached   : {cached:8.3f} s ({cached / DAYS * 1000:.1f} ms/day)")
+    print(f"cache hits={index.recurrence.hits} misses={index.recurrence.misses}")
+
+
+if __name__ == "__main__":
+    main()
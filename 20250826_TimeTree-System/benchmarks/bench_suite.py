@@ -0,0 +1,244 @@
+"""朝の通知処理のベンチマークスイート
+
+合成ICSファイルに対して、解析・抽出・メッセージ生成・送信までの一連の処理を
+件数ごとに計測し、結果をJSONに保存する。コミット間で比較して性能の劣化を見つける。
+
+- parse  : 全VEVENTを1件ずつ解析（_parse_event_component まで）
+- filter : 今日の予定の抽出（_extract_today_events、インデックスなし）
+- render : 日次サマリーの生成（_generate_daily_summary）
+- e2e    : 擬似エクスポーターと擬似LINEサーバーを使った send_daily_summary
+           （e2e_cold は初回でインデックス作成あり、e2e_warm は翌日分で差分なし）
+
+    python benchmarks/bench_suite.py --events 1000 10000 100000 1000000 -o results/HEAD.json
+    python benchmarks/bench_suite.py --events 1000 10000 --compare results/base.json
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from loguru import logger  # noqa: E402
+
+from fake_line_server import FakeLineServer  # noqa: E402
+from ics_generator import generate_ics  # noqa: E402
+from timetree_notifier.config import Config  # noqa: E402
+from timetree_notifier.core.daily_notifier import DailySummaryNotifier  # noqa: E402
+from timetree_notifier.core.ics_stream import iter_vevent_blocks, parse_vevent_block  # noqa: E402
+
+
+BENCH_DIR = Path(__file__).resolve().parent
+START_DATE = date(2025, 1, 1)
+TARGET_DATE = date(2025, 6, 15)
+
+
+def build_config(workdir: Path, ics_file: Path, api_base_url: str, recipients: int) -> Config:
+    """擬似エクスポーター・擬似LINEサーバーを使う設定"""
+    fake_exporter = f"{sys.executable} {BENCH_DIR / 'fake_exporter.py'} --source {ics_file}"
+    return Config(
+        timetree={"email": "bench@example.com", "password": "bench", "exporter": {"command": fake_exporter}},
+        notification={
+            "line_channel_access_token": "bench",
+            "line_user_id": "U0000",
+            "line_user_ids": [f"U{i:04d}" for i in range(1, recipients)],
+            "api_base_url": api_base_url,
+            "rate_limit": 0,
+        },
+        paths={
+            "temp_ics": str(workdir / "export.ics"),
+            "backup_data": str(workdir / "backup.ics"),
+            "backup_history": str(workdir / "backup_history.sqlite3"),
+            "event_index": str(workdir / "event_index.sqlite3"),
+            "outbox": str(workdir / "outbox.sqlite3"),
+            "dispatch_state": str(workdir / "dispatch_state.json"),
+            "logs": str(workdir / "logs"),
+        },
+    )
+
+
+def repeat(func: Callable[[], object], runs: int) -> List[float]:
+    """func を runs 回実行して各回の秒数を返す"""
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - started)
+    return times
+
+
+def parse_all(notifier: DailySummaryNotifier, ics_file: Path) -> int:
+    """全VEVENTを解析して件数を返す"""
+    count = 0
+    for block in iter_vevent_blocks(ics_file):
+        notifier._parse_event_component(parse_vevent_block(block), TARGET_DATE)
+        count += 1
+    return count
+
+
+async def run_e2e(workdir: Path, ics_file: Path, recipients: int) -> Dict[str, float]:
+    """send_daily_summary を2回実行（初回、エクスポート内容が変わらない翌日分）"""
+    times = {}
+    async with FakeLineServer() as server:
+        notifier = DailySummaryNotifier(build_config(workdir, ics_file, server.base_url, recipients))
+        try:
+            for stage, target_date in (("e2e_cold", TARGET_DATE), ("e2e_warm", TARGET_DATE + timedelta(days=1))):
+                started = time.perf_counter()
+                if not await notifier.send_daily_summary(target_date):
+                    raise SystemExit(f"send_daily_summary failed ({stage})")
+                times[stage] = time.perf_counter() - started
+        finally:
+            await notifier.close()
+        if server.delivered != recipients * 2:
+            raise SystemExit(f"Fake LINE server received {server.delivered} messages, expected {recipients * 2}")
+    return times
+
+
+def bench_size(args, count: int, workdir: Path) -> List[dict]:
+    """1つの件数について全ステージを計測"""
+    results = []
+
+    def record(stage: str, times: List[float], **extra):
+        results.append({
+            "events": count,
+            "stage": stage,
+            "seconds": min(times),
+            "median": statistics.median(times),
+            "runs": len(times),
+            **extra,
+        })
+
+    ics_file = workdir / f"bench_{count}.ics"
+    started = time.perf_counter()
+    generate_ics(
+        ics_file, count, start_date=START_DATE, days=args.days, seed=args.seed,
+        recurring_ratio=args.recurring_ratio, all_day_ratio=args.all_day_ratio,
+        timezones=args.timezones, description_size=args.description_size,
+    )
+    record("generate", [time.perf_counter() - started], bytes=ics_file.stat().st_size)
+
+    notifier = DailySummaryNotifier(build_config(workdir, ics_file, "http://127.0.0.1:9", args.recipients))
+    if count <= args.parse_limit:
+        record("parse", repeat(lambda: parse_all(notifier, ics_file), args.repeat))
+
+    events = notifier._extract_today_events("default", ics_file, TARGET_DATE)
+    record("filter", repeat(lambda: notifier._extract_today_events("default", ics_file, TARGET_DATE), args.repeat),
+           matched=len(events))
+
+    send_at = datetime.combine(TARGET_DATE, datetime.min.time()) + timedelta(hours=7)
+    render_runs = 100
+    times = repeat(
+        lambda: [notifier._generate_daily_summary(TARGET_DATE, events, send_at) for _ in range(render_runs)],
+        args.repeat
+    )
+    record("render", [t / render_runs for t in times])
+
+    if count <= args.e2e_limit:
+        e2e_dir = workdir / f"e2e_{count}"
+        e2e_dir.mkdir()
+        for stage, elapsed in asyncio.run(run_e2e(e2e_dir, ics_file, args.recipients)).items():
+            record(stage, [elapsed], recipients=args.recipients)
+
+    ics_file.unlink()
+    return results
+
+
+def git_revision() -> Dict[str, object]:
+    """計測したコミット（取得できなければ None）"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--", "."], cwd=BENCH_DIR.parent,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def compare(results: List[dict], baseline_file: Path, threshold: float) -> int:
+    """基準のJSONと比較して表示し、threshold 倍以上遅くなった項目数を返す"""
+    baseline = json.loads(baseline_file.read_text(encoding="utf-8"))
+    previous = {(r["events"], r["stage"]): r["seconds"] for r in baseline["results"]}
+    print(f"\ncompared with {baseline_file} ({baseline['meta'].get('commit')})")
+    print(f"{'events':>8} | {'stage':<9} | {'base ms':>11} | {'this ms':>11} | {'ratio':>6}")
+
+    regressions = 0
+    for result in results:
+        base = previous.get((result["events"], result["stage"]))
+        if base is None or result["stage"] == "generate":
+            continue
+        ratio = result["seconds"] / base if base else float("inf")
+        flag = ""
+        if ratio >= threshold:
+            regressions += 1
+            flag = "  << slower"
+        print(f"{result['events']:>8} | {result['stage']:<9} | {base * 1000:>11.3f} | "
+              f"{result['seconds'] * 1000:>11.3f} | {ratio:>6.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="朝の通知処理 ベンチマークスイート")
+    parser.add_argument("--events", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3, help="parse/filter/render の計測回数")
+    parser.add_argument("--recipients", type=int, default=10)
+    parser.add_argument("--days", type=int, default=365, help="予定を散らばらせる日数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--recurring-ratio", type=float, default=0.02)
+    parser.add_argument("--all-day-ratio", type=float, default=0.1)
+    parser.add_argument("--timezones", nargs="+", default=["Asia/Tokyo", "UTC"])
+    parser.add_argument("--description-size", type=int, default=80)
+    parser.add_argument("--parse-limit", type=int, default=100000, help="この件数を超えると parse を省略する")
+    parser.add_argument("--e2e-limit", type=int, default=1000000, help="この件数を超えると e2e を省略する")
+    parser.add_argument("-o", "--output", type=Path, help="結果のJSON（既定: results/<commit>.json）")
+    parser.add_argument("--compare", type=Path, help="比較する基準のJSON")
+    parser.add_argument("--threshold", type=float, default=1.2, help="劣化とみなす比率")
+    args = parser.parse_args()
+
+    logger.remove()
+
+    revision = git_revision()
+    output = args.output or BENCH_DIR / "results" / f"{revision['commit'] or 'unknown'}.json"
+
+    results = []
+    print(f"{'events':>8} | {'stage':<9} | {'min ms':>11} | {'median ms':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in args.events:
+            workdir = Path(tmp) / str(count)
+            workdir.mkdir()
+            for result in bench_size(args, count, workdir):
+                results.append(result)
+                print(f"{result['events']:>8} | {result['stage']:<9} | "
+                      f"{result['seconds'] * 1000:>11.3f} | {result['median'] * 1000:>11.3f}")
+
+    report = {
+        "meta": {
+            **revision,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()},
+        },
+        "results": results,
+    }
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\nresults written to {output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            raise SystemExit(f"{regressions} stage(s) slower than {args.threshold}x baseline")
+
+
+if __name__ == "__main__":
+    main()
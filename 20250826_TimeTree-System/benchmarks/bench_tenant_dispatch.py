@@ -0,0 +1,128 @@
+"""送信先ごとの通知時刻による配信のシミュレーション
+
+通知時刻・タイムゾーンがばらばらの送信先を大量に登録し、時計を1分ずつ進めて
+TenantDispatcher を呼び出す。全送信先が現地の各日に1回だけ、設定した時刻
+（夏時間で存在しない時刻は切り替わった時点）に送られることを確認する。
+既定では欧州の夏時間開始日をまたぐ2日間を模擬する。
+
+    python benchmarks/bench_tenant_dispatch.py --tenants 10000 --days 2
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from loguru import logger  # noqa: E402
+
+from timetree_notifier.core.tenants import TenantDispatcher, TenantRegistry  # noqa: E402
+
+
+TIMEZONES = [
+    "Asia/Tokyo", "Asia/Kolkata", "Asia/Kathmandu", "Australia/Sydney", "Europe/London",
+    "Europe/Berlin", "America/New_York", "America/Los_Angeles", "America/St_Johns", "UTC",
+]
+
+
+def build_registry(count: int, start: datetime, seed: int) -> TenantRegistry:
+    """ランダムな通知時刻・タイムゾーンの送信先を登録"""
+    rng = random.Random(seed)
+    registry = TenantRegistry(now=start)
+    for i in range(count):
+        registry.add(f"U{i:06d}", f"{rng.randrange(24):02d}:{rng.randrange(60):02d}", rng.choice(TIMEZONES))
+    return registry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="送信先ごとの配信 シミュレーション")
+    parser.add_argument("--tenants", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=2)
+    parser.add_argument("--start", type=date.fromisoformat, default=date(2025, 3, 29))
+    parser.add_argument("--churn", type=int, default=100, help="1時間ごとに入れ替える送信先の数")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logger.remove()
+    start = datetime.combine(args.start, datetime.min.time(), tzinfo=timezone.utc)
+
+    started = time.perf_counter()
+    registry = build_registry(args.tenants, start, args.seed)
+    build_time = time.perf_counter() - started
+
+    sent = []
+    batches = Counter()
+
+    async def send_batch(target_date, user_ids):
+        batches[len(user_ids)] += 1
+        sent.extend((user_id, target_date, clock) for user_id in user_ids)
+        return True
+
+    async def simulate():
+        nonlocal clock
+        dispatcher = TenantDispatcher(registry, send_batch)
+        rng = random.Random(args.seed + 1)
+        churn_time = 0.0
+        for minute in range(args.days * 24 * 60):
+            clock = start + timedelta(minutes=minute)
+            if minute % 60 == 0 and args.churn:
+                # 送信先の追加・削除と、既存の送信先の再登録（設定の更新）
+                churn_started = time.perf_counter()
+                for i in range(args.churn):
+                    registry.add(f"X{i:06d}", "12:00", rng.choice(TIMEZONES))
+                    registry.remove(f"X{i:06d}")
+                    tenant = registry.get(f"U{rng.randrange(args.tenants):06d}")
+                    registry.add(tenant.user_id, tenant.time, tenant.timezone)
+                churn_time += time.perf_counter() - churn_started
+            await dispatcher.dispatch(clock + timedelta(seconds=rng.randrange(0, 5)))
+        return churn_time
+
+    clock = start
+    started = time.perf_counter()
+    churn_time = asyncio.run(simulate())
+    elapsed = time.perf_counter() - started
+
+    # 検証: 現地の各日に1回、通知時刻（または夏時間で飛ばされた直後）に送られていること
+    per_day = Counter((user_id, target_date) for user_id, target_date, _ in sent)
+    duplicates = [key for key, n in per_day.items() if n > 1]
+    late = 0
+    for user_id, target_date, at in sent:
+        tenant = registry.get(user_id)
+        local = at.astimezone(ZoneInfo(tenant.timezone))
+        if local.date() != target_date or local.strftime("%H:%M") != tenant.time:
+            late += 1
+    if duplicates:
+        raise SystemExit(f"{len(duplicates)} recipient(s) received more than once a day")
+
+    end = start + timedelta(days=args.days)
+    expected = 0
+    for tenant in registry:
+        zone = ZoneInfo(tenant.timezone)
+        day = start.astimezone(zone).date()
+        while day <= end.astimezone(zone).date():
+            hour, minute = map(int, tenant.time.split(":"))
+            local = datetime(day.year, day.month, day.day, hour, minute, tzinfo=zone)
+            # 存在しない現地時刻は zoneinfo では切り替え前のオフセットで解釈される
+            at = local.astimezone(timezone.utc)
+            if start <= at < end:
+                expected += 1
+            day += timedelta(days=1)
+    if len(sent) != expected:
+        raise SystemExit(f"Delivered {len(sent)} summaries, expected {expected}")
+
+    print(f"tenants={args.tenants} days={args.days} from {args.start} slots={len(registry.slot_sizes())}")
+    print(f"registry build : {build_time:8.3f} s")
+    print(f"simulation     : {elapsed:8.3f} s ({args.days * 1440} ticks, churn {churn_time * 1000:.1f} ms)")
+    print(f"deliveries     : {len(sent)} (expected {expected}), {sum(batches.values())} batches, "
+          f"largest {max(batches) if batches else 0}")
+    print(f"sent at DST-shifted time : {late}")
+
+
+if __name__ == "__main__":
+    main()
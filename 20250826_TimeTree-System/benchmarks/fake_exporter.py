@@ -0,0 +1,45 @@
+"""timetree-exporter の代わりに使う擬似エクスポーター
+
+指定秒数待ってからICSファイルを書き出す。exporter.command に指定すると
+TimeTreeにアクセスせずにエクスポートプールを動かせる。
+
+    python benchmarks/fake_exporter.py -o out.ics -e user@example.com --delay 2
+"""
+
+import argparse
+import shutil
+import sys
+import time
+import zlib
+from datetime import date
+from pathlib import Path
+
+from ics_generator import generate_ics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="擬似 timetree-exporter")
+    parser.add_argument("-o", "--output", required=True)
+    parser.add_argument("-e", "--email", default="")
+    parser.add_argument("--delay", type=float, default=0.0, help="書き出しまでの待ち時間（秒）")
+    parser.add_argument("--source", help="書き出す代わりにコピーするICSファイル")
+    parser.add_argument("--events", type=int, default=100)
+    parser.add_argument("--start-date", type=date.fromisoformat, default=None)
+    parser.add_argument("--fail", action="store_true", help="エラー終了する")
+    args = parser.parse_args()
+
+    time.sleep(args.delay)
+    if args.fail:
+        print(f"login failed for {args.email}", file=sys.stderr)
+        sys.exit(1)
+
+    output = Path(args.output)
+    if args.source:
+        shutil.copyfile(args.source, output)
+    else:
+        generate_ics(output, args.events, start_date=args.start_date or date.today(), days=1,
+                     seed=zlib.crc32(args.email.encode()))
+
+
+if __name__ == "__main__":
+    main()
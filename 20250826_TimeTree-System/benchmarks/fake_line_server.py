@@ -0,0 +1,155 @@
+"""LINE Messaging API のローカル代替サーバー
+
+api.line.me/v2/bot/message/push・multicast と同じ形式のリクエストを受け付け、
+受信内容を記録する。ベンチマークや動作確認で LineNotifier の送信先にする。
+fail_status を設定すると障害中として全リクエストをそのステータスで拒否する。
+rate_limit を設定すると1秒ごとのリクエスト数を制限し、超えた分は429と
+Retry-After で拒否する（rate_headers なら X-RateLimit-* ヘッダーも返す）。
+X-Line-Retry-Key が受付済みのキーと同じなら、LINEと同様に409を返す。
+
+    python benchmarks/fake_line_server.py --port 8080
+"""
+
+import argparse
+import asyncio
+import math
+import time
+from typing import List, Optional, Set
+
+from aiohttp import web
+
+
+class FakeLineServer:
+    """LINE push/multicast API の代替サーバー"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        rate_limit: Optional[int] = None,
+        rate_headers: bool = False,
+    ):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.rate_headers = rate_headers
+        self.throttled = 0
+        self._window = 0
+        self._window_requests = 0
+        self.received: List[dict] = []
+        self.requests = 0
+        self.fail_status: Optional[int] = None
+        self._retry_keys: Set[str] = set()
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def base_url(self) -> str:
+        """LineNotifier の api_base_url に渡すURL"""
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> "FakeLineServer":
+        """サーバーを起動（port=0 なら空きポートを使う）"""
+        app = web.Application()
+        app.router.add_post("/v2/bot/message/push", self._handle_push)
+        app.router.add_post("/v2/bot/message/multicast", self._handle_multicast)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        """サーバーを停止"""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> "FakeLineServer":
+        return await self.start()
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    @property
+    def delivered(self) -> int:
+        """受信したメッセージの送信先数の合計"""
+        return sum(len(body["to"]) if isinstance(body["to"], list) else 1 for body in self.received)
+
+    async def _handle_push(self, request: web.Request) -> web.Response:
+        """push API"""
+        return await self._handle(request, lambda to: isinstance(to, str))
+
+    async def _handle_multicast(self, request: web.Request) -> web.Response:
+        """multicast API（送信先は最大500件）"""
+        return await self._handle(
+            request, lambda to: isinstance(to, list) and 0 < len(to) <= 500
+        )
+
+    async def _handle(self, request: web.Request, valid_to) -> web.Response:
+        """リクエストを検証して記録"""
+        self.requests += 1
+        if not request.headers.get("Authorization", "").startswith("Bearer "):
+            return web.json_response({"message": "Authentication failed"}, status=401)
+
+        if self.fail_status:
+            return web.json_response({"message": "Service unavailable"}, status=self.fail_status)
+
+        headers = {}
+        if self.rate_limit:
+            now = time.monotonic()
+            if int(now) != self._window:
+                self._window, self._window_requests = int(now), 0
+            self._window_requests += 1
+            reset = self._window + 1 - now
+            if self.rate_headers:
+                headers = {
+                    "X-RateLimit-Limit": str(self.rate_limit),
+                    "X-RateLimit-Remaining": str(max(self.rate_limit - self._window_requests, 0)),
+                    "X-RateLimit-Reset": f"{reset:.3f}",
+                }
+            if self._window_requests > self.rate_limit:
+                self.throttled += 1
+                headers["Retry-After"] = str(math.ceil(reset))
+                return web.json_response({"message": "Too many requests"}, status=429, headers=headers)
+
+        body = await request.json()
+        # メッセージは1リクエスト5通まで
+        if not valid_to(body.get("to")) or not 0 < len(body.get("messages") or []) <= 5:
+            return web.json_response({"message": "The request body has 1 error(s)"}, status=400)
+
+        retry_key = request.headers.get("X-Line-Retry-Key")
+        if retry_key in self._retry_keys:
+            return web.json_response({"message": "The retry key is already accepted"}, status=409)
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if retry_key:
+            self._retry_keys.add(retry_key)
+        self.received.append(body)
+        return web.json_response({"sentMessages": [{"id": str(len(self.received))}]}, headers=headers)
+
+
+async def _serve(host: str, port: int, latency: float, rate_limit: Optional[int]):
+    async with FakeLineServer(host, port, latency, rate_limit) as server:
+        print(f"Fake LINE server listening on {server.base_url}")
+        await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LINE Messaging API 代替サーバー")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help="応答までの遅延(秒)")
+    parser.add_argument("--rate-limit", type=int, default=None, help="1秒あたりのリクエスト上限")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args.host, args.port, args.latency, args.rate_limit))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
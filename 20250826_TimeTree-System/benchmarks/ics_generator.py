@@ -0,0 +1,168 @@
+"""ベンチマーク用の合成ICSファイル生成
+
+件数・繰り返し予定の割合・終日予定の割合・タイムゾーン・説明の長さを指定して
+TimeTreeのエクスポートに近いICSファイルを作る。単体でも実行できる。
+
+    python benchmarks/ics_generator.py -o bench.ics --events 100000 \\
+        --recurring-ratio 0.05 --all-day-ratio 0.1 --timezones Asia/Tokyo UTC --description-size 200
+"""
+
+import argparse
+import random
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Optional, Sequence, Union
+
+
+# 説明文に使う語（カンマ・セミコロンなどエスケープが必要な文字は含めない）
+_WORDS = [
+    "打ち合わせ", "資料", "確認", "共有", "準備", "議事録", "予約", "持ち物", "集合", "連絡",
+    "meeting", "review", "agenda", "follow-up", "sync", "room", "zoom", "notes",
+]
+
+# 1行の最大オクテット数（RFC 5545）
+_LINE_OCTETS = 75
+
+
+def generate_ics(
+    output: Union[str, Path],
+    event_count: int,
+    start_date: date = date(2020, 1, 1),
+    days: int = 365 * 5,
+    seed: int = 0,
+    recurring_count: int = 0,
+    recurring_ratio: float = 0.0,
+    all_day_ratio: float = 0.0,
+    timezones: Sequence[str] = ("Asia/Tokyo",),
+    description_size: Optional[int] = None,
+) -> Path:
+    """指定件数のVEVENTを含むICSファイルを生成
+
+    recurring_ratio を指定すると event_count のうちその割合を繰り返し予定
+    （毎週・毎月・毎日、一部はEXDATE付き）にする。recurring_count はそれとは別に
+    追加する繰り返し予定の件数。all_day_ratio は終日予定の割合、timezones は
+    DTSTARTのTZIDの候補（"UTC" はZ付きのUTC時刻）。description_size を指定すると
+    平均その文字数の説明を付け、75オクテットで折り返す。
+    既定値のままなら、同じ seed で従来と同じ内容になる。
+    """
+    rng = random.Random(seed)
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+
+    series_count = int(event_count * recurring_ratio)
+    single_count = event_count - series_count
+
+    with open(output, "w", encoding="utf-8", newline="") as f:
+        f.write("BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//bench//timetree//JA\r\n")
+        for i in range(single_count):
+            day = start_date + timedelta(days=rng.randrange(days))
+            start = datetime.combine(day, datetime.min.time()) + timedelta(
+                hours=rng.randrange(7, 21), minutes=rng.choice([0, 15, 30, 45])
+            )
+            end = start + timedelta(minutes=rng.choice([30, 60, 90, 120]))
+            location = rng.randrange(10)
+            f.write("BEGIN:VEVENT\r\n")
+            f.write(f"UID:bench-{i}@timetree\r\n")
+            f.write(f"DTSTAMP:{start:%Y%m%dT%H%M%S}Z\r\n")
+            if all_day_ratio and rng.random() < all_day_ratio:
+                f.write(f"DTSTART;VALUE=DATE:{day:%Y%m%d}\r\n")
+                f.write(f"DTEND;VALUE=DATE:{day + timedelta(days=1):%Y%m%d}\r\n")
+            else:
+                tz_name = rng.choice(timezones) if len(timezones) > 1 else timezones[0]
+                f.write(_datetime_line("DTSTART", start, tz_name))
+                f.write(_datetime_line("DTEND", end, tz_name))
+            f.write(f"SUMMARY:予定 {i}\r\n")
+            f.write(f"LOCATION:会議室{location}\r\n")
+            if description_size is None:
+                f.write(f"DESCRIPTION:ベンチマーク用の説明 {i}\r\n")
+            else:
+                f.write(_fold(f"DESCRIPTION:{_description(rng, description_size)}"))
+            f.write("END:VEVENT\r\n")
+        for i in range(recurring_count + series_count):
+            day = start_date + timedelta(days=rng.randrange(days))
+            start = datetime.combine(day, datetime.min.time()) + timedelta(hours=rng.randrange(7, 21))
+            end = start + timedelta(hours=1)
+            rule = rng.choice([
+                "FREQ=WEEKLY",
+                "FREQ=WEEKLY;BYDAY=MO,WE,FR",
+                "FREQ=MONTHLY",
+                "FREQ=DAILY;COUNT=60",
+                f"FREQ=WEEKLY;UNTIL={(start + timedelta(days=365)):%Y%m%dT%H%M%S}Z",
+            ])
+            tz_name = rng.choice(timezones) if len(timezones) > 1 else timezones[0]
+            f.write("BEGIN:VEVENT\r\n")
+            f.write(f"UID:bench-series-{i}@timetree\r\n")
+            f.write(f"DTSTAMP:{start:%Y%m%dT%H%M%S}Z\r\n")
+            f.write(_datetime_line("DTSTART", start, tz_name))
+            f.write(_datetime_line("DTEND", end, tz_name))
+            f.write(f"RRULE:{rule}\r\n")
+            if rng.random() < 0.3:
+                skipped = start + timedelta(days=7 * rng.randrange(1, 10))
+                f.write(_datetime_line("EXDATE", skipped, tz_name))
+            f.write(f"SUMMARY:定例 {i}\r\n")
+            f.write("END:VEVENT\r\n")
+        f.write("END:VCALENDAR\r\n")
+
+    return output
+
+
+def _datetime_line(name: str, value: datetime, tz_name: str) -> str:
+    """日時プロパティの行（UTCはZ付き、それ以外はTZID付き）"""
+    if tz_name == "UTC":
+        return f"{name}:{value:%Y%m%dT%H%M%S}Z\r\n"
+    return f"{name};TZID={tz_name}:{value:%Y%m%dT%H%M%S}\r\n"
+
+
+def _description(rng: random.Random, size: int) -> str:
+    """平均 size 文字の説明文"""
+    length = rng.randint(size // 2, size * 3 // 2)
+    words = []
+    total = 0
+    while total < length:
+        word = rng.choice(_WORDS)
+        words.append(word)
+        total += len(word) + 1
+    return " ".join(words)[:length]
+
+
+def _fold(line: str) -> str:
+    """75オクテットごとに折り返した行（マルチバイト文字は分割しない）"""
+    parts = []
+    current = []
+    octets = 0
+    for char in line:
+        size = len(char.encode("utf-8"))
+        limit = _LINE_OCTETS if not parts else _LINE_OCTETS - 1
+        if octets + size > limit:
+            parts.append("".join(current))
+            current = []
+            octets = 0
+        current.append(char)
+        octets += size
+    parts.append("".join(current))
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ベンチマーク用ICSファイル生成")
+    parser.add_argument("-o", "--output", required=True)
+    parser.add_argument("--events", type=int, default=10000)
+    parser.add_argument("--start-date", type=date.fromisoformat, default=date(2020, 1, 1))
+    parser.add_argument("--days", type=int, default=365 * 5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--recurring-ratio", type=float, default=0.0)
+    parser.add_argument("--all-day-ratio", type=float, default=0.0)
+    parser.add_argument("--timezones", nargs="+", default=["Asia/Tokyo"])
+    parser.add_argument("--description-size", type=int, default=None, help="説明の平均文字数")
+    args = parser.parse_args()
+
+    output = generate_ics(
+        args.output, args.events, start_date=args.start_date, days=args.days, seed=args.seed,
+        recurring_ratio=args.recurring_ratio, all_day_ratio=args.all_day_ratio,
+        timezones=args.timezones, description_size=args.description_size,
+    )
+    print(f"{output} ({output.stat().st_size / 1024 / 1024:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
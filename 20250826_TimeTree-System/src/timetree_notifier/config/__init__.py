@@ -1,5 +1,12 @@
 """設定管理モジュール"""
 
-from .settings import Config
+import importlib
 
-__all__ = ["Config"]
\ No newline at end of file
+__all__ = ["Config"]
+
+
+def __getattr__(name):
+    # pydantic・yaml の読み込みは設定を使うときまで遅らせる
+    if name == "Config":
+        return importlib.import_module(".settings", __name__).Config
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,11 +1,44 @@
 """設定管理クラス"""
 
 import os
+import threading
 import yaml
 from pathlib import Path
-from typing import Optional
-from pydantic import BaseModel, Field, validator
-from dotenv import load_dotenv
+from typing import Dict, List, Mapping, Optional, Tuple
+from pydantic import BaseModel, Field, root_validator, validator
+from dotenv import dotenv_values, find_dotenv
+
+
+# .env から環境変数に設定した値と、設定する前の値（なければ None）
+_dotenv_applied: Dict[str, Tuple[str, Optional[str]]] = {}
+_dotenv_lock = threading.Lock()
+
+
+def _validate_time(v: str) -> str:
+    """HH:MM 形式の時刻かどうか"""
+    try:
+        parts = v.split(':')
+        if len(parts) != 2:
+            raise ValueError('時間は HH:MM 形式で入力してください')
+        hour, minute = map(int, parts)
+        if not (0 <= hour <= 23) or not (0 <= minute <= 59):
+            raise ValueError('有効な時間を入力してください (00:00-23:59)')
+        return v
+    except Exception as e:
+        raise ValueError(f'無効な時間フォーマット: {v}. 例: "07:30"') from e
+
+
+class RecipientScheduleConfig(BaseModel):
+    """送信先ごとの通知時刻"""
+    user_id: str = Field(..., description="LINE User ID")
+    # 未指定なら daily_summary.time / timezone を使う
+    time: Optional[str] = None
+    timezone: Optional[str] = None
+    
+    @validator('time')
+    def validate_time_format(cls, v):
+        """時間フォーマットの検証"""
+        return v if v is None else _validate_time(v)
 
 
 class DailySummaryConfig(BaseModel):
@@ -18,43 +51,148 @@ class DailySummaryConfig(BaseModel):
     max_events_display: int = 10
     notify_when_no_events: bool = True
     no_events_message: str = "今日は予定がありません\nゆっくりとした一日をお過ごしください！"
+    # 送信時刻の何分前に取得・メッセージ生成を済ませておくか（0で無効）
+    prefetch_minutes: int = 15
+    # 事前取得したサマリーを送信に使える期間（分）
+    cache_max_age_minutes: int = 120
+    # エクスポート内容のハッシュ・日付ごとにメモリに保持する抽出結果・メッセージの件数（0で無効、常駐中のみ有効）
+    content_cache_entries: int = 64
+    # エクスポートが失敗・遅延したときに送る予定を今日から何日分保持するか（0で無効）
+    fallback_days: int = 3
+    # エクスポートをこの秒数待っても終わらなければ保持している予定で先に送る
+    fallback_wait_seconds: float = 60.0
+    # 送信先ごとに通知時刻・タイムゾーンを変える場合に指定する
+    # （指定すると全送信先を1分ごとの配信ジョブでまとめて送る）
+    schedules: List[RecipientScheduleConfig] = Field(default_factory=list)
     
     @validator('time')
     def validate_time_format(cls, v):
         """時間フォーマットの検証"""
-        try:
-            parts = v.split(':')
-            if len(parts) != 2:
-                raise ValueError('時間は HH:MM 形式で入力してください')
-            hour, minute = map(int, parts)
-            if not (0 <= hour <= 23) or not (0 <= minute <= 59):
-                raise ValueError('有効な時間を入力してください (00:00-23:59)')
-            return v
-        except Exception as e:
-            raise ValueError(f'無効な時間フォーマット: {v}. 例: "07:30"') from e
+        return _validate_time(v)
 
 
-class TimeTreeConfig(BaseModel):
-    """TimeTree設定"""
+class DigestConfig(BaseModel):
+    """週間・月間など複数日分の予定まとめの設定"""
+    name: str = Field(..., description="まとめの名前（ジョブID・ログに使用）")
+    enabled: bool = True
+    # 期間の日数と、送信日から何日後を期間の初日にするか
+    days: int = 7
+    start_offset_days: int = 1
+    # 送信日時（day_of_week / day は CronTrigger の書式。例: "sun"、"1"）
+    time: str = "19:00"
+    day_of_week: str = "*"
+    day: str = "*"
+    title: str = "📆 来週の予定"
+    closing: str = "良い一週間を！✨"
+    no_events_message: str = "この期間の予定はありません"
+    
+    @validator('time')
+    def validate_time_format(cls, v):
+        """時間フォーマットの検証"""
+        return _validate_time(v)
+    
+    @validator('days')
+    def validate_days(cls, v):
+        """期間の日数の検証"""
+        if not 1 <= v <= 62:
+            raise ValueError(f'days は 1〜62 の範囲で指定してください: {v}')
+        return v
+
+
+class TimeTreeAccountConfig(BaseModel):
+    """TimeTreeアカウント設定"""
+    name: str = Field(..., description="アカウント名（一時ファイル・インデックス名に使用）")
     email: str = Field(..., description="TimeTreeのメールアドレス")
     password: str = Field(..., description="TimeTreeのパスワード")
+    # このアカウントの予定を受け取るLINE User ID（空なら全送信先）
+    recipients: List[str] = Field(default_factory=list)
+    # 未指定なら exporter.timeout を使う
+    timeout: Optional[int] = None
+    # timetree-exporter に追加で渡す引数（カレンダー指定など）
+    extra_args: List[str] = Field(default_factory=list)
+    
+    @validator('name')
+    def validate_name(cls, v):
+        """ファイル名に使える名前かどうか"""
+        if not v or not all(c.isalnum() or c in '-_' for c in v):
+            raise ValueError(f'アカウント名は英数字・-・_ で指定してください: {v!r}')
+        return v
+
+
+class TimeTreeConfig(BaseModel):
+    """TimeTree設定"""
+    email: str = Field("", description="TimeTreeのメールアドレス")
+    password: str = Field("", description="TimeTreeのパスワード")
+    accounts: List[TimeTreeAccountConfig] = Field(default_factory=list, description="複数アカウント設定")
     
     class ExporterConfig(BaseModel):
+        command: str = "timetree-exporter"
         timeout: int = 120
         retry_count: int = 3
         retry_delay: int = 30
+        # 同時に実行するエクスポートの上限
+        max_parallel: int = 4
     
     exporter: ExporterConfig = ExporterConfig()
+    
+    @root_validator(skip_on_failure=True)
+    def validate_accounts(cls, values):
+        """アカウントが1つ以上あり、名前が重複していないか"""
+        accounts = values.get('accounts') or []
+        if not accounts and not values.get('email'):
+            raise ValueError('timetree.email または timetree.accounts を設定してください')
+        names = [account.name for account in accounts]
+        if len(names) != len(set(names)):
+            raise ValueError(f'アカウント名が重複しています: {names}')
+        return values
+    
+    def get_accounts(self) -> List[TimeTreeAccountConfig]:
+        """全アカウント（email/passwordだけの従来設定は "default" として扱う）"""
+        if self.accounts:
+            return list(self.accounts)
+        if not self.email:
+            return []
+        return [TimeTreeAccountConfig(name="default", email=self.email, password=self.password)]
+    
+    @property
+    def is_multi_account(self) -> bool:
+        """accounts による複数アカウント設定かどうか"""
+        return bool(self.accounts)
 
 
 class NotificationConfig(BaseModel):
     """LINE通知設定"""
     line_channel_access_token: str = Field(..., description="LINE Messaging API チャンネルアクセストークン")
-    line_user_id: str = Field(..., description="送信先のLINE User ID")
+    line_user_id: str = Field("", description="送信先のLINE User ID")
+    line_user_ids: List[str] = Field(default_factory=list, description="追加の送信先LINE User ID")
+    api_base_url: str = "https://api.line.me"
+    request_timeout: float = 10.0
+    max_concurrent_sends: int = 10
+    # LINE APIへの送信レート（リクエスト/秒の初期値、0で制御しない）
+    rate_limit: float = 100.0
+    max_rate_limit: float = 2000.0
+    # 送信に失敗したメッセージの再送（アウトボックス）
+    retry_count: int = 5
+    retry_delay: float = 30.0
+    max_retry_delay: float = 1800.0
+    # 1通の文字数の上限と、入りきらない場合に分ける通数の上限（LINEは1リクエスト5通まで）
     max_message_length: int = 1000
+    max_messages: int = 5
     greeting: str = "🌅 おはようございます！今日の予定"
     closing: str = "今日も良い一日を！✨"
     footer: str = "TimeTree自動通知"
+    
+    @validator('max_messages')
+    def validate_max_messages(cls, v):
+        """通数の上限の検証"""
+        if not 1 <= v <= 5:
+            raise ValueError(f'max_messages は 1〜5 の範囲で指定してください: {v}')
+        return v
+    
+    def get_recipients(self) -> List[str]:
+        """全送信先（重複・空文字を除く）"""
+        recipients = [self.line_user_id, *self.line_user_ids]
+        return list(dict.fromkeys(r for r in recipients if r))
 
 
 class LoggingConfig(BaseModel):
@@ -65,27 +203,128 @@ class LoggingConfig(BaseModel):
     rotation: int = 7
 
 
+class MetricsConfig(BaseModel):
+    """計測値公開設定（/metrics エンドポイント）"""
+    enabled: bool = False
+    host: str = "127.0.0.1"
+    port: int = 9108
+
+
+class ExecutorConfig(BaseModel):
+    """ブロッキング処理を実行するプールの設定"""
+    io_workers: int = 4
+    cpu_workers: int = 2
+    # CPU処理（ICS解析・インデックス更新）を "thread" か "process" で実行
+    cpu_kind: str = "thread"
+    # このサイズ（MB）以上のICSは解析をプロセスに分けて並列に行う（0で無効）
+    parallel_parse_min_mb: float = 16.0
+    # 並列解析のプロセス数（0ならCPUコア数）
+    parse_workers: int = 0
+    
+    @validator('cpu_kind')
+    def validate_cpu_kind(cls, v):
+        """プールの種類の検証"""
+        if v not in ("thread", "process"):
+            raise ValueError(f'cpu_kind は "thread" か "process" を指定してください: {v!r}')
+        return v
+
+
+class LoopMonitorConfig(BaseModel):
+    """イベントループの遅延監視設定"""
+    enabled: bool = True
+    interval: float = 0.5
+    # この秒数を超えてループを占有した処理のスタックをログに出す
+    threshold: float = 0.25
+
+
+class ConfigReloadConfig(BaseModel):
+    """デーモン実行中の設定ファイル再読み込み設定"""
+    enabled: bool = True
+    # config.yaml・.env の変更を確認する間隔（秒）
+    interval: float = 5.0
+    
+    @validator('interval')
+    def validate_interval(cls, v):
+        """確認間隔の検証"""
+        if v <= 0:
+            raise ValueError(f'interval は0より大きい値を指定してください: {v}')
+        return v
+
+
+class ChangeAlertConfig(BaseModel):
+    """予定変更の通知設定（定期的にエクスポートし、追加・移動・取り消しを送る）"""
+    enabled: bool = False
+    # エクスポートして変更を確認する間隔（分）
+    interval_minutes: int = 5
+    # 今日から何日間の予定の変更を通知するか
+    lookahead_days: int = 3
+    # 最初の変更を見つけてから何分間の変更を1通にまとめるか
+    debounce_minutes: float = 10.0
+    title: str = "🔔 予定が変更されました"
+    
+    @validator('interval_minutes')
+    def validate_interval_minutes(cls, v):
+        """確認間隔の検証"""
+        if not 1 <= v <= 60:
+            raise ValueError(f'interval_minutes は1〜60で指定してください: {v}')
+        return v
+    
+    @validator('lookahead_days')
+    def validate_lookahead_days(cls, v):
+        """通知対象の日数の検証"""
+        if v < 1:
+            raise ValueError(f'lookahead_days は1以上を指定してください: {v}')
+        return v
+
+
+class BackupHistoryConfig(BaseModel):
+    """エクスポートの履歴（変更された予定だけを圧縮して保存）の設定"""
+    enabled: bool = True
+    # この日数より古い履歴を削除する
+    keep_days: int = 30
+    
+    @validator('keep_days')
+    def validate_keep_days(cls, v):
+        """保存日数の検証"""
+        if v < 1:
+            raise ValueError(f'keep_days は1以上を指定してください: {v}')
+        return v
+
+
 class PathsConfig(BaseModel):
     """パス設定"""
     temp_ics: str = "./temp/timetree_export.ics"
     backup_data: str = "./data/backup.ics"
+    backup_history: str = "./data/backup_history.sqlite3"
+    event_index: str = "./data/event_index.sqlite3"
+    outbox: str = "./data/outbox.sqlite3"
+    # 送信先ごとの通知時刻で送る場合の送信済みの記録
+    dispatch_state: str = "./data/dispatch_state.json"
     logs: str = "./logs"
 
 
 class Config(BaseModel):
     """メイン設定クラス"""
     daily_summary: DailySummaryConfig = DailySummaryConfig()
+    digests: List[DigestConfig] = Field(default_factory=list)
     timetree: TimeTreeConfig
     notification: NotificationConfig
     logging: LoggingConfig = LoggingConfig()
+    metrics: MetricsConfig = MetricsConfig()
+    executors: ExecutorConfig = ExecutorConfig()
+    loop_monitor: LoopMonitorConfig = LoopMonitorConfig()
+    config_reload: ConfigReloadConfig = ConfigReloadConfig()
+    change_alerts: ChangeAlertConfig = ChangeAlertConfig()
+    backup_history: BackupHistoryConfig = BackupHistoryConfig()
     paths: PathsConfig = PathsConfig()
     
     @classmethod
-    def load_from_file(cls, config_path: str = "config.yaml") -> "Config":
-        """設定ファイルから読み込み"""
-        
-        # 環境変数をロード
-        load_dotenv()
+    def load_from_file(cls, config_path: str = "config.yaml", override_env: bool = False) -> "Config":
+        """設定ファイルから読み込み（override_env なら .env の値で既存の環境変数も上書き）
+
+        .env の値は設定の検証に通ってから環境変数に反映する。前回 .env から設定した
+        変数が .env から消えていれば、設定する前の状態に戻す。
+        """
         
         # config.yamlを読み込み
         config_file = Path(config_path)
@@ -95,21 +334,37 @@ class Config(BaseModel):
         with open(config_file, 'r', encoding='utf-8') as f:
             config_data = yaml.safe_load(f)
         
-        # 環境変数の置換
-        config_data = cls._substitute_env_vars(config_data)
+        with _dotenv_lock:
+            env_path = env_file_path()
+            env_values = dotenv_values(env_path) if env_path else {}
+            changes, applied = _dotenv_changes(
+                {key: value for key, value in env_values.items() if value is not None}, override_env
+            )
+            environ = dict(os.environ)
+            for key, value in changes.items():
+                if value is None:
+                    environ.pop(key, None)
+                else:
+                    environ[key] = value
+            
+            # 環境変数の置換と検証（不正なら環境変数は変えない）
+            config = cls(**cls._substitute_env_vars(config_data, environ))
+            _apply_dotenv_changes(changes, applied)
         
-        return cls(**config_data)
+        return config
     
     @staticmethod
-    def _substitute_env_vars(data):
-        """環境変数の置換処理"""
+    def _substitute_env_vars(data, environ: Optional[Mapping[str, str]] = None):
+        """環境変数の置換処理（environ を省略すると os.environ を使う）"""
+        if environ is None:
+            environ = os.environ
         if isinstance(data, dict):
-            return {key: Config._substitute_env_vars(value) for key, value in data.items()}
+            return {key: Config._substitute_env_vars(value, environ) for key, value in data.items()}
         elif isinstance(data, list):
-            return [Config._substitute_env_vars(item) for item in data]
+            return [Config._substitute_env_vars(item, environ) for item in data]
         elif isinstance(data, str) and data.startswith('${') and data.endswith('}'):
             env_var = data[2:-1]
-            return os.getenv(env_var, data)
+            return environ.get(env_var, data)
         else:
             return data
     
@@ -118,8 +373,53 @@ class Config(BaseModel):
         dirs_to_create = [
             Path(self.paths.temp_ics).parent,
             Path(self.paths.backup_data).parent,
+            Path(self.paths.backup_history).parent,
+            Path(self.paths.event_index).parent,
+            Path(self.paths.outbox).parent,
+            Path(self.paths.dispatch_state).parent,
             Path(self.paths.logs)
         ]
         
         for dir_path in dirs_to_create:
-            dir_path.mkdir(parents=True, exist_ok=True)
\ No newline at end of file
+            dir_path.mkdir(parents=True, exist_ok=True)
+
+
+def env_file_path() -> str:
+    """読み込む .env のパス（見つからなければ空文字）"""
+    return find_dotenv()
+
+
+def _dotenv_changes(
+    values: Dict[str, str], override: bool
+) -> Tuple[Dict[str, Optional[str]], Dict[str, Tuple[str, Optional[str]]]]:
+    """.env の値を反映するために変える環境変数（値が None なら削除）と、反映後の記録"""
+    changes: Dict[str, Optional[str]] = {}
+    applied: Dict[str, Tuple[str, Optional[str]]] = {}
+    for key, (value, previous) in _dotenv_applied.items():
+        # .env から消えた変数は、ほかで書き換えられていなければ元に戻す
+        if key not in values and os.environ.get(key) == value:
+            changes[key] = previous
+    for key, value in values.items():
+        current = os.environ.get(key)
+        if key in _dotenv_applied and current == _dotenv_applied[key][0]:
+            applied[key] = (value, _dotenv_applied[key][1])
+        elif override or current is None:
+            applied[key] = (value, current)
+        else:
+            continue
+        if current != value:
+            changes[key] = value
+    return changes, applied
+
+
+def _apply_dotenv_changes(
+    changes: Dict[str, Optional[str]], applied: Dict[str, Tuple[str, Optional[str]]]
+):
+    """_dotenv_changes の結果を環境変数に反映して記録する"""
+    for key, value in changes.items():
+        if value is None:
+            os.environ.pop(key, None)
+        else:
+            os.environ[key] = value
+    _dotenv_applied.clear()
+    _dotenv_applied.update(applied)
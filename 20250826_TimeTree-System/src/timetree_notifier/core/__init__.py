@@ -1,7 +1,23 @@
-"""コア機能モジュール"""
+"""コア機能モジュール
 
-from .daily_notifier import DailySummaryNotifier
-from .scheduler import TimeTreeScheduler
-from .models import Event, NotificationResult
+各モジュールは使われたときに読み込む（status モードなどで icalendar・apscheduler・
+aiohttp を読み込まずに済ませるため）。
+"""
 
-__all__ = ["DailySummaryNotifier", "TimeTreeScheduler", "Event", "NotificationResult"]
\ No newline at end of file
+import importlib
+
+_EXPORTS = {
+    "DailySummaryNotifier": ".daily_notifier",
+    "TimeTreeScheduler": ".scheduler",
+    "Event": ".models",
+    "NotificationResult": ".models",
+}
+
+__all__ = ["DailySummaryNotifier", "TimeTreeScheduler", "Event", "NotificationResult"]
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module, __name__), name)
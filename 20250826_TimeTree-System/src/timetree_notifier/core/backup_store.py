@@ -0,0 +1,375 @@
+"""エクスポートしたICSの履歴（内容アドレス方式のバックアップ）
+
+ICSをヘッダー・VEVENTごと・フッターのチャンクに分け、内容のSHA-256をキーに
+各チャンクを1回だけ圧縮して保存する。スナップショットはチャンクの並び（マニフェスト）
+だけを持つため、保存のたびに増えるのは変更された予定の分だけになる。
+
+エクスポートのたびに変わる DTSTAMP 行はチャンクから取り除いてマニフェスト側に持ち、
+復元時に元の位置へ戻す（復元結果は元のファイルとバイト単位で一致する）。
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import time
+import zlib
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple, Union
+
+from loguru import logger
+
+from .ics_stream import iter_vevent_spans
+
+
+_SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY,
+    hash BLOB NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    account TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    content_hash TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    chunk_count INTEGER NOT NULL,
+    manifest BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_snapshots_account ON snapshots(account, created_at);
+"""
+
+_DTSTAMP_LINE = re.compile(rb"\r?\nDTSTAMP[;:][^\n]*")
+# 取り除いた DTSTAMP 行の位置（テキストのICSには現れないバイト列）
+_STAMP_MARK = b"\x00DTSTAMP\x00"
+
+# VEVENT 1件程度の小さなチャンクでも圧縮が効くよう、ICSによく現れる語を辞書として与える
+# （変更すると既存のチャンクを展開できなくなる）
+_ZDICT = (
+    b"BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:\r\nCALSCALE:GREGORIAN\r\nMETHOD:PUBLISH\r\n"
+    b"BEGIN:VTIMEZONE\r\nTZID:Asia/Tokyo\r\nBEGIN:STANDARD\r\nTZOFFSETFROM:+0900\r\nTZOFFSETTO:+0900\r\n"
+    b"TZNAME:JST\r\nEND:STANDARD\r\nEND:VTIMEZONE\r\n"
+    b"CREATED:LAST-MODIFIED:SEQUENCE:0\r\nSTATUS:CONFIRMED\r\nTRANSP:OPAQUE\r\nCATEGORIES:\r\n"
+    b"RRULE:FREQ=WEEKLY;BYDAY=\r\nRRULE:FREQ=DAILY;COUNT=\r\nEXDATE;TZID=Asia/Tokyo:\r\n"
+    b"RECURRENCE-ID;TZID=Asia/Tokyo:\r\nDTEND;VALUE=DATE:\r\nDTSTART;VALUE=DATE:\r\n"
+    b"LOCATION:\r\nDESCRIPTION:\r\nURL:https://timetreeapp.com/\r\nORGANIZER;CN=\r\n"
+    b"BEGIN:VALARM\r\nACTION:DISPLAY\r\nTRIGGER:-PT\r\nEND:VALARM\r\n"
+    b"END:VEVENT\r\nBEGIN:VEVENT\r\nUID:@timetree\r\nDTEND;TZID=Asia/Tokyo:DTSTART;TZID=Asia/Tokyo:"
+    b"SUMMARY:"
+)
+
+# IN (...) に渡す変数の数の上限（古いSQLiteの既定値 999 より小さくする）
+_QUERY_BATCH = 500
+
+
+@dataclass
+class BackupSnapshot:
+    """保存したエクスポート1回分"""
+    id: int
+    account: str
+    created_at: datetime
+    # 元のファイルのSHA-256とサイズ
+    content_hash: str
+    size: int
+    chunk_count: int
+
+
+class BackupStore:
+    """エクスポートの履歴（SQLite に保存）"""
+
+    def __init__(self, db_path: Union[str, Path]):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._init_schema()
+
+    def save(self, account: str, ics_file: Union[str, Path]) -> Optional[BackupSnapshot]:
+        """エクスポートをスナップショットとして保存
+
+        直前のスナップショットと内容が同じなら保存せず None を返す。
+        """
+        with open(ics_file, "rb") as f:
+            data = f.read()
+        content_hash = hashlib.sha256(data).hexdigest()
+
+        latest = self.latest(account)
+        if latest is not None and latest.content_hash == content_hash:
+            logger.debug(f"Backup for {account} unchanged since snapshot {latest.id}")
+            return None
+
+        chunks, stamps, stamp_refs = _split_chunks(data)
+        digests = [hashlib.sha256(chunk).digest() for chunk in chunks]
+        with self._connect() as conn:
+            known = self._chunk_ids(conn, set(digests))
+            new_chunks = 0
+            new_bytes = 0
+            chunk_ids = []
+            for digest, chunk in zip(digests, chunks):
+                chunk_id = known.get(digest)
+                if chunk_id is None:
+                    compressed = _compress(chunk)
+                    chunk_id = conn.execute(
+                        "INSERT INTO chunks (hash, size, data) VALUES (?, ?, ?)", (digest, len(chunk), compressed)
+                    ).lastrowid
+                    known[digest] = chunk_id
+                    new_chunks += 1
+                    new_bytes += len(compressed)
+                chunk_ids.append(chunk_id)
+
+            manifest = _encode_manifest(chunk_ids, stamps, stamp_refs)
+            created_at = time.time()
+            snapshot_id = conn.execute(
+                "INSERT INTO snapshots (account, created_at, content_hash, size, chunk_count, manifest) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (account, created_at, content_hash, len(data), len(chunk_ids), manifest)
+            ).lastrowid
+
+        logger.info(f"Backup snapshot {snapshot_id} for {account}: {len(chunk_ids)} chunk(s), "
+                    f"{new_chunks} new ({new_bytes / 1024:.1f} KiB), manifest {len(manifest) / 1024:.1f} KiB")
+        return BackupSnapshot(
+            id=snapshot_id,
+            account=account,
+            created_at=datetime.fromtimestamp(created_at),
+            content_hash=content_hash,
+            size=len(data),
+            chunk_count=len(chunk_ids),
+        )
+
+    def snapshots(self, account: Optional[str] = None) -> List[BackupSnapshot]:
+        """スナップショットの一覧（古い順）"""
+        query = "SELECT id, account, created_at, content_hash, size, chunk_count FROM snapshots"
+        params: tuple = ()
+        if account is not None:
+            query += " WHERE account = ?"
+            params = (account,)
+        with self._connect() as conn:
+            rows = conn.execute(query + " ORDER BY created_at, id", params).fetchall()
+        return [_snapshot_from_row(row) for row in rows]
+
+    def latest(self, account: str, before: Optional[datetime] = None) -> Optional[BackupSnapshot]:
+        """アカウントの最新のスナップショット（before を渡すとその時刻より前で最新のもの）"""
+        limit = before.timestamp() if before else float("inf")
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, account, created_at, content_hash, size, chunk_count FROM snapshots "
+                "WHERE account = ? AND created_at < ? ORDER BY created_at DESC, id DESC LIMIT 1",
+                (account, limit)
+            ).fetchone()
+        return _snapshot_from_row(row) if row else None
+
+    def find(self, account: str, day: date) -> Optional[BackupSnapshot]:
+        """その日（ローカル時刻）の終わりの時点のスナップショット"""
+        return self.latest(account, datetime.combine(day + timedelta(days=1), datetime.min.time()))
+
+    def read(self, snapshot_id: int) -> bytes:
+        """スナップショットの内容を復元"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT content_hash, manifest FROM snapshots WHERE id = ?", (snapshot_id,)
+            ).fetchone()
+            if row is None:
+                raise KeyError(f"Backup snapshot {snapshot_id} not found")
+            content_hash, manifest = row
+            chunk_ids, stamps, stamp_refs = _decode_manifest(manifest)
+            chunks = self._read_chunks(conn, set(chunk_ids))
+
+        parts = []
+        for chunk_id, stamp_ref in zip(chunk_ids, stamp_refs):
+            chunk = chunks[chunk_id]
+            if stamp_ref >= 0:
+                chunk = chunk.replace(_STAMP_MARK, stamps[stamp_ref], 1)
+            parts.append(chunk)
+        data = b"".join(parts)
+        if hashlib.sha256(data).hexdigest() != content_hash:
+            raise ValueError(f"Backup snapshot {snapshot_id} is corrupted (checksum mismatch)")
+        return data
+
+    def restore(self, snapshot_id: int, output: Union[str, Path]) -> Path:
+        """スナップショットをICSファイルとして書き出す"""
+        output = Path(output)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_bytes(self.read(snapshot_id))
+        return output
+
+    def prune(self, keep_days: int, now: Optional[datetime] = None) -> int:
+        """keep_days 日より古いスナップショットと、どこからも使われなくなったチャンクを削除
+
+        保存期間の始まりの時点の内容を復元できるよう、アカウントごとに期間より前で
+        最新のスナップショットは残す。削除したスナップショット数を返す。
+        """
+        cutoff = ((now or datetime.now()) - timedelta(days=keep_days)).timestamp()
+        with self._connect() as conn:
+            removed = conn.execute(
+                "DELETE FROM snapshots WHERE created_at < ? AND id NOT IN ("
+                "  SELECT (SELECT id FROM snapshots AS s WHERE s.account = a.account AND s.created_at < ? "
+                "          ORDER BY s.created_at DESC, s.id DESC LIMIT 1)"
+                "  FROM (SELECT DISTINCT account FROM snapshots) AS a"
+                ")",
+                (cutoff, cutoff)
+            ).rowcount
+            if not removed:
+                return 0
+
+            referenced: Set[int] = set()
+            for (manifest,) in conn.execute("SELECT manifest FROM snapshots"):
+                referenced.update(_decode_manifest(manifest)[0])
+            unused = [
+                chunk_id for (chunk_id,) in conn.execute("SELECT id FROM chunks")
+                if chunk_id not in referenced
+            ]
+            for batch in _batches(unused):
+                conn.execute(f"DELETE FROM chunks WHERE id IN ({_placeholders(batch)})", batch)
+
+        logger.info(f"Pruned {removed} backup snapshot(s) and {len(unused)} unused chunk(s)")
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        """スナップショット数・チャンク数・保存サイズ"""
+        with self._connect() as conn:
+            snapshots, manifest_bytes, original_bytes = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(manifest)), 0), COALESCE(SUM(size), 0) FROM snapshots"
+            ).fetchone()
+            chunks, chunk_bytes = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM chunks"
+            ).fetchone()
+        return {
+            "snapshots": snapshots,
+            "chunks": chunks,
+            "stored_bytes": chunk_bytes + manifest_bytes,
+            "original_bytes": original_bytes,
+        }
+
+    def _chunk_ids(self, conn: sqlite3.Connection, digests: Set[bytes]) -> Dict[bytes, int]:
+        """保存済みのチャンクのID（ハッシュ → ID）"""
+        found = {}
+        for batch in _batches(list(digests)):
+            found.update(conn.execute(
+                f"SELECT hash, id FROM chunks WHERE hash IN ({_placeholders(batch)})", batch
+            ).fetchall())
+        return found
+
+    def _read_chunks(self, conn: sqlite3.Connection, chunk_ids: Set[int]) -> Dict[int, bytes]:
+        """チャンクを展開して読み出す（ID → 内容）"""
+        chunks = {}
+        for batch in _batches(list(chunk_ids)):
+            for chunk_id, data in conn.execute(
+                f"SELECT id, data FROM chunks WHERE id IN ({_placeholders(batch)})", batch
+            ):
+                chunks[chunk_id] = _decompress(data)
+        missing = chunk_ids - chunks.keys()
+        if missing:
+            raise ValueError(f"Backup store is missing {len(missing)} chunk(s)")
+        return chunks
+
+    def _init_schema(self):
+        """スキーマを作成"""
+        with self._connect() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version not in (0, _SCHEMA_VERSION):
+                raise RuntimeError(f"Unsupported backup store version {version}: {self.db_path}")
+            conn.executescript(_SCHEMA)
+            conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """トランザクション付きで接続（スレッドをまたがないよう都度接続する）"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+
+def _split_chunks(data: bytes) -> Tuple[List[bytes], List[bytes], List[int]]:
+    """ICSをチャンクに分ける
+
+    (チャンク, DTSTAMP行の種類, チャンクごとのDTSTAMP行の番号（なければ -1）) を返す。
+    VEVENTの前後・間のテキストもそのままチャンクにする。
+    """
+    chunks: List[bytes] = []
+    stamps: Dict[bytes, int] = {}
+    stamp_refs: List[int] = []
+
+    def add(chunk: bytes, stamp_ref: int = -1):
+        chunks.append(chunk)
+        stamp_refs.append(stamp_ref)
+
+    pos = 0
+    for start, end in iter_vevent_spans(data):
+        if start > pos:
+            add(data[pos:start])
+        block = data[start:end]
+        match = _DTSTAMP_LINE.search(block)
+        if match:
+            stamp_ref = stamps.setdefault(match.group(0), len(stamps))
+            add(block[:match.start()] + _STAMP_MARK + block[match.end():], stamp_ref)
+        else:
+            add(block)
+        pos = end
+    if pos < len(data):
+        add(data[pos:])
+    return chunks, list(stamps), stamp_refs
+
+
+def _encode_manifest(chunk_ids: Sequence[int], stamps: Sequence[bytes], stamp_refs: Sequence[int]) -> bytes:
+    """チャンクの並びを圧縮して保存できる形にする
+
+    チャンクIDは前のIDとの差で持つ（変わらなかった部分は 1 が並ぶため小さく圧縮できる）。
+    """
+    deltas = [chunk_id - previous for previous, chunk_id in zip([0, *chunk_ids], chunk_ids)]
+    manifest = {
+        "chunks": deltas,
+        "stamps": [stamp.decode("latin-1") for stamp in stamps],
+        "stamp_refs": list(stamp_refs),
+    }
+    return zlib.compress(json.dumps(manifest, separators=(",", ":")).encode(), 9)
+
+
+def _decode_manifest(manifest: bytes) -> Tuple[List[int], List[bytes], List[int]]:
+    """_encode_manifest の逆"""
+    decoded = json.loads(zlib.decompress(manifest))
+    chunk_ids = []
+    chunk_id = 0
+    for delta in decoded["chunks"]:
+        chunk_id += delta
+        chunk_ids.append(chunk_id)
+    stamps = [stamp.encode("latin-1") for stamp in decoded["stamps"]]
+    return chunk_ids, stamps, decoded["stamp_refs"]
+
+
+def _compress(chunk: bytes) -> bytes:
+    compressor = zlib.compressobj(9, zdict=_ZDICT)
+    return compressor.compress(chunk) + compressor.flush()
+
+
+def _decompress(data: bytes) -> bytes:
+    decompressor = zlib.decompressobj(zdict=_ZDICT)
+    return decompressor.decompress(data) + decompressor.flush()
+
+
+def _batches(items: list) -> Iterator[list]:
+    for i in range(0, len(items), _QUERY_BATCH):
+        yield items[i:i + _QUERY_BATCH]
+
+
+def _placeholders(batch: Sequence) -> str:
+    return ",".join("?" * len(batch))
+
+
+def _snapshot_from_row(row: tuple) -> BackupSnapshot:
+    snapshot_id, account, created_at, content_hash, size, chunk_count = row
+    return BackupSnapshot(
+        id=snapshot_id,
+        account=account,
+        created_at=datetime.fromtimestamp(created_at),
+        content_hash=content_hash,
+        size=size,
+        chunk_count=chunk_count,
+    )
@@ -0,0 +1,359 @@
+"""予定変更の通知（エクスポートの差分から追加・移動・取り消しを知らせる）
+
+interval_minutes ごとにエクスポートし、内容が前回と同じなら何もしない。変わっていれば
+予定インデックスへ変わったVEVENTだけを取り込み（全件の再解析はしない）、
+今日から lookahead_days 日間の予定を識別キー（UID）ごとに前回と比べる。
+移動元・移動先の日時が分かるよう、比べる予定は通知対象の期間より CONTEXT_DAYS 日広く覚えておく。
+
+見つけた変更は debounce_minutes 分ためてから1通にまとめて送る。その間に同じ予定が
+続けて変わった場合は最初と最後の状態だけを比べる（追加してすぐ消した予定などは送らない）。
+"""
+
+import asyncio
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Set, Tuple
+
+from loguru import logger
+
+from .content_cache import file_sha256
+from .message_builder import MessageBuilder
+from .models import Delivery, Event
+
+if TYPE_CHECKING:
+    from .daily_notifier import DailySummaryNotifier
+
+
+ADDED = "added"
+MOVED = "moved"
+CHANGED = "changed"
+CANCELLED = "cancelled"
+
+_MARKS = {ADDED: "➕", MOVED: "🔁", CHANGED: "✏️", CANCELLED: "❌"}
+
+# 通知対象の期間の後ろに余分に覚えておく日数
+CONTEXT_DAYS = 30
+
+
+@dataclass
+class EventChange:
+    """予定1件（繰り返し予定は1回）の変更"""
+    kind: str
+    account: str
+    # 識別キー（繰り返し予定は回の開始日時を付ける）
+    key: str
+    # 変更後の予定（取り消しは取り消された予定）
+    event: Event
+    # 変更前の予定（分からない場合は None）
+    previous: Optional[Event] = None
+
+
+@dataclass
+class _Window:
+    """前回確認した時点のアカウントの予定"""
+    start: date
+    end: date
+    # 識別キー → 期間内の予定（繰り返し予定は複数）
+    events: Dict[str, List[Event]]
+    # インデックスにある全予定の識別キー
+    keys: Set[str]
+    content_hash: Optional[str] = None
+
+
+class ChangeAlertNotifier:
+    """定期的にエクスポートして予定の変更を通知
+
+    エクスポート・インデックス・送信は DailySummaryNotifier のものを使う。
+    """
+
+    def __init__(self, notifier: "DailySummaryNotifier"):
+        self.notifier = notifier
+        self._windows: Dict[str, _Window] = {}
+        # 送信待ちの変更（(アカウント, 識別キー) → 変更）
+        self._pending: Dict[Tuple[str, str], EventChange] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def poll(self, today: Optional[date] = None) -> List[EventChange]:
+        """エクスポートして前回からの変更を探し、送信待ちに加える（見つけた変更を返す）"""
+        notifier = self.notifier
+        with notifier.metrics.run("change_poll") as run:
+            today = today or notifier.today()
+            export_results = await notifier.export_pool.export_all()
+            notifier.metrics.record_exports(export_results)
+
+            found: List[EventChange] = []
+            for name, result in export_results.items():
+                if result.success:
+                    found.extend(await self._poll_account(name, result.output_file, today))
+            if found:
+                logger.info(f"Found {len(found)} event change(s)")
+                self._queue(found)
+            run["success"] = all(r.success for r in export_results.values())
+            return found
+
+    async def _poll_account(self, account_name: str, ics_file: Path, today: date) -> List[EventChange]:
+        """1アカウントのエクスポートを取り込み、前回確認した予定と比べる"""
+        notifier = self.notifier
+        content_hash = await notifier.executors.run_io(file_sha256, ics_file)
+        previous = self._windows.get(account_name)
+        if previous is not None and previous.content_hash == content_hash and previous.start == today:
+            return []
+
+        async with notifier.index_lock():
+            if previous is None:
+                # 起動後の初回は取り込む前のインデックスと比べる
+                previous = await notifier.executors.run_io(self._read_window, account_name, today)
+            diff = await notifier.update_event_index(account_name, ics_file, content_hash)
+            if diff is None:
+                return []
+            current = await notifier.executors.run_io(self._read_window, account_name, today, content_hash)
+        self._windows[account_name] = current
+
+        if not previous.keys:
+            # インデックスを初めて作った場合は全予定が追加に見えるため通知しない
+            logger.info(f"Change alerts for {account_name} start from {len(current.keys)} event(s)")
+            return []
+        return await notifier.executors.run_io(self._compare, account_name, previous, current)
+
+    def _read_window(self, account_name: str, today: date, content_hash: Optional[str] = None) -> _Window:
+        """インデックスから今日以降の予定と全予定の識別キーを読む"""
+        index = self.notifier.event_index(account_name)
+        lookahead = self.notifier.config.change_alerts.lookahead_days
+        end = today + timedelta(days=lookahead + CONTEXT_DAYS)
+        events: Dict[str, List[Event]] = {}
+        for uid_key, event in index.keyed_events_between(today, end):
+            events.setdefault(uid_key, []).append(event)
+        return _Window(today, end, events, index.keys(), content_hash)
+
+    def _compare(self, account_name: str, previous: _Window, current: _Window) -> List[EventChange]:
+        """前回と今回の予定を比べ、通知対象の期間に関わる変更を返す"""
+        start = max(previous.start, current.start)
+        end = min(previous.end, current.end)
+        relevant_end = current.start + timedelta(days=self.notifier.config.change_alerts.lookahead_days)
+
+        changes: List[EventChange] = []
+        moved_out: List[Tuple[str, Event]] = []
+        for key in previous.events.keys() | current.events.keys():
+            before = [e for e in previous.events.get(key, ()) if _overlaps(e, start, end)]
+            after = [e for e in current.events.get(key, ()) if _overlaps(e, start, end)]
+            if before == after:
+                continue
+            if len(before) > 1 or len(after) > 1:
+                changes.extend(_occurrence_changes(account_name, key, before, after))
+            elif before and after:
+                change = _single_change(account_name, key, before[0], after[0])
+                if change:
+                    changes.append(change)
+            elif after:
+                kind = MOVED if key in previous.keys else ADDED
+                changes.append(EventChange(kind, account_name, key, after[0]))
+            elif key in current.keys:
+                moved_out.append((key, before[0]))
+            else:
+                changes.append(EventChange(CANCELLED, account_name, key, before[0]))
+
+        # 期間外へ移動した予定は移動先の日時を調べる
+        if moved_out:
+            moved_to = self.notifier.event_index(account_name).events_by_key(key for key, _ in moved_out)
+            for key, event in moved_out:
+                new = moved_to.get(key)
+                if new is None:
+                    changes.append(EventChange(CANCELLED, account_name, key, event))
+                else:
+                    changes.append(EventChange(MOVED, account_name, key, new, event))
+
+        return [
+            change for change in changes
+            if _overlaps(change.event, current.start, relevant_end)
+            or (change.previous is not None and _overlaps(change.previous, current.start, relevant_end))
+        ]
+
+    def _queue(self, changes: Sequence[EventChange]):
+        """変更を送信待ちに加え、まとめて送るまでの待ち時間を開始"""
+        for change in changes:
+            key = (change.account, change.key)
+            merged = _merge(self._pending.get(key), change)
+            if merged is None:
+                self._pending.pop(key, None)
+            else:
+                self._pending[key] = merged
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        """送信待ちの変更があれば、まとめて送るまでの待ち時間を開始"""
+        if self._pending and self._flush_task is None:
+            delay = self.notifier.config.change_alerts.debounce_minutes * 60
+            self._flush_task = asyncio.ensure_future(self._flush_later(delay))
+
+    async def _flush_later(self, delay: float):
+        """delay 秒後に送る（失敗したら変更を送信待ちに戻し、もう一度待ってから送る）"""
+        await asyncio.sleep(delay)
+        self._flush_task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"Failed to send event changes, retrying later: {e}")
+            self._schedule_flush()
+
+    async def flush(self) -> bool:
+        """送信待ちの変更を送信先ごとに1通にまとめて送る（例外が起きたら送信待ちに戻す）"""
+        taken = dict(self._pending)
+        self._pending.clear()
+        if not taken:
+            return True
+        try:
+            return await self._send(list(taken.values()))
+        except Exception:
+            self._restore(taken)
+            raise
+
+    def _restore(self, taken: Dict[Tuple[str, str], EventChange]):
+        """送れなかった変更を送信待ちに戻す（その間に見つけた変更はあとに重ねる）"""
+        for key, change in taken.items():
+            newer = self._pending.pop(key, None)
+            merged = change if newer is None else _merge(change, newer)
+            if merged is not None:
+                self._pending[key] = merged
+
+    async def _send(self, pending: List[EventChange]) -> bool:
+        """変更を送信先ごとに1通にまとめて送る"""
+        deliveries = []
+        for account_names, recipients in self.notifier.recipient_groups().items():
+            changes = [change for change in pending if change.account in account_names]
+            if changes:
+                deliveries.append(Delivery(
+                    recipients=recipients,
+                    messages=self._build_messages(changes, len(account_names) > 1),
+                    accounts=sorted({change.account for change in changes}),
+                ))
+        if not deliveries:
+            return True
+
+        results = await self.notifier.send_deliveries(deliveries)
+        if all(results):
+            logger.info(f"Sent {len(pending)} event change(s) to {sum(len(d.recipients) for d in deliveries)} "
+                        f"recipient(s)")
+        else:
+            logger.error("Failed to send event changes to some recipients, queued for retry")
+        return all(results)
+
+    def _build_messages(self, changes: Sequence[EventChange], show_account: bool) -> List[str]:
+        """「➕ 追加 / 🔁 移動 / ✏️ 変更 / ❌ 取り消し」を1件1行で並べたメッセージ"""
+        config = self.notifier.config
+        notification = config.notification
+        builder = MessageBuilder(notification.max_message_length, notification.max_messages, [
+            "",
+            "---",
+            f"{notification.footer} | {datetime.now().strftime('%H:%M')}送信",
+        ])
+        builder.add(f"{config.change_alerts.title}（今後{config.change_alerts.lookahead_days}日間）", "")
+
+        ordered = sorted(changes, key=lambda change: (_sort_key(change.event), change.key))
+        for shown, change in enumerate(ordered):
+            prefix = f"[{change.account}] " if show_account else ""
+            if not builder.add(f"{_MARKS[change.kind]} {prefix}{_describe(change)}"):
+                builder.add_overflow(f"  ... 他{len(ordered) - shown}件の変更")
+                break
+        return builder.build()
+
+    async def close(self):
+        """送信待ちの変更があれば待たずに送る"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        if self._pending:
+            await self.flush()
+
+
+def _single_change(account_name: str, key: str, before: Event, after: Event) -> Optional[EventChange]:
+    """同じ予定の前後の比較（説明だけの変更は通知しない）"""
+    if (before.start_time, before.end_time) != (after.start_time, after.end_time):
+        return EventChange(MOVED, account_name, key, after, before)
+    if (before.title, before.location) != (after.title, after.location):
+        return EventChange(CHANGED, account_name, key, after, before)
+    return None
+
+
+def _occurrence_changes(
+    account_name: str, key: str, before: Sequence[Event], after: Sequence[Event]
+) -> List[EventChange]:
+    """繰り返し予定の回ごとの比較（開始日時が同じ回どうしを比べる）"""
+    before_by_start = {_sort_key(event): event for event in before}
+    after_by_start = {_sort_key(event): event for event in after}
+    changes = []
+    for start, event in after_by_start.items():
+        occurrence_key = f"{key}@{start[1].isoformat()}"
+        old = before_by_start.get(start)
+        if old is None:
+            changes.append(EventChange(ADDED, account_name, occurrence_key, event))
+        else:
+            change = _single_change(account_name, occurrence_key, old, event)
+            if change:
+                changes.append(change)
+    for start, event in before_by_start.items():
+        if start not in after_by_start:
+            changes.append(EventChange(CANCELLED, account_name, f"{key}@{start[1].isoformat()}", event))
+    return changes
+
+
+def _merge(first: Optional[EventChange], second: EventChange) -> Optional[EventChange]:
+    """送信待ちの変更に同じ予定の新しい変更を重ねる（打ち消し合えば None）"""
+    if first is None:
+        return second
+    if first.kind == ADDED:
+        if second.kind == CANCELLED:
+            return None
+        return EventChange(ADDED, second.account, second.key, second.event)
+    # 最初の変更前の状態と最後の状態を比べ直す
+    original = first.event if first.kind == CANCELLED else first.previous
+    if second.kind == CANCELLED:
+        if original is None:
+            return None
+        return EventChange(CANCELLED, second.account, second.key, original)
+    if original is None:
+        return EventChange(MOVED, second.account, second.key, second.event)
+    return _single_change(second.account, second.key, original, second.event)
+
+
+def _describe(change: EventChange) -> str:
+    """変更1件の表示"""
+    event, previous = change.event, change.previous
+    if change.kind == MOVED:
+        if previous is None:
+            return f"{_when(event)} {event.title}（日時変更）"
+        return f"{_when(previous)} → {_when(event)} {event.title}"
+    if change.kind == CHANGED and previous is not None:
+        was = previous.title if previous.title != event.title else f"📍{previous.location or 'なし'}"
+        return f"{_when(event)} {event.title}（旧: {was}）"
+    return f"{_when(event)} {event.title}"
+
+
+def _when(event: Event) -> str:
+    """「09/05（金） 10:00-11:00」"""
+    day = _start_date(event)
+    return f"{day.strftime('%m/%d')}（{'月火水木金土日'[day.weekday()]}） {event.format_time_range()}"
+
+
+def _start_date(event: Event) -> date:
+    start = event.start_time
+    return start.date() if isinstance(start, datetime) else start
+
+
+def _overlaps(event: Event, start: date, end: date) -> bool:
+    """予定が start から end の前日までと重なるか（日付単位）"""
+    first = _start_date(event)
+    last = event.end_time or event.start_time
+    last = last.date() if isinstance(last, datetime) else last
+    if last > first and not isinstance(event.end_time, datetime):
+        # 終日予定の終了日は含まない
+        last -= timedelta(days=1)
+    return first < end and last >= start
+
+
+def _sort_key(event: Event) -> Tuple[int, datetime]:
+    """終日予定を先頭にした開始日時順のキー"""
+    start = event.start_time
+    if isinstance(start, datetime):
+        return (1, start.replace(tzinfo=None))
+    return (0, datetime.combine(start, datetime.min.time()))
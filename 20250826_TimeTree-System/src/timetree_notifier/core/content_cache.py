@@ -0,0 +1,71 @@
+"""エクスポート内容のハッシュをキーにした結果のキャッシュ
+
+エクスポートしたICSが前回とバイト単位で同じなら、解析・抽出・メッセージ生成の結果も
+同じになる。ファイルのSHA-256をキーに含めて結果を保持し、一致すれば解析から
+やり直さずに使う。件数の上限を超えたら最後に使ってから最も古いものを捨てる。
+保持するのはプロセス内だけで、再起動後・別の日付では予定インデックス側で
+取り込み済みの内容（EventIndex.source_hash）と比べて取り込みを省略する。
+"""
+
+import hashlib
+import mmap
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Hashable, Optional, Union
+
+from ..utils.metrics import Counter, Gauge, MetricsRegistry
+
+
+class ContentCache:
+    """LRUで件数を制限したキャッシュ（ヒット・ミス数を計測値として公開）"""
+
+    def __init__(self, name: str, max_entries: int = 64, registry: Optional[MetricsRegistry] = None):
+        self.name = name
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        labels = {"cache": name}
+        self.hits = Counter("timetree_content_cache_hits_total", "内容ハッシュのキャッシュのヒット数", labels)
+        self.misses = Counter("timetree_content_cache_misses_total", "内容ハッシュのキャッシュのミス数", labels)
+        if registry is not None:
+            registry.register(self.hits)
+            registry.register(self.misses)
+            registry.register(Gauge(
+                "timetree_content_cache_entries", "内容ハッシュのキャッシュの保持件数", labels, func=self.__len__
+            ))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """保持している値（なければ None）"""
+        value = self._entries.get(key)
+        if value is None:
+            self.misses.inc()
+            return None
+        self._entries.move_to_end(key)
+        self.hits.inc()
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        """値を保持（上限を超えたら最も古いものを捨てる）"""
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """全て破棄（設定が変わった場合など）"""
+        self._entries.clear()
+
+
+def file_sha256(path: Union[str, Path]) -> str:
+    """ファイル内容のSHA-256（16進）"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                digest.update(mm)
+        except ValueError:
+            # 空ファイルは mmap できない
+            pass
+    return digest.hexdigest()
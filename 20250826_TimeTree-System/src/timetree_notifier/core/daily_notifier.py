@@ -1,166 +1,749 @@
 """毎朝の定時通知機能"""
 
 import asyncio
-import subprocess
-import time
-from datetime import datetime, date
+from concurrent.futures import Executor
+from datetime import datetime, date, timedelta
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
 from zoneinfo import ZoneInfo
 
-from icalendar import Calendar
 from loguru import logger
 
-from .models import Event, NotificationResult, ExportResult, DailySummary
+from .backup_store import BackupStore
+from .content_cache import ContentCache, file_sha256
+from .event_batch import EventBatch
+from .event_index import EventIndex
+from .executors import StageExecutors
+from .export_pool import ExportPool, account_path
+from .fallback import FallbackStore
+from .ics_stream import iter_candidate_blocks, parse_vevent_block
+from .ingest import ExportDiff
+from .line_notifier import LineNotifier
+from .message_builder import EventLineFormatter, MessageBuilder
+from .models import Delivery, Event, ExportResult, DailySummary
+from .outbox import FAILED, PENDING, SENDING, SENT, Outbox, OutboxWorker
+from .pipeline_metrics import PipelineMetrics
 from ..config import Config
+from ..config.settings import DigestConfig
+from ..utils.metrics import Gauge
+
+
+OUTBOX_STATUSES = (PENDING, SENDING, SENT, FAILED)
 
 
 class DailySummaryNotifier:
-    """毎朝の定時通知管理クラス"""
+    """毎朝の定時通知管理クラス
+    
+    TimeTreeアカウントごとにエクスポート・インデックス・バックアップを持ち、
+    送信先ごとに購読しているアカウントの予定をまとめて1通のサマリーにする。
+    """
     
     def __init__(self, config: Config):
         self.config = config
-        self.line_notifier = LineNotifier(
-            config.notification.line_channel_access_token, 
-            config.notification.line_user_id
+        self.line_notifier = _build_line_notifier(config)
+        self.export_pool = ExportPool(config.timetree, config.paths.temp_ics)
+        self.outbox = Outbox(config.paths.outbox)
+        self.executors = StageExecutors(config.executors)
+        self.outbox_worker = OutboxWorker(
+            self.outbox,
+            self.line_notifier,
+            retry_count=config.notification.retry_count,
+            retry_delay=config.notification.retry_delay,
+            max_retry_delay=config.notification.max_retry_delay,
+            executors=self.executors,
+        )
+        # 予定の表示行は内容が同じなら実行をまたいで使い回す
+        self.event_formatter = EventLineFormatter(
+            config.daily_summary.include_description, config.daily_summary.include_location
         )
+        self._prepare_lock: Optional[asyncio.Lock] = None
+        self.metrics = PipelineMetrics()
+        self._register_metrics()
+        self.event_indexes: Dict[str, EventIndex] = {}
+        self._backup_store: Optional[BackupStore] = None
+        self._ready_indexes: Set[str] = set()
+        # アカウント → インデックスに最後に取り込んだエクスポートのSHA-256
+        self._index_hashes: Dict[str, Optional[str]] = {}
+        self.last_export_diffs: Dict[str, ExportDiff] = {}
+        # 事前取得した送信内容（日付ごと）
+        self._delivery_cache: Dict[date, List[Delivery]] = {}
+        # 送信先ごとの通知時刻で送る場合の、同じ日の他の時刻用のエクスポート結果（取得時刻と組）
+        self._export_cache: Dict[date, Tuple[datetime, Dict[str, ExportResult]]] = {}
+        # エクスポートの内容（SHA-256）が同じなら解析・抽出・メッセージ生成をやり直さない
+        cache_entries = config.daily_summary.content_cache_entries
+        self.events_cache = ContentCache("events", cache_entries, self.metrics.registry)
+        self.render_cache = ContentCache("render", cache_entries, self.metrics.registry)
+        # エクスポートが失敗・遅延したときに代わりに送る、直近に取得できた予定
+        self.fallback = FallbackStore()
+        self._revalidations: Set[asyncio.Task] = set()
         
-    async def send_daily_summary(self, target_date: Optional[date] = None) -> bool:
-        """毎朝の予定サマリー送信"""
-        try:
-            if target_date is None:
-                target_date = datetime.now(ZoneInfo(self.config.daily_summary.timezone)).date()
-            
-            logger.info(f"Starting daily summary for {target_date}")
-            
-            # TimeTree-Exporterでデータ取得
-            export_result = await self._execute_timetree_exporter()
-            
-            if not export_result.success:
-                logger.error(f"TimeTree export failed: {export_result.error_message}")
-                return await self._send_error_notification(target_date, export_result.error_message)
-            
-            # 今日の予定を抽出
-            today_events = self._extract_today_events(export_result.output_file, target_date)
-            
-            # 日次サマリー生成
-            summary = self._generate_daily_summary(target_date, today_events)
-            
-            # LINE通知送信
-            result = await self.line_notifier.send_message(summary.message)
-            
-            if result.success:
-                logger.info(f"Daily summary sent successfully for {target_date}")
-                # バックアップファイル保存
-                self._backup_ics_file(export_result.output_file)
+    async def send_daily_summary(
+        self, target_date: Optional[date] = None, recipients: Optional[Sequence[str]] = None
+    ) -> bool:
+        """毎朝の予定サマリー送信
+        
+        事前取得済みの送信内容があればそれを送信し、なければその場で取得する。
+        recipients を指定した場合はその送信先にだけ送り、エクスポート結果は同じ日の
+        他の送信先のためにキャッシュに残す（メッセージは送信時刻ごとに生成する）。
+        エクスポートが失敗した・fallback_wait_seconds 秒で終わらない場合は前回取得できた
+        予定で先に送り、最新の予定の確認と訂正はバックグラウンドで行う。
+        """
+        with self.metrics.run("send") as run:
+            try:
+                if target_date is None:
+                    target_date = self.today()
+                
+                logger.info(f"Starting daily summary for {target_date}")
+                
+                keep_cache = recipients is not None
+                deliveries = None if keep_cache else self._take_cached_deliveries(target_date)
+                
+                pending_export = None
+                if deliveries is None:
+                    export_results = self._take_cached_exports(target_date) if keep_cache else None
+                    if export_results is None:
+                        # TimeTree-Exporterで全アカウントのデータを並行取得
+                        export_task = asyncio.ensure_future(self.export_pool.export_all())
+                        export_results = await self._wait_for_export(export_task, target_date)
+                        if export_results is None:
+                            pending_export = export_task
+                            export_results = self._pending_export_results()
+                        else:
+                            self.metrics.record_exports(export_results)
+                            if keep_cache and all(r.success for r in export_results.values()):
+                                self._export_cache[target_date] = (datetime.now(), export_results)
+                    # 送信時刻はフッターに入るため、キャッシュしたエクスポート結果からでも毎回生成する
+                    # （予定の抽出は内容のハッシュが同じなら省略される）
+                    deliveries = await self._prepare_deliveries(export_results, target_date)
+                
+                if recipients is not None:
+                    deliveries = _select_recipients(deliveries, recipients)
+                
+                results = await self.send_deliveries(deliveries)
+                await self._backup_delivered(deliveries, results)
+                
+                stale = [d for d in deliveries if d.stale_accounts]
+                if stale:
+                    self._start_revalidation(target_date, stale, pending_export)
+                
+                success = all(results)
+                if success:
+                    logger.info(f"Daily summary sent successfully for {target_date}")
+                run["success"] = success
+                return success
+                
+            except Exception as e:
+                logger.error(f"Unexpected error in daily summary: {e}")
+                return await self._send_error_notification(target_date, str(e))
+    
+    async def _wait_for_export(
+        self, export_task: "asyncio.Future", target_date: date
+    ) -> Optional[Dict[str, ExportResult]]:
+        """エクスポートの完了を待つ
+        
+        全アカウントの代わりの予定がある場合だけ fallback_wait_seconds 秒で待つのをやめて None を返す
+        （エクスポートは続ける）。
+        """
+        wait = self.config.daily_summary.fallback_wait_seconds
+        if wait > 0 and await self._fallback_ready(target_date):
+            done, _ = await asyncio.wait({export_task}, timeout=wait)
+            if not done:
+                logger.warning(f"Export did not finish within {wait:g}s, sending the last known events")
+                return None
+        return await export_task
+    
+    def _pending_export_results(self) -> Dict[str, ExportResult]:
+        """エクスポートが終わっていないアカウントの結果（失敗として扱う）"""
+        wait = self.config.daily_summary.fallback_wait_seconds
+        return {
+            account.name: ExportResult(
+                success=False,
+                account=account.name,
+                error_message=f"{wait:g}秒以内にTimeTreeから取得できませんでした",
+                error_type="timeout",
+            )
+            for account in self.config.timetree.get_accounts()
+        }
+    
+    async def _backup_delivered(self, deliveries: List[Delivery], results: Sequence[bool]):
+        """全送信先に届いたアカウントだけバックアップファイル保存"""
+        backed_up: Set[str] = set()
+        failed_accounts: Set[str] = set()
+        for delivery, sent in zip(deliveries, results):
+            if delivery.is_error:
+                continue
+            if sent:
+                backed_up.update(delivery.accounts)
             else:
-                logger.error(f"Failed to send daily summary: {result.error_message}")
+                failed_accounts.update(delivery.accounts)
+                logger.error(f"Failed to send daily summary to {len(delivery.recipients)} "
+                             f"recipient(s), queued for retry")
+        
+        with self.metrics.stage("backup").time():
+            for account in self.config.timetree.get_accounts():
+                if account.name in backed_up - failed_accounts:
+                    await self.executors.run_io(
+                        self._backup_ics_file, self.export_pool.output_file(account), account.name
+                    )
+    
+    def _start_revalidation(
+        self, target_date: date, sent: List[Delivery], pending_export: Optional["asyncio.Future"] = None
+    ):
+        """代わりの予定で送った分の確認をバックグラウンドで開始"""
+        task = asyncio.ensure_future(self._revalidate(target_date, sent, pending_export))
+        self._revalidations.add(task)
+        task.add_done_callback(self._revalidations.discard)
+    
+    async def _revalidate(
+        self, target_date: date, sent: List[Delivery], pending_export: Optional["asyncio.Future"] = None
+    ) -> bool:
+        """代わりの予定で送った分を最新の予定と比べ、違っていた送信先にだけ訂正を送る
+        
+        エクスポートが終わっていなければ待ち、失敗していればもう一度エクスポートする。
+        """
+        with self.metrics.run("revalidate") as run:
+            try:
+                if pending_export is not None:
+                    export_results = await pending_export
+                else:
+                    export_results = await self.export_pool.export_all()
+                self.metrics.record_exports(export_results)
+                
+                stale_accounts = {name for delivery in sent for name in delivery.stale_accounts}
+                if not any(export_results[name].success for name in stale_accounts if name in export_results):
+                    logger.warning(f"Events for {target_date} are still unavailable, keeping the last known ones")
+                    return False
+                
+                fresh = await self._prepare_deliveries(
+                    export_results, target_date,
+                    notes=["🔄 先ほどの通知から予定が変わっていたため、最新の内容をお送りします"]
+                )
+                fresh_by_recipient = {r: delivery for delivery in fresh for r in delivery.recipients}
+                
+                corrections: List[Delivery] = []
+                confirmed: List[Delivery] = []
+                for delivery in sent:
+                    for new in _group_by_delivery(delivery.recipients, fresh_by_recipient):
+                        if new.is_error or set(new.stale_accounts) >= set(delivery.stale_accounts):
+                            continue
+                        if list(new.summary.events) == list(delivery.summary.events):
+                            confirmed.append(new)
+                        else:
+                            corrections.append(new)
+                
+                results = await self.send_deliveries(corrections) if corrections else []
+                await self._backup_delivered(confirmed + corrections, [True] * len(confirmed) + results)
+                logger.info(f"Revalidated summary for {target_date}: "
+                            f"{sum(len(d.recipients) for d in corrections)} recipient(s) corrected")
+                success = all(results)
+                run["success"] = success
+                return success
+                
+            except Exception as e:
+                logger.error(f"Unexpected error in revalidation: {e}")
+                return False
+    
+    async def wait_revalidations(self):
+        """バックグラウンドで行っている訂正の確認が終わるまで待つ"""
+        if self._revalidations:
+            await asyncio.gather(*self._revalidations, return_exceptions=True)
+    
+    async def prefetch_daily_summary(
+        self, target_date: Optional[date] = None, send_at: Optional[datetime] = None
+    ) -> bool:
+        """送信前にエクスポート・解析・メッセージ生成を済ませてキャッシュ
+        
+        send_at にはメッセージのフッターに表示する送信予定時刻を渡す。
+        1つでもエクスポートに失敗した場合はキャッシュせず、送信時に取得し直す。
+        """
+        with self.metrics.run("prefetch") as run:
+            try:
+                if target_date is None:
+                    target_date = self.today()
+                
+                logger.info(f"Prefetching daily summary for {target_date}")
+                
+                export_results = await self.export_pool.export_all()
+                self.metrics.record_exports(export_results)
+                failed = [r for r in export_results.values() if not r.success]
+                if failed or not export_results:
+                    logger.warning(f"Prefetch export failed for {len(failed)} account(s)")
+                    return False
+                
+                self._delivery_cache[target_date] = await self._prepare_deliveries(
+                    export_results, target_date, send_at
+                )
+                export_time = max(r.execution_time for r in export_results.values())
+                logger.info(f"Daily summary for {target_date} cached ({export_time:.1f}s export)")
+                run["success"] = True
+                return True
+                
+            except Exception as e:
+                logger.error(f"Unexpected error in prefetch: {e}")
+                return False
+    
+    async def send_digest(self, digest: DigestConfig, start_date: Optional[date] = None) -> bool:
+        """週間・月間など複数日分の予定まとめを送信
+        
+        期間の予定はアカウントごとにインデックスへ1回問い合わせて取得し、日ごとに振り分ける。
+        """
+        with self.metrics.run("digest") as run:
+            try:
+                if start_date is None:
+                    start_date = self.today() + timedelta(days=digest.start_offset_days)
+                
+                logger.info(f"Starting {digest.name} digest for {start_date} ({digest.days} days)")
+                
+                export_results = await self.export_pool.export_all()
+                self.metrics.record_exports(export_results)
+                deliveries = await self._prepare_deliveries(export_results, start_date, digest=digest)
+                results = await self.send_deliveries(deliveries)
+                
+                success = all(results)
+                if success:
+                    logger.info(f"{digest.name} digest sent successfully for {start_date}")
+                else:
+                    logger.error(f"Failed to send {digest.name} digest to some recipients, queued for retry")
+                run["success"] = success
+                return success
+                
+            except Exception as e:
+                logger.error(f"Unexpected error in {digest.name} digest: {e}")
+                return await self._send_error_notification(start_date, str(e))
+    
+    async def send_deliveries(self, deliveries: List[Delivery]) -> List[bool]:
+        """LINE通知送信（アウトボックスに記録してから送り、失敗分は後で再送する）"""
+        with self.metrics.stage("send").time():
+            entry_ids = await self.executors.run_io(
+                self.outbox.enqueue_many,
+                [(delivery.recipients, delivery.messages, None) for delivery in deliveries]
+            )
+            results = await asyncio.gather(*(
+                self.outbox_worker.deliver(ids) for ids in entry_ids
+            ))
+        self.metrics.record_deliveries(
+            sent=sum(results),
+            queued=len(results) - sum(results),
+            recipients=sum(len(delivery.recipients) for delivery in deliveries)
+        )
+        return list(results)
+    
+    async def _prepare_deliveries(
+        self,
+        export_results: Dict[str, ExportResult],
+        target_date: date,
+        send_at: Optional[datetime] = None,
+        digest: Optional[DigestConfig] = None,
+        notes: Sequence[str] = (),
+    ) -> List[Delivery]:
+        """エクスポート結果から送信先ごとの送信内容を生成
+        
+        購読アカウントの組み合わせが同じ送信先は同じメッセージになるため1つにまとめる。
+        アカウントごとの解析・抽出はプールで並行して実行する。
+        digest を渡すと target_date からの期間のまとめを生成する。
+        日次サマリーで取得に失敗したアカウントは、直近に取得できた予定があればそれを使い、
+        その時刻を注記する。notes は全送信先のメッセージに付ける注記。
+        """
+        days = digest.days if digest else 1
+        # フッターの送信時刻（メッセージのキャッシュのキーにも使う）
+        send_at = send_at or datetime.now()
+        # 事前取得と送信が重なっても同じインデックスを同時に更新しない
+        async with self.index_lock():
+            succeeded_exports = [(name, r) for name, r in export_results.items() if r.success]
+            prepared = await asyncio.gather(*(
+                self._prepare_account_events(name, result.output_file, target_date, days)
+                for name, result in succeeded_exports
+            ))
+        events_by_account: Dict[str, List[Event]] = {
+            name: events for (name, _), (events, _) in zip(succeeded_exports, prepared)
+        }
+        content_hashes: Dict[str, Optional[str]] = {
+            name: content_hash for (name, _), (_, content_hash) in zip(succeeded_exports, prepared)
+        }
+        fallbacks = {}
+        if digest is None:
+            failed_names = [name for name in export_results if name not in events_by_account]
+            fallbacks = await self._fallback_events(failed_names, target_date)
+        
+        deliveries = []
+        for account_names, recipients in self.recipient_groups().items():
+            succeeded = [name for name in account_names if name in events_by_account]
+            stale = [name for name in account_names if name in fallbacks]
+            failed = [export_results[name] for name in account_names
+                      if name in export_results and name not in events_by_account and name not in fallbacks]
             
-            return result.success
+            if not succeeded and not stale:
+                error_message = "\n".join(
+                    f"{r.account}: {r.error_message}" if len(account_names) > 1 else str(r.error_message)
+                    for r in failed
+                ) or "Unknown error"
+                logger.error(f"TimeTree export failed: {error_message}")
+                deliveries.append(Delivery(
+                    recipients=recipients,
+                    messages=[self._build_error_message(target_date, error_message)],
+                ))
+                continue
             
-        except Exception as e:
-            logger.error(f"Unexpected error in daily summary: {e}")
-            return await self._send_error_notification(target_date, str(e))
+            group_notes = [f"⚠️ {r.account} の予定を取得できませんでした" for r in failed]
+            for name in stale:
+                as_of = fallbacks[name][1].strftime('%m/%d %H:%M')
+                prefix = f"{name}: " if len(account_names) > 1 else ""
+                group_notes.append(f"🕒 {prefix}{as_of}時点のデータです（最新の予定を取得できませんでした）")
+            group_notes.extend(notes)
+            render_key = None
+            if not stale and all(content_hashes[name] for name in succeeded):
+                render_key = (
+                    tuple((name, content_hashes[name]) for name in succeeded), tuple(group_notes),
+                    target_date, repr(digest) if digest else None, send_at.strftime('%H:%M')
+                )
+            summary = self.render_cache.get(render_key) if render_key else None
+            if summary is None:
+                events = _merge_events(
+                    [events_by_account[name] for name in succeeded] + [fallbacks[name][0] for name in stale]
+                )
+                with self.metrics.stage("render").time():
+                    if digest is None:
+                        summary = self._generate_daily_summary(target_date, events, send_at, group_notes)
+                    else:
+                        summary = self._generate_digest(digest, target_date, events, send_at, group_notes)
+                if render_key:
+                    self.render_cache.put(render_key, summary)
+            deliveries.append(Delivery(
+                recipients=recipients,
+                messages=summary.messages,
+                accounts=succeeded,
+                summary=summary,
+                stale_accounts=stale,
+            ))
+        
+        return deliveries
     
-    async def _execute_timetree_exporter(self) -> ExportResult:
-        """TimeTree-Exporterの実行"""
-        temp_file = Path(self.config.paths.temp_ics)
-        temp_file.parent.mkdir(parents=True, exist_ok=True)
+    def index_lock(self) -> asyncio.Lock:
+        """予定インデックスを更新する処理どうしの排他（イベントループ上で初めて使うときに作成）"""
+        if self._prepare_lock is None:
+            self._prepare_lock = asyncio.Lock()
+        return self._prepare_lock
+    
+    def recipient_groups(self) -> Dict[tuple, List[str]]:
+        """購読アカウントの組み合わせ → 送信先
+        
+        recipients を指定していないアカウントは通知設定の全送信先に配信する。
+        """
+        default_recipients = self.config.notification.get_recipients()
+        subscriptions: Dict[str, List[str]] = {}
+        for account in self.config.timetree.get_accounts():
+            for recipient in account.recipients or default_recipients:
+                subscriptions.setdefault(recipient, []).append(account.name)
         
-        start_time = time.time()
+        groups: Dict[tuple, List[str]] = {}
+        for recipient, account_names in subscriptions.items():
+            groups.setdefault(tuple(account_names), []).append(recipient)
+        return groups
+    
+    async def _prepare_account_events(
+        self, account_name: str, ics_file: Path, target_date: date, days: int = 1
+    ) -> Tuple[List[Event], Optional[str]]:
+        """1アカウントのエクスポート結果をインデックスへ反映し、今日（から days 日間）の予定を抽出
         
+        予定とエクスポートの内容のSHA-256を返す。前回と同じ内容・期間なら解析せずに前回の予定を返す。
+        インデックスが既に同じ内容を取り込んでいれば（日付が変わった・再起動した場合も）取り込みを省略する。
+        """
         try:
-            cmd = [
-                "timetree-exporter",
-                "-o", str(temp_file),
-                "-e", self.config.timetree.email
-            ]
-            
-            # 環境変数設定
-            import os
-            env = os.environ.copy()
-            env.update({
-                "TIMETREE_EMAIL": self.config.timetree.email,
-                "TIMETREE_PASSWORD": self.config.timetree.password
-            })
-            
-            logger.debug(f"Executing: {' '.join(cmd)}")
-            
-            # プロセス実行
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                env=env
+            content_hash = await self.executors.run_io(file_sha256, ics_file)
+        except OSError as e:
+            logger.warning(f"Failed to hash export for {account_name}: {e}")
+            content_hash = None
+        
+        cache_key = (account_name, content_hash, target_date, days)
+        # 間に別の内容を取り込んでいたら、インデックスを今回の内容に戻すため取り込み直す
+        indexed = content_hash is not None and await self._index_hash(account_name) == content_hash
+        events = self.events_cache.get(cache_key) if indexed else None
+        if events is not None:
+            logger.info(f"Export for {account_name} unchanged (sha256 {content_hash[:12]}), "
+                        f"reusing {len(events)} event(s)")
+            if days == 1:
+                self.metrics.record_events(account_name, len(events))
+                await self._refresh_fallback(account_name, ics_file, target_date, content_hash, events)
+            return events, content_hash
+        
+        # 予定インデックス更新
+        if indexed:
+            logger.info(f"Event index for {account_name} already holds this export "
+                        f"(sha256 {content_hash[:12]}), skipping ingest")
+            self._ready_indexes.add(account_name)
+        else:
+            with self.metrics.stage("parse").time():
+                diff = await self.update_event_index(account_name, ics_file, content_hash)
+            if diff is not None:
+                self.metrics.record_index(account_name, diff)
+        
+        # 今日の予定を抽出
+        with self.metrics.stage("filter").time():
+            events = await self.executors.run_io(
+                self._extract_today_events, account_name, ics_file, target_date, days
             )
-            
+        if content_hash:
+            self.events_cache.put(cache_key, events)
+        if days == 1:
+            self.metrics.record_events(account_name, len(events))
+            await self._refresh_fallback(account_name, ics_file, target_date, content_hash, events)
+        return events, content_hash
+    
+    async def _refresh_fallback(
+        self, account_name: str, ics_file: Path, target_date: date, content_hash: Optional[str], events: List[Event]
+    ):
+        """取得できた予定を、次に取得できなかったときのために今日から fallback_days 日分保持"""
+        days = self.config.daily_summary.fallback_days
+        if days <= 0 or self.fallback.refresh(account_name, target_date, content_hash):
+            return
+        try:
+            if days > 1:
+                events = await self.executors.run_io(
+                    self._extract_today_events, account_name, ics_file, target_date, days
+                )
+            by_day = _merge_events([events]).split_days(target_date, days)
+            self.fallback.put(account_name, target_date, [day.to_events() for day in by_day], content_hash)
+        except Exception as e:
+            logger.warning(f"Failed to keep fallback events for {account_name}: {e}")
+    
+    async def _fallback_ready(self, target_date: date) -> bool:
+        """全アカウントに代わりに送れる予定があるか"""
+        names = [account.name for account in self.config.timetree.get_accounts()]
+        return bool(names) and len(await self._fallback_events(names, target_date)) == len(names)
+    
+    async def _fallback_events(
+        self, account_names: Iterable[str], target_date: date
+    ) -> Dict[str, Tuple[List[Event], datetime]]:
+        """アカウントごとの直近に取得できた target_date の予定と取得時刻
+        
+        再起動直後などで保持していないアカウントは、ディスク上の予定インデックスから読み込む。
+        """
+        if self.config.daily_summary.fallback_days <= 0:
+            return {}
+        found = {}
+        for name in account_names:
+            if name not in self.fallback:
+                await self.executors.run_io(self._load_fallback_from_index, name, target_date)
+            cached = self.fallback.get(name, target_date)
+            if cached is not None:
+                found[name] = cached
+        return found
+    
+    def _load_fallback_from_index(self, account_name: str, target_date: date):
+        """前回までに取り込んだ予定インデックスから代わりの予定を読み込む（更新時刻を取得時刻とする）"""
+        db_path = self._account_path(self.config.paths.event_index, account_name)
+        if not db_path.exists():
+            return
+        try:
+            days = self.config.daily_summary.fallback_days
+            events = self.event_index(account_name).events_between(target_date, target_date + timedelta(days=days))
+            by_day = _merge_events([events]).split_days(target_date, days)
+            as_of = datetime.fromtimestamp(db_path.stat().st_mtime)
+            self.fallback.put(account_name, target_date, [day.to_events() for day in by_day], as_of=as_of)
+            logger.info(f"Loaded fallback events for {account_name} from index (as of {as_of:%m/%d %H:%M})")
+        except Exception as e:
+            logger.warning(f"Failed to load fallback events for {account_name}: {e}")
+    
+    def apply_config(self, config: Config) -> Optional[LineNotifier]:
+        """再読み込みした設定に切り替え（パス・実行プールは作り直さない）
+        
+        LINEの接続設定が変わった場合は新しい LineNotifier に切り替え、閉じる必要のある
+        古いものを返す。事前取得した送信内容は古い設定で作ったものなので破棄する。
+        """
+        previous = self.config
+        retired = None
+        if _line_settings(config) != _line_settings(previous):
+            retired = self.line_notifier
+            self.line_notifier = _build_line_notifier(config)
+            # 応答時間の計測は引き継ぐ
+            self.line_notifier.send_latency = retired.send_latency
+            self._register_line_metrics()
+            self.outbox_worker.notifier = self.line_notifier
+        
+        notification = config.notification
+        self.outbox_worker.retry_count = notification.retry_count
+        self.outbox_worker.retry_delay = notification.retry_delay
+        self.outbox_worker.max_retry_delay = notification.max_retry_delay
+        
+        if config.timetree != previous.timetree:
+            self.export_pool = ExportPool(config.timetree, config.paths.temp_ics)
+        
+        summary = config.daily_summary
+        if (summary.include_description, summary.include_location) != (
+            previous.daily_summary.include_description, previous.daily_summary.include_location
+        ):
+            self.event_formatter = EventLineFormatter(summary.include_description, summary.include_location)
+        
+        self._delivery_cache.clear()
+        self._export_cache.clear()
+        self.events_cache.clear()
+        self.render_cache.clear()
+        self.fallback.clear()
+        self.events_cache.max_entries = self.render_cache.max_entries = summary.content_cache_entries
+        self.config = config
+        return retired
+    
+    def _register_metrics(self):
+        """LINE送信・アウトボックスの計測値を登録"""
+        self._register_line_metrics()
+        for status in OUTBOX_STATUSES:
+            self.metrics.registry.register(Gauge(
+                "timetree_outbox_messages", "アウトボックスの状態ごとのメッセージ数", {"status": status},
+                func=lambda status=status: self.outbox.counts().get(status, 0)
+            ))
+    
+    def _register_line_metrics(self):
+        """LINE送信の計測値を登録（同じ名前の登録済みのものは置き換える）"""
+        registry = self.metrics.registry
+        registry.register(self.line_notifier.send_latency)
+        if self.line_notifier.rate_limiter:
+            registry.register(self.line_notifier.rate_limiter.wait_time)
+            registry.register(self.line_notifier.rate_limiter.send_rate)
+            registry.register(self.line_notifier.rate_limiter.accept_rate)
+    
+    def recipient_ids(self) -> List[str]:
+        """いずれかのアカウントの予定を受け取る全送信先"""
+        return [r for recipients in self.recipient_groups().values() for r in recipients]
+    
+    def _take_cached_exports(self, target_date: date) -> Optional[Dict[str, ExportResult]]:
+        """同じ日の他の送信先向けに取得したエクスポート結果（古すぎる場合は破棄して None）"""
+        cached = self._export_cache.get(target_date)
+        if cached is None:
+            return None
+        exported_at, export_results = cached
+        max_age = timedelta(minutes=self.config.daily_summary.cache_max_age_minutes)
+        if datetime.now() - exported_at > max_age:
+            del self._export_cache[target_date]
+            logger.info(f"Cached export for {target_date} is stale, refreshing")
+            return None
+        logger.info(f"Using cached export for {target_date}")
+        return export_results
+    
+    def _take_cached_deliveries(self, target_date: date) -> Optional[List[Delivery]]:
+        """事前取得した送信内容を取り出す（古すぎる場合は破棄して None）"""
+        deliveries = self._delivery_cache.pop(target_date, None)
+        if deliveries is None:
+            return None
+        
+        max_age = timedelta(minutes=self.config.daily_summary.cache_max_age_minutes)
+        generated_at = min(
+            (d.summary.generated_at for d in deliveries if d.summary), default=datetime.now()
+        )
+        if datetime.now() - generated_at > max_age:
+            logger.info(f"Cached summary for {target_date} is stale, refreshing")
+            return None
+        
+        logger.info(f"Using prefetched summary for {target_date}")
+        return deliveries
+    
+    def today(self) -> date:
+        """設定タイムゾーンでの今日の日付"""
+        return datetime.now(ZoneInfo(self.config.daily_summary.timezone)).date()
+    
+    def _account_path(self, path: str, account_name: str) -> Path:
+        """アカウントごとのファイルパス"""
+        return account_path(path, account_name, self.config.timetree.is_multi_account)
+    
+    def event_index(self, account_name: str) -> EventIndex:
+        """アカウントの予定インデックス（初回アクセス時に作成）"""
+        index = self.event_indexes.get(account_name)
+        if index is None:
+            index = EventIndex(
+                self._account_path(self.config.paths.event_index, account_name),
+                self.config.daily_summary.timezone
+            )
+            self.event_indexes[account_name] = index
+        return index
+    
+    async def _index_hash(self, account_name: str) -> Optional[str]:
+        """インデックスに最後に取り込んだエクスポートのSHA-256（起動後の初回はインデックスから読む）"""
+        if account_name not in self._index_hashes:
             try:
-                stdout, stderr = await asyncio.wait_for(
-                    process.communicate(),
-                    timeout=self.config.timetree.exporter.timeout
+                self._index_hashes[account_name] = await self.executors.run_io(
+                    self.event_index(account_name).source_hash
+                )
+            except Exception as e:
+                logger.warning(f"Failed to read event index state for {account_name}: {e}")
+                return None
+        return self._index_hashes[account_name]
+    
+    async def update_event_index(
+        self, account_name: str, ics_file: Path, content_hash: Optional[str] = None
+    ) -> Optional[ExportDiff]:
+        """エクスポート結果を予定インデックスへ差分反映（CPU用プールで実行）
+
+        content_hash はエクスポートのSHA-256で、インデックスがどの内容まで反映済みかの記録に使う。
+        """
+        self._index_hashes.pop(account_name, None)
+        try:
+            event_index = self.event_index(account_name)
+            backup_path = self._account_path(self.config.paths.backup_data, account_name)
+            parse_pool = self.executors.parse_pool_for(ics_file)
+            if parse_pool is not None:
+                # 解析はプロセスに分散し、取りまとめとSQLiteへの書き込みはスレッドで行う
+                diff = await self.executors.run_io(
+                    _ingest_export, event_index, ics_file, backup_path, parse_pool, self.executors.parse_workers,
+                    content_hash
                 )
-            except asyncio.TimeoutError:
-                process.kill()
-                return ExportResult(
-                    success=False,
-                    error_message="TimeTree-Exporter execution timeout",
-                    error_type="timeout",
-                    execution_time=time.time() - start_time
+            elif self.executors.cpu_is_process:
+                diff = await self.executors.run_cpu(
+                    _ingest_export_in_process, event_index.db_path, self.config.daily_summary.timezone,
+                    ics_file, backup_path, content_hash
                 )
-            
-            execution_time = time.time() - start_time
-            
-            if process.returncode == 0:
-                if temp_file.exists() and temp_file.stat().st_size > 0:
-                    return ExportResult(
-                        success=True,
-                        output_file=temp_file,
-                        execution_time=execution_time
-                    )
-                else:
-                    return ExportResult(
-                        success=False,
-                        error_message="ICS file was not created or is empty",
-                        error_type="empty_output",
-                        execution_time=execution_time
-                    )
+                # 別プロセスで消えた繰り返し予定の展開結果を破棄
+                event_index.recurrence.retain(set(event_index.fingerprints()))
             else:
-                error_msg = stderr.decode() if stderr else "Unknown error"
-                return ExportResult(
-                    success=False,
-                    error_message=error_msg,
-                    error_type="execution_error",
-                    execution_time=execution_time
+                diff = await self.executors.run_cpu(
+                    _ingest_export, event_index, ics_file, backup_path, None, 1, content_hash
                 )
-                
+            self._ready_indexes.add(account_name)
+            self._index_hashes[account_name] = content_hash
+            self.last_export_diffs[account_name] = diff
+            return diff
         except Exception as e:
-            return ExportResult(
-                success=False,
-                error_message=str(e),
-                error_type="system_error",
-                execution_time=time.time() - start_time
-            )
+            self._ready_indexes.discard(account_name)
+            logger.error(f"Failed to update event index for {account_name}: {e}")
+            return None
+    
+    def _extract_today_events(
+        self, account_name: str, ics_file: Path, target_date: date, days: int = 1
+    ) -> List[Event]:
+        """今日（から days 日間）の予定を抽出（インデックス優先、使えない場合はICSを直接走査）
+        
+        期間が複数日でもインデックスへの問い合わせは1回だけ行う。
+        """
+        if account_name in self._ready_indexes:
+            try:
+                events = self.event_index(account_name).events_between(
+                    target_date, target_date + timedelta(days=days)
+                )
+                events.sort(key=_event_sort_key)
+                logger.info(f"Extracted {len(events)} events for {target_date} "
+                            f"({days} day(s)) from index ({account_name})")
+                return events
+            except Exception as e:
+                logger.warning(f"Event index query failed, scanning ICS instead: {e}")
+        
+        return self._scan_today_events(ics_file, target_date, days)
     
-    def _extract_today_events(self, ics_file: Path, target_date: date) -> List[Event]:
-        """ICSファイルから今日の予定を抽出"""
+    def _scan_today_events(self, ics_file: Path, target_date: date, days: int = 1) -> List[Event]:
+        """ICSファイルから今日（から days 日間）の予定を抽出"""
         events = []
         
         try:
-            with open(ics_file, 'rb') as f:
-                calendar = Calendar.from_ical(f.read())
-            
-            for component in calendar.walk():
-                if component.name == "VEVENT":
-                    try:
-                        event = self._parse_event_component(component, target_date)
-                        if event:
-                            events.append(event)
-                    except Exception as e:
-                        logger.warning(f"Failed to parse event: {e}")
-                        continue
+            # DTSTARTで事前に絞り込んだVEVENTだけを1件ずつ解析する
+            for block in iter_candidate_blocks(ics_file, target_date, days):
+                try:
+                    component = parse_vevent_block(block)
+                    event = self._parse_event_component(component, target_date, days)
+                    if event:
+                        events.append(event)
+                except Exception as e:
+                    logger.warning(f"Failed to parse event: {e}")
+                    continue
             
             # 時間順でソート
-            events.sort(key=lambda e: e.start_time if isinstance(e.start_time, datetime) else datetime.combine(e.start_time, datetime.min.time()))
+            events.sort(key=_event_sort_key)
             
             logger.info(f"Extracted {len(events)} events for {target_date}")
             return events
@@ -169,8 +752,8 @@ class DailySummaryNotifier:
             logger.error(f"Failed to parse ICS file: {e}")
             return []
     
-    def _parse_event_component(self, component, target_date: date) -> Optional[Event]:
-        """ICSコンポーネントからEventオブジェクトを生成"""
+    def _parse_event_component(self, component, target_date: date, days: int = 1) -> Optional[Event]:
+        """ICSコンポーネントからEventオブジェクトを生成（target_date から days 日間に始まる予定のみ）"""
         try:
             # 開始時間の取得
             dtstart = component.get('dtstart')
@@ -179,9 +762,9 @@ class DailySummaryNotifier:
             
             start_time = dtstart.dt
             
-            # 日付の比較
-            event_date = start_time if isinstance(start_time, date) else start_time.date()
-            if event_date != target_date:
+            # 日付の比較（datetimeはdateのサブクラスなので先に判定する）
+            event_date = start_time.date() if isinstance(start_time, datetime) else start_time
+            if not 0 <= (event_date - target_date).days < days:
                 return None
             
             # 終了時間の取得
@@ -205,71 +788,137 @@ class DailySummaryNotifier:
             logger.warning(f"Event parsing error: {e}")
             return None
     
-    def _generate_daily_summary(self, target_date: date, events: List[Event]) -> DailySummary:
+    def _generate_daily_summary(
+        self,
+        target_date: date,
+        events: Sequence[Event],
+        send_at: Optional[datetime] = None,
+        notes: Sequence[str] = (),
+    ) -> DailySummary:
         """日次サマリーの生成"""
         config = self.config.daily_summary
-        weekday_names = ['月', '火', '水', '木', '金', '土', '日']
-        weekday = weekday_names[target_date.weekday()]
+        notification = self.config.notification
         
-        # メッセージ組み立て
-        message_parts = []
+        # メッセージ組み立て（入りきらない分は次の通に分ける）
+        builder = self._message_builder(notes, notification.closing, send_at)
         
         # ヘッダー
-        message_parts.append(config.greeting)
-        message_parts.append("")
-        message_parts.append(f"📅 {target_date.strftime('%Y年%m月%d日')}（{weekday}）")
-        message_parts.append("")
+        builder.add(
+            notification.greeting,
+            "",
+            f"📅 {target_date.strftime('%Y年%m月%d日')}（{_weekday(target_date)}）",
+            "",
+        )
         
         # 予定内容
         if not events:
-            message_parts.append("📝 " + config.no_events_message)
+            builder.add("📝 " + config.no_events_message)
         else:
-            message_parts.append("⏰ 今日の予定:")
-            display_events = events[:config.max_events_display]
-            
-            for event in display_events:
-                time_str = event.format_time_range()
-                message_parts.append(f"・{time_str} {event.title}")
-                
-                # 説明を追加
-                if config.include_description and event.description.strip():
-                    desc = event.description.strip()[:100]  # 100文字制限
-                    message_parts.append(f"  {desc}")
-                
-                # 場所を追加
-                if config.include_location and event.location.strip():
-                    message_parts.append(f"  📍 {event.location}")
-            
-            # 省略表示
-            if len(events) > config.max_events_display:
-                remaining = len(events) - config.max_events_display
-                message_parts.append(f"  ... 他{remaining}件の予定")
+            hidden = self._add_event_lines(builder, events, "⏰ 今日の予定:")
+            if hidden:
+                builder.add_overflow(f"  ... 他{hidden}件の予定")
         
-        message_parts.append("")
-        message_parts.append(config.closing)
-        message_parts.append("")
-        message_parts.append("---")
-        message_parts.append(f"{config.footer} | {datetime.now().strftime('%H:%M')}送信")
-        
-        full_message = "\n".join(message_parts)
-        
-        # 文字数制限チェック
-        if len(full_message) > self.config.notification.max_message_length:
-            logger.warning("Message too long, truncating...")
-            full_message = full_message[:self.config.notification.max_message_length - 10] + "...(省略)"
+        messages = builder.build()
+        if builder.full:
+            logger.warning(f"Summary for {target_date} exceeds {len(messages)} message(s), some events omitted")
         
         return DailySummary(
             date=target_date,
             events=events,
             total_events=len(events),
-            message=full_message,
+            messages=messages,
             generated_at=datetime.now()
         )
     
-    def _backup_ics_file(self, source_file: Path):
-        """ICSファイルのバックアップ保存"""
+    def _generate_digest(
+        self,
+        digest: DigestConfig,
+        start_date: date,
+        events: EventBatch,
+        send_at: Optional[datetime] = None,
+        notes: Sequence[str] = (),
+    ) -> DailySummary:
+        """複数日分の予定まとめの生成（日ごとの表示は日次サマリーと同じ）"""
+        end_date = start_date + timedelta(days=digest.days - 1)
+        
+        builder = self._message_builder(notes, digest.closing, send_at)
+        builder.add(
+            digest.title,
+            "",
+            f"📅 {start_date.strftime('%m/%d')}（{_weekday(start_date)}）〜"
+            f"{end_date.strftime('%m/%d')}（{_weekday(end_date)}）",
+            "",
+        )
+        
+        # 期間の予定を1回の走査で日ごとに振り分ける
+        day_events = events.split_days(start_date, digest.days)
+        if not any(day_events):
+            builder.add("📝 " + digest.no_events_message)
+        
+        # 入りきらなくなった日以降は件数だけ数える
+        hidden = 0
+        for offset, events_of_day in enumerate(day_events):
+            if not events_of_day:
+                continue
+            if hidden:
+                hidden += len(events_of_day)
+                continue
+            day = start_date + timedelta(days=offset)
+            hidden = self._add_event_lines(builder, events_of_day, f"■ {day.strftime('%m/%d')}（{_weekday(day)}）")
+        if hidden:
+            builder.add_overflow(f"  ... 他{hidden}件の予定")
+        
+        return DailySummary(
+            date=start_date,
+            events=events,
+            total_events=len(events),
+            messages=builder.build(),
+            generated_at=datetime.now(),
+            days=digest.days
+        )
+    
+    def _message_builder(self, notes: Sequence[str], closing: str, send_at: Optional[datetime]) -> MessageBuilder:
+        """注記・結び・フッターを末尾に付けるメッセージの組み立て"""
+        notification = self.config.notification
+        tail = []
+        
+        # 一部アカウントの取得失敗など
+        if notes:
+            tail.append("")
+            tail.extend(notes)
+        
+        tail.append("")
+        tail.append(closing)
+        tail.append("")
+        tail.append("---")
+        tail.append(f"{notification.footer} | {(send_at or datetime.now()).strftime('%H:%M')}送信")
+        return MessageBuilder(notification.max_message_length, notification.max_messages, tail)
+    
+    def _add_event_lines(self, builder: MessageBuilder, events: Sequence[Event], heading: Optional[str] = None) -> int:
+        """1日分の予定の行を追加し、メッセージに入りきらなかった件数を返す
+        
+        表示件数の上限を超えた分は件数だけ表示する。heading は最初の予定と同じ通に入れる。
+        入りきらなくなった時点で残りの予定は整形しない。
+        """
+        config = self.config.daily_summary
+        display_events = events[:config.max_events_display]
+        
+        for shown, event in enumerate(display_events):
+            lines = self.event_formatter.lines(event)
+            if heading is not None and shown == 0:
+                lines = (heading, *lines)
+            if not builder.add(*lines):
+                return len(events) - shown
+        
+        # 省略表示
+        if len(events) > len(display_events):
+            builder.add_overflow(f"  ... 他{len(events) - len(display_events)}件の予定")
+        return 0
+    
+    def _backup_ics_file(self, source_file: Path, account_name: str):
+        """ICSファイルのバックアップ保存（履歴が有効なら履歴にも追加）"""
         try:
-            backup_path = Path(self.config.paths.backup_data)
+            backup_path = self._account_path(self.config.paths.backup_data, account_name)
             backup_path.parent.mkdir(parents=True, exist_ok=True)
             
             import shutil
@@ -277,64 +926,163 @@ class DailySummaryNotifier:
             logger.debug(f"ICS file backed up to {backup_path}")
         except Exception as e:
             logger.warning(f"Failed to backup ICS file: {e}")
+        
+        history = self.config.backup_history
+        if not history.enabled:
+            return
+        try:
+            store = self.backup_store()
+            if store.save(account_name, source_file):
+                store.prune(history.keep_days)
+        except Exception as e:
+            logger.warning(f"Failed to add ICS file to backup history: {e}")
+    
+    def backup_store(self) -> BackupStore:
+        """エクスポートの履歴（初回アクセス時に作成）"""
+        if self._backup_store is None:
+            self._backup_store = BackupStore(self.config.paths.backup_history)
+        return self._backup_store
+    
+    async def close(self):
+        """保持しているHTTP接続とプールを閉じる（終わっていない訂正の確認は取り消す）"""
+        for task in list(self._revalidations):
+            task.cancel()
+        await self.wait_revalidations()
+        await self.line_notifier.close()
+        self.executors.shutdown(wait=False)
     
     async def _send_error_notification(self, target_date: date, error_message: str) -> bool:
-        """エラー通知の送信"""
+        """エラー通知の送信（ほかの通知と同じくアウトボックスを通し、失敗したら後で再送する）"""
         try:
-            message = f"⚠️ TimeTree通知システム エラー\n\n"
-            message += f"日付: {target_date}\n"
-            message += f"時刻: {datetime.now().strftime('%H:%M')}\n\n"
-            message += f"エラー内容:\n{error_message}\n\n"
-            message += "手動でTimeTreeを確認してください。"
-            
-            result = await self.line_notifier.send_message(message)
-            return result.success
+            delivery = Delivery(
+                recipients=list(self.line_notifier.recipients),
+                messages=[self._build_error_message(target_date, error_message)],
+            )
+            results = await self.send_deliveries([delivery])
+            return results[0]
         except Exception as e:
             logger.error(f"Failed to send error notification: {e}")
             return False
+    
+    def _build_error_message(self, target_date: date, error_message: str) -> str:
+        """エラー通知メッセージ"""
+        message = f"⚠️ TimeTree通知システム エラー\n\n"
+        message += f"日付: {target_date}\n"
+        message += f"時刻: {datetime.now().strftime('%H:%M')}\n\n"
+        message += f"エラー内容:\n{error_message}\n\n"
+        message += "手動でTimeTreeを確認してください。"
+        return message
 
 
-class LineNotifier:
-    """LINE Messaging API通知クラス"""
-    
-    def __init__(self, channel_access_token: str, user_id: str):
-        self.channel_access_token = channel_access_token
-        self.user_id = user_id
-        self.api_url = "https://api.line.me/v2/bot/message/push"
-    
-    async def send_message(self, message: str) -> NotificationResult:
-        """LINE通知送信（Messaging API）"""
-        try:
-            import requests
-            
-            headers = {
-                "Authorization": f"Bearer {self.channel_access_token}",
-                "Content-Type": "application/json"
-            }
-            
-            data = {
-                "to": self.user_id,
-                "messages": [
-                    {
-                        "type": "text",
-                        "text": message
-                    }
-                ]
-            }
-            
-            response = requests.post(self.api_url, headers=headers, json=data, timeout=10)
-            
-            if response.status_code == 200:
-                return NotificationResult(success=True, message="Notification sent successfully")
-            else:
-                error_detail = response.text if response.text else "Unknown error"
-                return NotificationResult(
-                    success=False,
-                    error_message=f"HTTP {response.status_code}: {error_detail}"
-                )
-                
-        except Exception as e:
-            return NotificationResult(
-                success=False,
-                error_message=str(e)
+def _build_line_notifier(config: Config) -> LineNotifier:
+    """設定からLINE通知クライアントを作成"""
+    notification = config.notification
+    return LineNotifier(
+        notification.line_channel_access_token, 
+        notification.line_user_id,
+        api_base_url=notification.api_base_url,
+        timeout=notification.request_timeout,
+        recipients=notification.get_recipients(),
+        max_concurrency=notification.max_concurrent_sends,
+        rate_limit=notification.rate_limit,
+        max_rate_limit=notification.max_rate_limit
+    )
+
+
+def _line_settings(config: Config) -> tuple:
+    """LineNotifier の作成に使う設定（変わったら作り直す）"""
+    notification = config.notification
+    return (
+        notification.line_channel_access_token,
+        notification.line_user_id,
+        notification.api_base_url,
+        notification.request_timeout,
+        tuple(notification.get_recipients()),
+        notification.max_concurrent_sends,
+        notification.rate_limit,
+        notification.max_rate_limit,
+    )
+
+
+def _weekday(day: date) -> str:
+    """曜日の表示（月〜日）"""
+    return "月火水木金土日"[day.weekday()]
+
+
+def _event_sort_key(event: Event):
+    """終日予定を先頭に、時刻付き予定は現地時刻順に並べるためのキー"""
+    start = event.start_time
+    if isinstance(start, datetime):
+        return (1, start.replace(tzinfo=None))
+    return (0, datetime.combine(start, datetime.min.time()))
+
+
+def _select_recipients(deliveries: List[Delivery], recipients: Sequence[str]) -> List[Delivery]:
+    """送信内容を指定した送信先だけに絞り込む"""
+    wanted = set(recipients)
+    selected = []
+    for delivery in deliveries:
+        matched = [r for r in delivery.recipients if r in wanted]
+        if matched:
+            selected.append(Delivery(
+                recipients=matched,
+                messages=delivery.messages,
+                accounts=delivery.accounts,
+                summary=delivery.summary,
+                stale_accounts=delivery.stale_accounts,
+            ))
+    return selected
+
+
+def _group_by_delivery(recipients: Sequence[str], deliveries: Dict[str, Delivery]) -> List[Delivery]:
+    """送信先を送信内容ごとにまとめ直す（deliveries は送信先 → 送信内容）"""
+    grouped: Dict[int, Delivery] = {}
+    for recipient in recipients:
+        delivery = deliveries.get(recipient)
+        if delivery is None:
+            continue
+        group = grouped.get(id(delivery))
+        if group is None:
+            grouped[id(delivery)] = Delivery(
+                recipients=[recipient],
+                messages=delivery.messages,
+                accounts=delivery.accounts,
+                summary=delivery.summary,
+                stale_accounts=delivery.stale_accounts,
             )
+        else:
+            group.recipients.append(recipient)
+    return list(grouped.values())
+
+
+def _merge_events(event_lists: Iterable[Sequence[Event]]) -> EventBatch:
+    """複数アカウントの予定を時刻順にまとめる（共有カレンダーの重複は1件にする）"""
+    merged = EventBatch()
+    for events in event_lists:
+        merged.extend(events)
+    return merged.unique().sorted()
+
+
+def _ingest_export(
+    event_index: EventIndex,
+    ics_file: Path,
+    backup_path: Path,
+    parse_pool: Optional[Executor] = None,
+    workers: int = 1,
+    source_hash: Optional[str] = None,
+) -> ExportDiff:
+    """エクスポート結果をインデックスへ取り込む
+
+    インデックスが空なら前回のバックアップを先に取り込み、前回との差分を求められるようにする。
+    parse_pool を渡すと解析を並列に行う。
+    """
+    if event_index.count() == 0 and backup_path.exists():
+        event_index.ingest(backup_path, parse_pool, workers)
+    return event_index.ingest(ics_file, parse_pool, workers, source_hash)
+
+
+def _ingest_export_in_process(
+    db_path: Path, timezone: str, ics_file: Path, backup_path: Path, source_hash: Optional[str] = None
+) -> ExportDiff:
+    """プロセスプールから呼ぶ _ingest_export（インデックスはワーカー側で開く）"""
+    return _ingest_export(EventIndex(db_path, timezone), ics_file, backup_path, source_hash=source_hash)
@@ -0,0 +1,318 @@
+"""予定の列指向コンテナ
+
+大量の予定を Event のリストで持つ代わりに、開始・終了時刻をマイクロ秒の
+array に、タイトル・場所を重複を除いた文字列表の番号に、説明をUTF-8の
+バイト列にまとめて保持する。説明は Event を取り出すときに初めて復号する。
+並べ替え・重複除去・日付での絞り込みは array 上で行い、
+個々の予定は batch[i] で従来どおりの Event として取り出せる。
+"""
+
+from array import array
+from bisect import bisect_left
+from operator import itemgetter
+from datetime import date, datetime, timedelta, timezone, tzinfo
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+from .models import Event
+
+
+# 時刻の種類（タイムゾーン付きは ZONE_AWARE + タイムゾーン表の番号）
+ZONE_NONE = 0  # 終了時刻なし
+ZONE_DATE = 1  # 終日（date）
+ZONE_NAIVE = 2  # タイムゾーンなしのdatetime
+ZONE_AWARE = 3  # タイムゾーン付きのdatetime
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+_DAY = 86400 * 1_000_000
+
+# 終日予定を時刻付き予定より前に並べるために並べ替えキーから引く値
+# （壁時計のマイクロ秒は西暦1〜9999年で ±2.6e17 に収まる）
+_ALL_DAY_OFFSET = 1 << 61
+
+
+class _Tables:
+    """バッチ間で共有する文字列表・説明バッファ・タイムゾーン表（追記のみ）"""
+
+    __slots__ = ("strings", "string_ids", "descriptions", "tzinfos", "tz_ids")
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self.string_ids: Dict[str, int] = {}
+        self.descriptions = bytearray()
+        self.tzinfos: List[tzinfo] = []
+        self.tz_ids: Dict[tzinfo, int] = {}
+
+    def intern(self, value: str) -> int:
+        string_id = self.string_ids.get(value)
+        if string_id is None:
+            string_id = self.string_ids[value] = len(self.strings)
+            self.strings.append(value)
+        return string_id
+
+    def zone(self, tz: tzinfo) -> int:
+        zone = self.tz_ids.get(tz)
+        if zone is None:
+            zone = self.tz_ids[tz] = ZONE_AWARE + len(self.tzinfos)
+            self.tzinfos.append(tz)
+        return zone
+
+
+class EventBatch:
+    """予定の列指向コンテナ
+
+    スライス・take・sorted などで作ったバッチは文字列表と説明バッファを
+    元のバッチと共有する（どちらも追記のみなので互いの番号は変わらない）。
+    """
+
+    def __init__(self, events: Iterable[Event] = (), _tables: Optional[_Tables] = None):
+        self._tables = _tables or _Tables()
+        self._start = array("q")
+        self._start_zone = array("H")
+        self._end = array("q")
+        self._end_zone = array("H")
+        # 並べ替えキー（開始の壁時計、終日予定は _ALL_DAY_OFFSET を引く）
+        self._sort_key = array("q")
+        # 表示上の終了（壁時計、日ごとの振り分けに使う）
+        self._span_end = array("q")
+        self._title = array("I")
+        self._location = array("I")
+        self._desc_start = array("Q")
+        self._desc_end = array("Q")
+        # _sort_key の昇順に並んでいるか（日付での絞り込みに二分探索を使う）
+        self._is_sorted = True
+        self.extend(events)
+
+    @classmethod
+    def from_events(cls, events: Iterable[Event]) -> "EventBatch":
+        """Event の列から作成"""
+        return cls(events)
+
+    # ---- 追加 ----
+
+    def append(self, event: Event):
+        """予定を1件追加"""
+        tables = self._tables
+        start, start_zone, wall = self._encode(event.start_time)
+        if event.end_time is None:
+            end, end_zone = 0, ZONE_NONE
+            # 終了のない終日予定はその日1日、時刻付き予定は開始時刻だけを占める
+            span_end = wall + (_DAY if start_zone == ZONE_DATE else 1)
+        else:
+            end, end_zone, end_wall = self._encode(event.end_time)
+            span_end = max(end_wall, wall + 1)
+
+        sort_key = wall - _ALL_DAY_OFFSET if start_zone == ZONE_DATE else wall
+        if self._sort_key and sort_key < self._sort_key[-1]:
+            self._is_sorted = False
+
+        self._start.append(start)
+        self._start_zone.append(start_zone)
+        self._end.append(end)
+        self._end_zone.append(end_zone)
+        self._sort_key.append(sort_key)
+        self._span_end.append(span_end)
+        self._title.append(tables.intern(event.title))
+        self._location.append(tables.intern(event.location))
+
+        offset = len(tables.descriptions)
+        if event.description:
+            tables.descriptions += event.description.encode("utf-8")
+        self._desc_start.append(offset)
+        self._desc_end.append(len(tables.descriptions))
+
+    def extend(self, events: Iterable[Event]):
+        """予定をまとめて追加（EventBatch なら列ごとに連結）"""
+        if isinstance(events, EventBatch):
+            if events._tables is self._tables:
+                self._extend_columns(events, range(len(events)))
+                return
+            events = events.to_events()
+        for event in events:
+            self.append(event)
+
+    def _extend_columns(self, other: "EventBatch", indices: Sequence[int]):
+        """同じ表を共有するバッチから indices の行を追加"""
+        if not indices:
+            return
+        # itemgetter は1件だけだとタプルでなく値を返す
+        gather = itemgetter(*indices) if len(indices) > 1 else (lambda column: (column[indices[0]],))
+        for name in _COLUMNS:
+            getattr(self, name).extend(gather(getattr(other, name)))
+        self._is_sorted = _is_ascending(self._sort_key)
+
+    def _encode(self, value):
+        """date/datetime → (マイクロ秒, 種類, 壁時計のマイクロ秒)
+
+        タイムゾーン付きはUTCのUNIXマイクロ秒、それ以外は壁時計を
+        UTCとみなしたマイクロ秒で保持する。
+        """
+        if not isinstance(value, datetime):
+            wall = _micros(datetime(value.year, value.month, value.day) - _EPOCH)
+            return wall, ZONE_DATE, wall
+        wall = _micros(value.replace(tzinfo=None) - _EPOCH)
+        if value.tzinfo is None or value.utcoffset() is None:
+            return wall, ZONE_NAIVE, wall
+        return _micros(value - _EPOCH_UTC), self._tables.zone(value.tzinfo), wall
+
+    def _decode(self, micros: int, zone: int):
+        """_encode の逆変換"""
+        if zone == ZONE_NONE:
+            return None
+        if zone >= ZONE_AWARE:
+            utc = _EPOCH_UTC + timedelta(microseconds=micros)
+            return utc.astimezone(self._tables.tzinfos[zone - ZONE_AWARE])
+        value = _EPOCH + timedelta(microseconds=micros)
+        return value.date() if zone == ZONE_DATE else value
+
+    # ---- 参照 ----
+
+    def __len__(self) -> int:
+        return len(self._start)
+
+    def __getitem__(self, index: Union[int, slice]):
+        """int なら Event を、スライスなら EventBatch を返す"""
+        if isinstance(index, slice):
+            return self.take(range(len(self))[index])
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("EventBatch index out of range")
+        strings = self._tables.strings
+        return Event(
+            title=strings[self._title[index]],
+            start_time=self._decode(self._start[index], self._start_zone[index]),
+            end_time=self._decode(self._end[index], self._end_zone[index]),
+            description=self.description(index),
+            location=strings[self._location[index]],
+        )
+
+    def __iter__(self) -> Iterator[Event]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def __repr__(self) -> str:
+        return f"EventBatch({len(self)} events)"
+
+    def to_events(self) -> List[Event]:
+        """Event のリストに変換"""
+        return list(self)
+
+    def title(self, index: int) -> str:
+        """index 番目の予定のタイトル"""
+        return self._tables.strings[self._title[index]]
+
+    def location(self, index: int) -> str:
+        """index 番目の予定の場所"""
+        return self._tables.strings[self._location[index]]
+
+    def description(self, index: int) -> str:
+        """index 番目の予定の説明（ここで初めて復号する）"""
+        start, end = self._desc_start[index], self._desc_end[index]
+        if start == end:
+            return ""
+        return self._tables.descriptions[start:end].decode("utf-8")
+
+    def is_all_day(self, index: int) -> bool:
+        """index 番目の予定が終日かどうか"""
+        return self._start_zone[index] == ZONE_DATE
+
+    def nbytes(self) -> int:
+        """列と共有表のおおよそのバイト数（文字列オブジェクト自体は含まない）"""
+        columns = sum(getattr(self, name).itemsize * len(self) for name in _COLUMNS)
+        return columns + len(self._tables.descriptions)
+
+    # ---- 並べ替え・絞り込み ----
+
+    def argsort(self) -> List[int]:
+        """終日予定を先頭に、時刻付き予定は現地時刻順に並べたときの行番号（安定）"""
+        if self._is_sorted:
+            return list(range(len(self)))
+        return sorted(range(len(self)), key=self._sort_key.__getitem__)
+
+    def sorted(self) -> "EventBatch":
+        """argsort の順に並べたバッチ"""
+        if self._is_sorted:
+            return self
+        return self.take(self.argsort())
+
+    def take(self, indices: Sequence[int]) -> "EventBatch":
+        """indices の行だけを取り出したバッチ（表は共有する）"""
+        batch = EventBatch(_tables=self._tables)
+        batch._extend_columns(self, indices)
+        return batch
+
+    def unique(self) -> "EventBatch":
+        """タイトル・開始・終了が同じ予定を最初の1件にまとめたバッチ"""
+        seen = set()
+        keep = []
+        # タイムゾーン付き同士はタイムゾーンが違っても同じ時点なら同じ予定とみなす
+        start_kinds = [min(zone, ZONE_AWARE) for zone in self._start_zone]
+        end_kinds = [min(zone, ZONE_AWARE) for zone in self._end_zone]
+        columns = (self._title, start_kinds, self._start, end_kinds, self._end)
+        for i, key in enumerate(zip(*columns)):
+            if key not in seen:
+                seen.add(key)
+                keep.append(i)
+        if len(keep) == len(self):
+            return self
+        return self.take(keep)
+
+    def starting_between(self, start: date, end: date) -> "EventBatch":
+        """開始日（現地の壁時計）が start 以上 end 未満の予定
+
+        並べ替え済みなら終日・時刻付きそれぞれの範囲を二分探索で求める。
+        """
+        low = _micros(datetime(start.year, start.month, start.day) - _EPOCH)
+        high = _micros(datetime(end.year, end.month, end.day) - _EPOCH)
+        keys = self._sort_key
+
+        if self._is_sorted:
+            indices = [
+                *range(bisect_left(keys, low - _ALL_DAY_OFFSET), bisect_left(keys, high - _ALL_DAY_OFFSET)),
+                *range(bisect_left(keys, low), bisect_left(keys, high)),
+            ]
+        else:
+            indices = [
+                i for i, (key, zone) in enumerate(zip(keys, self._start_zone))
+                if low <= (key + _ALL_DAY_OFFSET if zone == ZONE_DATE else key) < high
+            ]
+        return self.take(indices)
+
+    def on_date(self, target_date: date) -> "EventBatch":
+        """target_date に始まる予定"""
+        return self.starting_between(target_date, target_date + timedelta(days=1))
+
+    def split_days(self, start: date, days: int) -> List["EventBatch"]:
+        """start から days 日間の日ごとの予定（現地の壁時計で重なる日すべてに入れる）
+
+        全行を1回走査して日ごとの行番号に振り分ける。各日の中の順序は元の行順なので、
+        並べ替え済みのバッチなら各日も並べ替え済みになる。
+        """
+        base = _micros(datetime(start.year, start.month, start.day) - _EPOCH)
+        buckets: List[List[int]] = [[] for _ in range(days)]
+        rows = zip(self._sort_key, self._start_zone, self._span_end)
+        for i, (key, zone, span_end) in enumerate(rows):
+            wall = key + _ALL_DAY_OFFSET if zone == ZONE_DATE else key
+            first = max(0, (wall - base) // _DAY)
+            last = min(days, -((base - span_end) // _DAY))
+            for day in range(first, last):
+                buckets[day].append(i)
+        return [self.take(indices) for indices in buckets]
+
+
+# 行ごとの値を持つ列（take・連結で行番号に従ってコピーする）
+_COLUMNS = (
+    "_start", "_start_zone", "_end", "_end_zone", "_sort_key", "_span_end",
+    "_title", "_location", "_desc_start", "_desc_end",
+)
+
+
+def _micros(delta: timedelta) -> int:
+    """timedelta → マイクロ秒（整数演算で誤差なく変換）"""
+    return (delta.days * 86400 + delta.seconds) * 1_000_000 + delta.microseconds
+
+
+def _is_ascending(values: Sequence[int]) -> bool:
+    return all(a <= b for a, b in zip(values, values[1:]))
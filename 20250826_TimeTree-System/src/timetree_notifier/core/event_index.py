@@ -0,0 +1,474 @@
+"""予定の日時区間インデックス
+
+エクスポートしたICSから予定を取り出してSQLiteに保存し、
+「[start, end) と重なる予定」をR*Treeで O(log n) に検索する。
+更新時は前回取り込み分との差分だけを解析・反映する。
+繰り返し予定は検索期間内だけをRecurrenceExpanderで展開する。
+"""
+
+import mmap
+import sqlite3
+from concurrent.futures import Executor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, tzinfo
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Union
+from zoneinfo import ZoneInfo
+
+from loguru import logger
+
+from .ics_stream import iter_vevent_spans, parse_vevent_block, read_blocks
+from .ingest import ExportDiff, diff_fingerprints, fingerprint_block, iter_keyed_blocks, uid_key_of
+from .models import Event
+from .recurrence import OPEN_END_MINUTES, RecurrenceExpander, SeriesRule, is_recurring, to_timestamp
+
+
+# 並列解析で解析対象がこれより少なければプロセスに分けず解析する
+PARALLEL_MIN_EVENTS = 2000
+
+# スキーマ変更時に上げる（不一致ならインデックスを作り直す）
+_SCHEMA_VERSION = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    uid_key TEXT NOT NULL UNIQUE,
+    uid TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    recurrence_ts INTEGER,
+    series_raw BLOB,
+    start_ts INTEGER NOT NULL,
+    end_ts INTEGER NOT NULL,
+    all_day INTEGER NOT NULL,
+    start_value TEXT NOT NULL,
+    end_value TEXT,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL,
+    location TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_uid ON events(uid);
+CREATE VIRTUAL TABLE IF NOT EXISTS events_span USING rtree_i32(
+    id, start_min, end_min
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+@dataclass
+class EventRecord:
+    """インデックスに保存する1予定分のレコード"""
+    uid_key: str
+    uid: str
+    fingerprint: str
+    start_ts: int
+    end_ts: int
+    all_day: bool
+    start_value: str
+    end_value: Optional[str]
+    title: str
+    description: str
+    location: str
+    # RECURRENCE-IDで上書きする発生の元の開始UNIX秒
+    recurrence_ts: Optional[int] = None
+    # 繰り返し予定なら展開用の元VEVENTブロック
+    series_raw: Optional[bytes] = None
+
+
+class EventIndex:
+    """SQLiteによる予定の日時区間インデックス"""
+
+    def __init__(self, db_path: Union[str, Path], timezone: str):
+        self.db_path = Path(db_path)
+        self.tz = ZoneInfo(timezone)
+        self.recurrence = RecurrenceExpander(self.tz)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._init_schema()
+
+    def ingest(
+        self,
+        ics_file: Union[str, Path],
+        executor: Optional[Executor] = None,
+        workers: int = 1,
+        source_hash: Optional[str] = None,
+    ) -> ExportDiff:
+        """ICSファイルを取り込み、前回取り込み分との差分だけを反映する
+
+        追加・変更された予定だけをicalendarで解析し、削除された予定は取り除く。
+        executor（プロセスプール）を渡すと解析を workers 個程度に分けて並列に行う。
+        結果は逐次解析と同じになる。
+        source_hash（ファイルのSHA-256）は予定と同じトランザクションで記録し、source_hash() で返す。
+        """
+        previous = self.fingerprints()
+        if executor is not None:
+            current, records = self._parse_parallel(ics_file, previous, executor, workers)
+        else:
+            current, records = self._parse_serial(ics_file, previous)
+
+        diff = diff_fingerprints(previous, current)
+        with self._connect() as conn:
+            self._delete(conn, diff.removed)
+            self._delete(conn, diff.changed)
+            self._insert(conn, records.values())
+            self._set_meta(conn, "source_hash", source_hash)
+        self.recurrence.retain(set(current))
+
+        logger.info(f"Event index updated: {diff.summary()}")
+        return diff
+
+    def _parse_serial(
+        self, ics_file: Union[str, Path], previous: Dict[str, str]
+    ) -> Tuple[Dict[str, str], Dict[str, EventRecord]]:
+        """全VEVENTのフィンガープリントを求め、前回から変わったものを解析"""
+        current: Dict[str, str] = {}
+        records: Dict[str, EventRecord] = {}
+
+        for uid_key, fingerprint, block in iter_keyed_blocks(ics_file):
+            current[uid_key] = fingerprint
+            if previous.get(uid_key) == fingerprint:
+                continue
+            try:
+                record = self.to_record(uid_key, fingerprint, parse_vevent_block(block), block)
+                if record:
+                    records[uid_key] = record
+            except Exception as e:
+                logger.warning(f"Failed to index event: {e}")
+        return current, records
+
+    def _parse_parallel(
+        self, ics_file: Union[str, Path], previous: Dict[str, str], executor: Executor, workers: int
+    ) -> Tuple[Dict[str, str], Dict[str, EventRecord]]:
+        """フィンガープリントは逐次で求め、変わったVEVENTの解析だけをプロセスに分散
+
+        ワーカーにはファイル内の位置だけを渡し、解析結果のレコードをファイル順に結合する。
+        """
+        current: Dict[str, str] = {}
+        pending: List[Tuple[str, str, int, int]] = []
+        if Path(ics_file).stat().st_size > 0:
+            with open(ics_file, "rb") as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    for start, end in iter_vevent_spans(mm):
+                        block = mm[start:end]
+                        uid_key, fingerprint = uid_key_of(block), fingerprint_block(block)
+                        current[uid_key] = fingerprint
+                        if previous.get(uid_key) != fingerprint:
+                            pending.append((uid_key, fingerprint, start, end))
+
+        if len(pending) < PARALLEL_MIN_EVENTS:
+            chunks = [pending] if pending else []
+            results = [_parse_spans(str(ics_file), self.tz.key, chunk) for chunk in chunks]
+        else:
+            # 処理時間のばらつきをならすため、ワーカー数より多めに分ける
+            size = -(-len(pending) // (max(1, workers) * 4))
+            chunks = [pending[i:i + size] for i in range(0, len(pending), size)]
+            results = list(executor.map(_parse_spans, [str(ics_file)] * len(chunks),
+                                        [self.tz.key] * len(chunks), chunks))
+
+        records: Dict[str, EventRecord] = {}
+        for chunk_records in results:
+            for record in chunk_records:
+                records[record.uid_key] = record
+        return current, records
+
+    def rebuild(self, ics_file: Union[str, Path]) -> int:
+        """ICSファイルからインデックスを作り直す"""
+        self.clear()
+        return self.ingest(ics_file).total
+
+    def clear(self):
+        """全予定を削除"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM events")
+            conn.execute("DELETE FROM events_span")
+            conn.execute("DELETE FROM meta")
+
+    def source_hash(self) -> Optional[str]:
+        """最後に取り込んだファイルのSHA-256（取り込み時に渡されなかった場合は None）"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'source_hash'").fetchone()
+            return row[0] if row else None
+
+    def fingerprints(self) -> Dict[str, str]:
+        """登録済み予定の 識別キー→フィンガープリント"""
+        with self._connect() as conn:
+            return dict(conn.execute("SELECT uid_key, fingerprint FROM events"))
+
+    def query(self, start: datetime, end: datetime) -> List[Event]:
+        """[start, end) と重なる予定を開始時刻順に取得（繰り返し予定は展開する）"""
+        return [event for _, event in self.query_keyed(start, end)]
+
+    def query_keyed(self, start: datetime, end: datetime) -> List[Tuple[str, Event]]:
+        """query と同じ予定を、識別キー（uid_key）と組にして返す"""
+        start_ts = int(start.timestamp())
+        end_ts = int(end.timestamp())
+        found = []
+
+        with self._connect() as conn:
+            rows = conn.execute(
+                """
+                SELECT e.id, e.uid_key, e.uid, e.fingerprint, e.start_ts,
+                       e.start_value, e.end_value, e.title, e.description, e.location,
+                       e.series_raw IS NOT NULL
+                FROM events_span s JOIN events e ON e.id = s.id
+                WHERE s.start_min < ? AND s.end_min > ?
+                  AND e.start_ts < ? AND e.end_ts > ?
+                """,
+                (_ceil_minutes(end_ts), start_ts // 60, end_ts, start_ts),
+            ).fetchall()
+
+            for row in rows:
+                row_id, uid_key, uid, fingerprint, row_start_ts = row[:5]
+                start_value, end_value, title, description, location, is_series = row[5:]
+
+                if not is_series:
+                    event = Event(
+                        title=title,
+                        start_time=self._decode_value(start_value),
+                        end_time=self._decode_value(end_value) if end_value else None,
+                        description=description,
+                        location=location,
+                    )
+                    found.append((row_start_ts, uid_key, event))
+                    continue
+
+                overridden = [
+                    ts for (ts,) in conn.execute(
+                        "SELECT recurrence_ts FROM events WHERE uid = ? AND recurrence_ts IS NOT NULL",
+                        (uid,),
+                    )
+                ]
+                occurrences = self.recurrence.occurrences(
+                    uid_key,
+                    fingerprint,
+                    lambda row_id=row_id: conn.execute(
+                        "SELECT series_raw FROM events WHERE id = ?", (row_id,)
+                    ).fetchone()[0],
+                    start_ts,
+                    end_ts,
+                    overridden,
+                )
+                for occurrence_start_ts, _, occurrence_start, occurrence_end in occurrences:
+                    event = Event(
+                        title=title,
+                        start_time=self._localize(occurrence_start),
+                        end_time=self._localize(occurrence_end) if occurrence_end is not None else None,
+                        description=description,
+                        location=location,
+                    )
+                    found.append((occurrence_start_ts, uid_key, event))
+
+        found.sort(key=lambda item: (item[0], item[1]))
+        return [(uid_key, event) for _, uid_key, event in found]
+
+    def events_between(self, start_date: date, end_date: date) -> List[Event]:
+        """start_date から end_date の前日までと重なる予定を取得"""
+        return self.query(self._day_start(start_date), self._day_start(end_date))
+
+    def keyed_events_between(self, start_date: date, end_date: date) -> List[Tuple[str, Event]]:
+        """events_between と同じ予定を、識別キーと組にして返す"""
+        return self.query_keyed(self._day_start(start_date), self._day_start(end_date))
+
+    def events_on(self, target_date: date) -> List[Event]:
+        """target_date と重なる予定を取得"""
+        return self.events_between(target_date, target_date + timedelta(days=1))
+
+    def keys(self) -> Set[str]:
+        """登録済み予定の識別キー"""
+        with self._connect() as conn:
+            return {uid_key for (uid_key,) in conn.execute("SELECT uid_key FROM events")}
+
+    def events_by_key(self, uid_keys: Iterable[str]) -> Dict[str, Event]:
+        """識別キーごとの予定（繰り返し予定は最初の回）"""
+        found = {}
+        with self._connect() as conn:
+            for uid_key in uid_keys:
+                row = conn.execute(
+                    "SELECT start_value, end_value, title, description, location FROM events WHERE uid_key = ?",
+                    (uid_key,)
+                ).fetchone()
+                if row is None:
+                    continue
+                start_value, end_value, title, description, location = row
+                found[uid_key] = Event(
+                    title=title,
+                    start_time=self._decode_value(start_value),
+                    end_time=self._decode_value(end_value) if end_value else None,
+                    description=description,
+                    location=location,
+                )
+        return found
+
+    def count(self) -> int:
+        """登録済みの予定件数"""
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+
+    def to_record(
+        self, uid_key: str, fingerprint: str, component, block: bytes = b""
+    ) -> Optional[EventRecord]:
+        """ICSコンポーネントをインデックス用レコードに変換"""
+        return build_record(uid_key, fingerprint, component, self.tz, block)
+
+    def _insert(self, conn: sqlite3.Connection, records: Iterable[EventRecord]) -> int:
+        """レコードを登録して件数を返す"""
+        count = 0
+        for record in records:
+            self._delete(conn, [record.uid_key])
+            cursor = conn.execute(
+                """
+                INSERT INTO events (
+                    uid_key, uid, fingerprint, recurrence_ts, series_raw,
+                    start_ts, end_ts, all_day, start_value, end_value,
+                    title, description, location
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    record.uid_key, record.uid, record.fingerprint,
+                    record.recurrence_ts, record.series_raw,
+                    record.start_ts, record.end_ts, int(record.all_day),
+                    record.start_value, record.end_value,
+                    record.title, record.description, record.location,
+                ),
+            )
+            conn.execute(
+                "INSERT INTO events_span (id, start_min, end_min) VALUES (?, ?, ?)",
+                (
+                    cursor.lastrowid,
+                    record.start_ts // 60,
+                    min(_ceil_minutes(record.end_ts), OPEN_END_MINUTES),
+                ),
+            )
+            count += 1
+        return count
+
+    def _delete(self, conn: sqlite3.Connection, uid_keys: Iterable[str]):
+        """指定キーの予定を削除"""
+        for uid_key in uid_keys:
+            row = conn.execute("SELECT id FROM events WHERE uid_key = ?", (uid_key,)).fetchone()
+            if row:
+                conn.execute("DELETE FROM events_span WHERE id = ?", row)
+                conn.execute("DELETE FROM events WHERE id = ?", row)
+
+    def _set_meta(self, conn: sqlite3.Connection, key: str, value: Optional[str]):
+        """メタ情報を記録"""
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _decode_value(self, value: str):
+        """保存した日時文字列を復元（時刻付きは設定タイムゾーンで表示する）"""
+        if len(value) == 10:
+            return date.fromisoformat(value)
+        return self._localize(datetime.fromisoformat(value))
+
+    def _localize(self, value):
+        """タイムゾーン付きの日時を設定タイムゾーンに変換"""
+        if isinstance(value, datetime) and value.tzinfo is not None:
+            return value.astimezone(self.tz)
+        return value
+
+    def _to_timestamp(self, value) -> int:
+        """date/datetimeをUNIX秒に変換（日付・浮動時刻は設定タイムゾーンで解釈）"""
+        return to_timestamp(value, self.tz)
+
+    def _day_start(self, target_date: date) -> datetime:
+        """設定タイムゾーンでの日付の開始時刻"""
+        return datetime.combine(target_date, time.min, tzinfo=self.tz)
+
+    def _init_schema(self):
+        """スキーマを作成（古い版のインデックスは破棄して作り直す）"""
+        with self._connect() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version != _SCHEMA_VERSION:
+                conn.execute("DROP TABLE IF EXISTS events")
+                conn.execute("DROP TABLE IF EXISTS events_span")
+                conn.execute("DROP TABLE IF EXISTS meta")
+            conn.executescript(_SCHEMA)
+            conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """トランザクション付きで接続（スレッドをまたがないよう都度接続する）"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+
+def _ceil_minutes(ts: int) -> int:
+    """UNIX秒を分単位に切り上げ"""
+    return -(-ts // 60)
+
+
+def build_record(
+    uid_key: str, fingerprint: str, component, tz: tzinfo, block: bytes = b""
+) -> Optional[EventRecord]:
+    """ICSコンポーネントをインデックス用レコードに変換
+
+    繰り返し予定は全発生を覆う区間で登録し、展開用に block を保存する。
+    日付・浮動時刻は tz で解釈する。
+    """
+    dtstart = component.get('dtstart')
+    if not dtstart:
+        return None
+
+    start = dtstart.dt
+    dtend = component.get('dtend')
+    end = dtend.dt if dtend else None
+
+    all_day = not isinstance(start, datetime)
+    start_ts = to_timestamp(start, tz)
+
+    if end is not None:
+        end_ts = to_timestamp(end, tz)
+    elif component.get('duration'):
+        end_ts = to_timestamp(start + component.get('duration').dt, tz)
+    elif all_day:
+        end_ts = to_timestamp(start + timedelta(days=1), tz)
+    else:
+        end_ts = start_ts
+    # 長さ0の予定も開始時刻を含む区間と重なるようにする
+    end_ts = max(end_ts, start_ts + 1)
+
+    series_raw = None
+    if is_recurring(component):
+        series_start_ts, series_end_ts = SeriesRule(component, tz).span()
+        start_ts = min(start_ts, series_start_ts)
+        end_ts = OPEN_END_MINUTES * 60 if series_end_ts is None else max(end_ts, series_end_ts)
+        series_raw = block
+
+    recurrence_id = component.get('recurrence-id')
+
+    return EventRecord(
+        uid_key=uid_key,
+        uid=str(component.get('uid', uid_key)),
+        fingerprint=fingerprint,
+        start_ts=start_ts,
+        end_ts=end_ts,
+        all_day=all_day,
+        start_value=start.isoformat(),
+        end_value=end.isoformat() if end is not None else None,
+        title=str(component.get('summary', '無題')),
+        description=str(component.get('description', '')),
+        location=str(component.get('location', '')),
+        recurrence_ts=to_timestamp(recurrence_id.dt, tz) if recurrence_id else None,
+        series_raw=series_raw,
+    )
+
+
+def _parse_spans(ics_file: str, timezone: str, spans: Sequence[Tuple[str, str, int, int]]) -> List[EventRecord]:
+    """(識別キー, フィンガープリント, 開始位置, 終了位置) のVEVENTを解析（プロセスプールから呼ぶ）"""
+    tz = ZoneInfo(timezone)
+    blocks = read_blocks(ics_file, [(start, end) for _, _, start, end in spans])
+    records = []
+    for (uid_key, fingerprint, _, _), block in zip(spans, blocks):
+        try:
+            record = build_record(uid_key, fingerprint, parse_vevent_block(block), tz, block)
+            if record:
+                records.append(record)
+        except Exception as e:
+            logger.warning(f"Failed to index event: {e}")
+    return records
@@ -0,0 +1,108 @@
+"""ブロッキング処理をイベントループ外で実行するプール
+
+ファイルコピー・SQLiteなどのI/Oはスレッドプール、ICSの解析・インデックス更新などの
+CPU処理は設定に応じてスレッドプールかプロセスプールで実行する。
+大きなICSの解析は専用のプロセスプールに分散する。
+プロセスプールに渡す関数と引数はpickleできる必要がある。
+"""
+
+import asyncio
+import functools
+import multiprocessing
+import os
+import sys
+from pathlib import Path
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar, Union
+
+from loguru import logger
+
+from ..config.settings import ExecutorConfig
+
+
+T = TypeVar("T")
+
+
+class StageExecutors:
+    """I/O用・CPU用のプール（初回使用時に作成）"""
+
+    def __init__(self, config: Optional[ExecutorConfig] = None):
+        self.config = config or ExecutorConfig()
+        self._io: Optional[ThreadPoolExecutor] = None
+        self._cpu: Optional[Executor] = None
+        self._parse: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def cpu_is_process(self) -> bool:
+        """CPU処理をプロセスプールで実行するかどうか"""
+        return self.config.cpu_kind == "process"
+
+    @property
+    def io(self) -> ThreadPoolExecutor:
+        """I/O用スレッドプール"""
+        if self._io is None:
+            self._io = ThreadPoolExecutor(max_workers=self.config.io_workers, thread_name_prefix="timetree-io")
+        return self._io
+
+    @property
+    def cpu(self) -> Executor:
+        """CPU用プール"""
+        if self._cpu is None:
+            if self.cpu_is_process:
+                # スレッドを持つプロセスからforkしないようspawnで起動する
+                self._cpu = ProcessPoolExecutor(
+                    max_workers=self.config.cpu_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker_process
+                )
+            else:
+                self._cpu = ThreadPoolExecutor(max_workers=self.config.cpu_workers, thread_name_prefix="timetree-cpu")
+            logger.debug(f"Started {self.config.cpu_kind} pool with {self.config.cpu_workers} worker(s)")
+        return self._cpu
+
+    @property
+    def parse_workers(self) -> int:
+        """並列解析のプロセス数"""
+        return self.config.parse_workers or os.cpu_count() or 1
+
+    def parse_pool_for(self, ics_file: Union[str, Path]) -> Optional[ProcessPoolExecutor]:
+        """ICSのサイズが閾値以上なら並列解析用のプロセスプールを返す"""
+        threshold = self.config.parallel_parse_min_mb
+        if threshold <= 0:
+            return None
+        try:
+            if Path(ics_file).stat().st_size < threshold * 1024 * 1024:
+                return None
+        except OSError:
+            return None
+        if self._parse is None:
+            self._parse = ProcessPoolExecutor(
+                max_workers=self.parse_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker_process
+            )
+            logger.debug(f"Started parse pool with {self.parse_workers} worker(s)")
+        return self._parse
+
+    async def run_io(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """I/O処理をスレッドプールで実行"""
+        return await asyncio.get_running_loop().run_in_executor(self.io, functools.partial(func, *args, **kwargs))
+
+    async def run_cpu(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """CPU処理をCPU用プールで実行"""
+        return await asyncio.get_running_loop().run_in_executor(self.cpu, functools.partial(func, *args, **kwargs))
+
+    def shutdown(self, wait: bool = True):
+        """プールを停止"""
+        for executor in (self._io, self._cpu, self._parse):
+            if executor is not None:
+                executor.shutdown(wait=wait)
+        self._io = None
+        self._cpu = None
+        self._parse = None
+
+
+def _init_worker_process():
+    """ワーカープロセスのログ設定（ログファイルには書かず、警告以上だけ標準エラーへ）"""
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
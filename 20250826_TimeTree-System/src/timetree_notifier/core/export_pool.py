@@ -0,0 +1,170 @@
+"""TimeTree-Exporterの実行と複数アカウントの並行エクスポート"""
+
+import asyncio
+import os
+import shlex
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+from loguru import logger
+
+from .models import ExportResult
+from ..config.settings import TimeTreeAccountConfig, TimeTreeConfig
+
+
+def account_path(path: Union[str, Path], account_name: str, per_account: bool = True) -> Path:
+    """アカウントごとのファイルパス（例: backup.ics → backup_work.ics）
+
+    per_account が False なら（従来の単一アカウント設定）元のパスをそのまま使う。
+    """
+    path = Path(path)
+    if not per_account:
+        return path
+    return path.with_name(f"{path.stem}_{account_name}{path.suffix}")
+
+
+async def run_exporter(
+    command: str,
+    email: str,
+    password: str,
+    output_file: Path,
+    timeout: float,
+    extra_args: Sequence[str] = (),
+    account: Optional[str] = None,
+) -> ExportResult:
+    """TimeTree-Exporterを1回実行"""
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+
+    start_time = time.time()
+
+    try:
+        cmd = [
+            *shlex.split(command),
+            "-o", str(output_file),
+            "-e", email,
+            *extra_args
+        ]
+
+        # 環境変数設定
+        env = os.environ.copy()
+        env.update({
+            "TIMETREE_EMAIL": email,
+            "TIMETREE_PASSWORD": password
+        })
+
+        logger.debug(f"Executing: {' '.join(cmd)}")
+
+        # プロセス実行
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=env
+        )
+
+        try:
+            stdout, stderr = await asyncio.wait_for(
+                process.communicate(),
+                timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            return ExportResult(
+                success=False,
+                error_message="TimeTree-Exporter execution timeout",
+                error_type="timeout",
+                execution_time=time.time() - start_time,
+                account=account
+            )
+
+        execution_time = time.time() - start_time
+
+        if process.returncode == 0:
+            if output_file.exists() and output_file.stat().st_size > 0:
+                return ExportResult(
+                    success=True,
+                    output_file=output_file,
+                    execution_time=execution_time,
+                    account=account
+                )
+            else:
+                return ExportResult(
+                    success=False,
+                    error_message="ICS file was not created or is empty",
+                    error_type="empty_output",
+                    execution_time=execution_time,
+                    account=account
+                )
+        else:
+            error_msg = stderr.decode() if stderr else "Unknown error"
+            return ExportResult(
+                success=False,
+                error_message=error_msg,
+                error_type="execution_error",
+                execution_time=execution_time,
+                account=account
+            )
+
+    except Exception as e:
+        return ExportResult(
+            success=False,
+            error_message=str(e),
+            error_type="system_error",
+            execution_time=time.time() - start_time,
+            account=account
+        )
+
+
+class ExportPool:
+    """複数アカウントのTimeTree-Exporterを並行実行
+
+    同時実行数は exporter.max_parallel までに制限する。アカウントごとに
+    出力ファイルとタイムアウトを分けるため、遅いアカウントが他を待たせない。
+    """
+
+    def __init__(self, config: TimeTreeConfig, temp_ics: Union[str, Path]):
+        self.config = config
+        self.temp_ics = Path(temp_ics)
+        # イベントループ上で初めて使うときに作成する
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def output_file(self, account: TimeTreeAccountConfig) -> Path:
+        """アカウントごとの出力ファイル"""
+        return account_path(self.temp_ics, account.name, self.config.is_multi_account)
+
+    async def export_all(
+        self, accounts: Optional[List[TimeTreeAccountConfig]] = None
+    ) -> Dict[str, ExportResult]:
+        """全アカウントを並行エクスポート（結果はアカウント名ごと）"""
+        accounts = accounts if accounts is not None else self.config.get_accounts()
+        results = await asyncio.gather(*(self.export(account) for account in accounts))
+
+        for result in results:
+            if result.success:
+                logger.info(f"Export for {result.account} finished in {result.execution_time:.1f}s "
+                            f"(queued {result.queued_time:.1f}s)")
+            else:
+                logger.error(f"Export for {result.account} failed: {result.error_message}")
+
+        return {result.account: result for result in results}
+
+    async def export(self, account: TimeTreeAccountConfig) -> ExportResult:
+        """1アカウントをエクスポート（同時実行数の枠が空くまで待つ）"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(max(1, self.config.exporter.max_parallel))
+        queued_at = time.time()
+        async with self._semaphore:
+            queued_time = time.time() - queued_at
+            result = await run_exporter(
+                self.config.exporter.command,
+                account.email,
+                account.password,
+                self.output_file(account),
+                account.timeout or self.config.exporter.timeout,
+                account.extra_args,
+                account=account.name
+            )
+        result.queued_time = queued_time
+        return result
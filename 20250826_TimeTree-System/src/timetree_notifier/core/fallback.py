@@ -0,0 +1,75 @@
+"""取得できなかったときに送る予定の保持
+
+エクスポートに成功するたびに、アカウントごとに今日から数日分の予定を日ごとに保持しておく。
+送信時にエクスポートが失敗した・時間内に終わらなかった場合は、この予定でサマリーを作って
+時刻どおりに送り、最新の予定を取得できた時点で内容が変わっていれば訂正を送る。
+メッセージはフッターや送信先の組み合わせで変わるため、保持するのは予定だけにする。
+"""
+
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .models import Event
+
+
+@dataclass
+class FallbackSnapshot:
+    """あるアカウントの、最後に取得できた時点の予定"""
+    start: date
+    # start から1日ずつの予定
+    days: List[List[Event]]
+    # 予定を取得した時刻（内容が同じエクスポートがあれば更新する）
+    as_of: datetime
+    # 元になったエクスポートのSHA-256（インデックスから読み込んだ場合は None）
+    content_hash: Optional[str] = None
+
+
+class FallbackStore:
+    """アカウントごとの直近の予定"""
+
+    def __init__(self):
+        self._snapshots: Dict[str, FallbackSnapshot] = {}
+
+    def __contains__(self, account_name: str) -> bool:
+        return account_name in self._snapshots
+
+    def put(
+        self,
+        account_name: str,
+        start: date,
+        days: Sequence[Sequence[Event]],
+        content_hash: Optional[str] = None,
+        as_of: Optional[datetime] = None,
+    ):
+        """予定を保持（前回の分は置き換える）"""
+        self._snapshots[account_name] = FallbackSnapshot(
+            start=start,
+            days=[list(events) for events in days],
+            as_of=as_of or datetime.now(),
+            content_hash=content_hash,
+        )
+
+    def refresh(self, account_name: str, start: date, content_hash: Optional[str]) -> bool:
+        """同じ内容のエクスポートなら取得時刻だけ更新して True（予定の取り直しは不要）"""
+        snapshot = self._snapshots.get(account_name)
+        if snapshot is None or content_hash is None:
+            return False
+        if snapshot.start != start or snapshot.content_hash != content_hash:
+            return False
+        snapshot.as_of = datetime.now()
+        return True
+
+    def get(self, account_name: str, day: date) -> Optional[Tuple[List[Event], datetime]]:
+        """その日の予定と取得時刻（保持している期間外なら None）"""
+        snapshot = self._snapshots.get(account_name)
+        if snapshot is None:
+            return None
+        offset = (day - snapshot.start).days
+        if not 0 <= offset < len(snapshot.days):
+            return None
+        return snapshot.days[offset], snapshot.as_of
+
+    def clear(self):
+        """全て破棄（設定が変わった場合など）"""
+        self._snapshots.clear()
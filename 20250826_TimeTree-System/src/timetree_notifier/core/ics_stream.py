@@ -0,0 +1,210 @@
+"""ICSファイルのストリーミング読み込み
+
+カレンダー全体をメモリに展開せず、VEVENTブロックを1件ずつ取り出す。
+"""
+
+import mmap
+import re
+from datetime import date, timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, List, Optional, Sequence, Tuple, Union
+
+from loguru import logger
+
+if TYPE_CHECKING:
+    from icalendar import Component
+
+
+_BEGIN_VEVENT = b"BEGIN:VEVENT"
+_END_VEVENT = b"END:VEVENT"
+_BEGIN_VTIMEZONE = b"BEGIN:VTIMEZONE"
+_END_VTIMEZONE = b"END:VTIMEZONE"
+
+# mmap走査用（行頭一致させるため改行を含める）
+_NL_BEGIN_VEVENT = b"\n" + _BEGIN_VEVENT
+_NL_END_VEVENT = b"\n" + _END_VEVENT
+_NL_BEGIN_VTIMEZONE = b"\n" + _BEGIN_VTIMEZONE
+_NL_END_VTIMEZONE = b"\n" + _END_VTIMEZONE
+_RECURRENCE_PATTERN = re.compile(rb"\n(?:RRULE|RDATE)[;:]")
+_FOLDED_DTSTART_PATTERN = re.compile(rb"\nDTSTART[;:][^\n]*\n[ \t]")
+
+
+def iter_vevent_blocks(ics_file: Union[str, Path]) -> Iterator[bytes]:
+    """ICSファイルからVEVENTブロックの生バイト列を順に返す
+
+    ファイルは行単位で読み進めるため、メモリ使用量は最大のVEVENT1件分で済む。
+    途中に現れたVTIMEZONEはicalendarのタイムゾーンキャッシュへ登録する。
+    """
+    block: list = []
+    terminator = None
+
+    with open(ics_file, "rb") as f:
+        for line in f:
+            stripped = line.rstrip(b"\r\n")
+
+            if terminator is None:
+                if stripped == _BEGIN_VEVENT:
+                    terminator = _END_VEVENT
+                    block = [line]
+                elif stripped == _BEGIN_VTIMEZONE:
+                    terminator = _END_VTIMEZONE
+                    block = [line]
+                continue
+
+            block.append(line)
+            if stripped != terminator:
+                continue
+
+            data = b"".join(block)
+            block = []
+            if terminator == _END_VEVENT:
+                terminator = None
+                yield data
+            else:
+                terminator = None
+                _register_timezone(data)
+
+
+def iter_candidate_blocks(ics_file: Union[str, Path], target_date: date, days: int = 1) -> Iterator[bytes]:
+    """DTSTARTの生バイト列で事前に絞り込んだVEVENTブロックを返す
+
+    ファイルをmmapし、DTSTARTの日付部分が target_date から days 日間のいずれかと
+    一致するブロックと、RRULE/RDATEを持つブロックだけをファイル順に返す。
+    それ以外はicalendarに渡さない。
+    DTSTART行が折り返されているブロックは判定をicalendar側に委ねるため候補に含める。
+    """
+    targets = b"|".join(
+        (target_date + timedelta(days=offset)).strftime("%Y%m%d").encode("ascii") for offset in range(days)
+    )
+    dtstart_pattern = re.compile(rb"\nDTSTART[;:][^\n]*:(?:" + targets + rb")(?:T|\r?\n)")
+
+    with open(ics_file, "rb") as f:
+        if Path(ics_file).stat().st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            _register_timezones_in(mm)
+
+            starts = set()
+            for pattern in (dtstart_pattern, _RECURRENCE_PATTERN, _FOLDED_DTSTART_PATTERN):
+                for match in pattern.finditer(mm):
+                    block_start = _enclosing_vevent_start(mm, match.start())
+                    if block_start is not None:
+                        starts.add(block_start)
+
+            for block_start in sorted(starts):
+                end = mm.find(_NL_END_VEVENT, block_start)
+                line_end = mm.find(b"\n", end + 1)
+                end = len(mm) if line_end == -1 else line_end + 1
+                yield mm[block_start:end]
+
+
+def iter_vevent_spans(mm: Union[bytes, mmap.mmap]) -> Iterator[Tuple[int, int]]:
+    """VEVENTブロックの (開始位置, 終了位置) を順に返す
+
+    iter_vevent_blocks と同じ範囲（BEGIN:VEVENT行からEND:VEVENT行の改行まで）を返す。
+    """
+    pos = 0 if mm[:len(_BEGIN_VEVENT)] == _BEGIN_VEVENT else _find_line(mm, _NL_BEGIN_VEVENT, 0)
+    while pos != -1:
+        end = _find_line(mm, _NL_END_VEVENT, pos)
+        if end == -1:
+            return
+        line_end = mm.find(b"\n", end + 1)
+        end = len(mm) if line_end == -1 else line_end + 1
+        yield pos, end
+        pos = _find_line(mm, _NL_BEGIN_VEVENT, end - 1)
+
+
+def read_blocks(ics_file: Union[str, Path], spans: Sequence[Tuple[int, int]]) -> List[bytes]:
+    """指定範囲のVEVENTブロックを読み出す（ファイル内のVTIMEZONEは先に登録する）"""
+    with open(ics_file, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            _register_timezones_in(mm)
+            return [mm[start:end] for start, end in spans]
+
+
+def parse_vevent_block(block: bytes) -> "Component":
+    """VEVENTブロックをicalendarコンポーネントに変換（icalendarは初回の解析時に読み込む）"""
+    from icalendar import Component
+    return Component.from_ical(block)
+
+
+def read_property(block: bytes, name: bytes) -> Optional[bytes]:
+    """VEVENTブロックから指定プロパティの値を折り返しを解除して取り出す
+
+    icalendarを使わずに生バイト列から読むため、値のエスケープは解除しない。
+    """
+    prefix = b"\n" + name
+    pos = -1
+    search = 0
+    while True:
+        pos = block.find(prefix, search)
+        if pos == -1:
+            return None
+        if block[pos + len(prefix):pos + len(prefix) + 1] in (b":", b";"):
+            break
+        search = pos + len(prefix)
+
+    parts = []
+    line_start = pos + 1
+    while True:
+        line_end = block.find(b"\n", line_start)
+        if line_end == -1:
+            line_end = len(block)
+        parts.append(block[line_start:line_end].rstrip(b"\r"))
+        # 次行が空白始まりなら折り返し行
+        if block[line_end + 1:line_end + 2] not in (b" ", b"\t"):
+            break
+        line_start = line_end + 2
+    line = b"".join(parts)
+
+    # パラメータ内の引用符で囲まれた ":" は区切りとみなさない
+    quoted = False
+    for i in range(len(name), len(line)):
+        char = line[i:i + 1]
+        if char == b'"':
+            quoted = not quoted
+        elif char == b":" and not quoted:
+            return line[i + 1:]
+    return None
+
+
+def _find_line(mm: Union[bytes, mmap.mmap], marker: bytes, start: int) -> int:
+    """start 以降で marker（改行＋行全体）と一致する行の先頭位置（なければ -1）"""
+    pos = mm.find(marker, start)
+    while pos != -1:
+        after = mm[pos + len(marker):pos + len(marker) + 1]
+        if after in (b"\r", b"\n", b""):
+            return pos + 1
+        pos = mm.find(marker, pos + 1)
+    return -1
+
+
+def _enclosing_vevent_start(mm: mmap.mmap, pos: int) -> Optional[int]:
+    """pos を含むVEVENTブロックの先頭位置（VEVENT外なら None）"""
+    begin = mm.rfind(_NL_BEGIN_VEVENT, 0, pos + 1)
+    if begin == -1:
+        return None
+    end = mm.find(_NL_END_VEVENT, begin + 1)
+    if end == -1 or end < pos:
+        return None
+    return begin + 1
+
+
+def _register_timezones_in(mm: mmap.mmap):
+    """mmap内の全VTIMEZONEをタイムゾーンキャッシュに登録"""
+    pos = mm.find(_NL_BEGIN_VTIMEZONE)
+    while pos != -1:
+        end = mm.find(_NL_END_VTIMEZONE, pos)
+        if end == -1:
+            break
+        end += len(_NL_END_VTIMEZONE)
+        _register_timezone(mm[pos + 1:end] + b"\r\n")
+        pos = mm.find(_NL_BEGIN_VTIMEZONE, end)
+
+
+def _register_timezone(block: bytes):
+    """VTIMEZONEをパースしてicalendarのタイムゾーンキャッシュに登録"""
+    try:
+        parse_vevent_block(block)
+    except Exception as e:
+        logger.warning(f"Failed to parse VTIMEZONE: {e}")
@@ -0,0 +1,108 @@
+"""エクスポート差分の検出
+
+VEVENTをUID・SEQUENCE・LAST-MODIFIEDで識別し、前回のエクスポートとの差分を求める。
+icalendarでの解析は行わず、生バイト列だけで判定する。
+"""
+
+import hashlib
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Mapping, Tuple, Union
+
+from .ics_stream import iter_vevent_blocks, read_property
+
+
+_DTSTAMP_LINE = re.compile(rb"\r?\nDTSTAMP[;:][^\n]*")
+
+
+@dataclass
+class ExportDiff:
+    """前回エクスポートとの差分"""
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: int = 0
+
+    @property
+    def has_changes(self) -> bool:
+        """差分があるかどうか"""
+        return bool(self.added or self.changed or self.removed)
+
+    @property
+    def total(self) -> int:
+        """今回のエクスポートに含まれる予定数"""
+        return len(self.added) + len(self.changed) + self.unchanged
+
+    def summary(self) -> str:
+        """ログ出力用の要約"""
+        return (
+            f"added={len(self.added)} changed={len(self.changed)} "
+            f"removed={len(self.removed)} unchanged={self.unchanged}"
+        )
+
+
+def uid_key_of(block: bytes) -> str:
+    """予定を一意に識別するキー（UIDとRECURRENCE-IDの組）
+
+    UIDのない予定はブロック内容のハッシュで識別する。
+    """
+    uid = read_property(block, b"UID")
+    if not uid:
+        return "#" + hashlib.sha1(block).hexdigest()
+    recurrence_id = read_property(block, b"RECURRENCE-ID")
+    if recurrence_id:
+        return f"{uid.decode('utf-8', 'replace')}|{recurrence_id.decode('ascii', 'replace')}"
+    return uid.decode('utf-8', 'replace')
+
+
+def fingerprint_block(block: bytes) -> str:
+    """VEVENTブロックの版を表すハッシュ
+
+    LAST-MODIFIEDがあれば UID・SEQUENCE・LAST-MODIFIED から求める。
+    ない場合は更新を見逃さないよう、毎回変わるDTSTAMPを除いたブロック全体から求める。
+    """
+    last_modified = read_property(block, b"LAST-MODIFIED")
+    if last_modified is None:
+        return hashlib.sha1(_DTSTAMP_LINE.sub(b"", block)).hexdigest()
+
+    digest = hashlib.sha1()
+    for value in (
+        read_property(block, b"UID"),
+        read_property(block, b"SEQUENCE"),
+        last_modified,
+    ):
+        digest.update(value or b"")
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def iter_keyed_blocks(ics_file: Union[str, Path]) -> Iterator[Tuple[str, str, bytes]]:
+    """(識別キー, フィンガープリント, ブロック) を順に返す"""
+    for block in iter_vevent_blocks(ics_file):
+        yield uid_key_of(block), fingerprint_block(block), block
+
+
+def scan_fingerprints(ics_file: Union[str, Path]) -> Dict[str, str]:
+    """ICSファイル内の全予定の 識別キー→フィンガープリント"""
+    return {key: fingerprint for key, fingerprint, _ in iter_keyed_blocks(ics_file)}
+
+
+def diff_fingerprints(previous: Mapping[str, str], current: Mapping[str, str]) -> ExportDiff:
+    """フィンガープリント同士を比較して差分を求める"""
+    diff = ExportDiff()
+    for key, fingerprint in current.items():
+        old = previous.get(key)
+        if old is None:
+            diff.added.append(key)
+        elif old != fingerprint:
+            diff.changed.append(key)
+        else:
+            diff.unchanged += 1
+    diff.removed = [key for key in previous if key not in current]
+    return diff
+
+
+def diff_exports(previous_file: Union[str, Path], current_file: Union[str, Path]) -> ExportDiff:
+    """2つのICSファイルの差分を求める"""
+    return diff_fingerprints(scan_fingerprints(previous_file), scan_fingerprints(current_file))
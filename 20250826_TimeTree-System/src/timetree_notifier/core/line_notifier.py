@@ -0,0 +1,220 @@
+"""LINE Messaging API通知"""
+
+import asyncio
+import time
+from typing import TYPE_CHECKING, List, Mapping, Optional, Sequence, Tuple, Union
+
+from .models import NotificationResult, RecipientResult
+from .rate_limiter import AdaptiveRateLimiter
+from ..utils.metrics import Histogram
+
+if TYPE_CHECKING:
+    import aiohttp
+
+
+# multicast APIで1リクエストに指定できる送信先の上限
+MULTICAST_MAX_RECIPIENTS = 500
+
+# 1通のテキスト、または1リクエストで続けて送る複数通（最大5通）
+Message = Union[str, Sequence[str]]
+
+
+class LineNotifier:
+    """LINE Messaging API通知クラス
+
+    HTTPセッションは初回送信時に1つだけ作成し、keep-aliveで接続を使い回す。
+    不要になったら close() で閉じる。
+    同一メッセージはmulticast APIでまとめて送り、個別メッセージは同時実行数を
+    制限しながらpush APIで並行送信する。
+    rate_limit を指定すると全リクエストを共通のレート制御に通し、429 は
+    Retry-After を待ってから max_rate_limit_retries 回まで送り直す。
+    """
+
+    def __init__(
+        self,
+        channel_access_token: str,
+        user_id: str = "",
+        api_base_url: str = "https://api.line.me",
+        timeout: float = 10.0,
+        max_connections: int = 10,
+        recipients: Optional[Sequence[str]] = None,
+        max_concurrency: int = 10,
+        rate_limit: Optional[float] = None,
+        max_rate_limit: float = 2000.0,
+        max_rate_limit_retries: int = 3,
+    ):
+        self.channel_access_token = channel_access_token
+        self.user_id = user_id
+        self.recipients = list(recipients) if recipients else [user_id]
+        self.api_base_url = api_base_url.rstrip('/')
+        self.api_url = f"{self.api_base_url}/v2/bot/message/push"
+        self.multicast_url = f"{self.api_base_url}/v2/bot/message/multicast"
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.send_latency = Histogram(
+            "line_send_latency_seconds", "LINE Messaging API の応答時間"
+        )
+        self.rate_limiter = (
+            AdaptiveRateLimiter(rate_limit, max_rate=max_rate_limit) if rate_limit else None
+        )
+        self.max_rate_limit_retries = max_rate_limit_retries
+        self._session: Optional["aiohttp.ClientSession"] = None
+
+    async def send_message(
+        self, message: Message, recipients: Optional[Sequence[str]] = None
+    ) -> NotificationResult:
+        """同じメッセージを全送信先に送信
+
+        送信先が1件ならpush API、複数ならmulticast APIを最大500件ずつ使う。
+        """
+        recipients = list(recipients) if recipients is not None else self.recipients
+        if len(recipients) == 1:
+            return await self._push(recipients[0], message)
+
+        batches = [
+            recipients[i:i + MULTICAST_MAX_RECIPIENTS]
+            for i in range(0, len(recipients), MULTICAST_MAX_RECIPIENTS)
+        ]
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def send_batch(batch: List[str]) -> List[RecipientResult]:
+            async with semaphore:
+                success, error, status = await self._post(
+                    self.multicast_url, {"to": batch, "messages": _text_messages(message)}
+                )
+            return [RecipientResult(user_id, success, error, status) for user_id in batch]
+
+        results = await asyncio.gather(*(send_batch(batch) for batch in batches))
+        return _aggregate([r for batch in results for r in batch])
+
+    async def send_personalized(self, messages: Mapping[str, Message]) -> NotificationResult:
+        """送信先ごとに異なるメッセージを並行送信（同時実行数は max_concurrency まで）"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def send_one(user_id: str, message: Message) -> RecipientResult:
+            async with semaphore:
+                success, error, status = await self._post(
+                    self.api_url, {"to": user_id, "messages": _text_messages(message)}
+                )
+            return RecipientResult(user_id, success, error, status)
+
+        results = await asyncio.gather(
+            *(send_one(user_id, message) for user_id, message in messages.items())
+        )
+        return _aggregate(list(results))
+
+    async def send_request(
+        self, recipients: Sequence[str], message: Message, retry_key: Optional[str] = None
+    ) -> NotificationResult:
+        """1回のAPIリクエストで送信（送信先は1〜500件）
+
+        retry_key を指定すると X-Line-Retry-Key として送り、同じキーで再送しても
+        LINE側で重複配信されない。受付済み（409）は成功として扱う。
+        """
+        recipients = list(recipients)
+        if len(recipients) == 1:
+            url, to = self.api_url, recipients[0]
+        else:
+            url, to = self.multicast_url, recipients
+        success, error, status = await self._post(
+            url, {"to": to, "messages": _text_messages(message)}, retry_key
+        )
+        return _aggregate([RecipientResult(user_id, success, error, status) for user_id in recipients])
+
+    async def close(self):
+        """HTTPセッションを閉じる"""
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _push(self, user_id: str, message: Message) -> NotificationResult:
+        """1件の送信先にpush送信"""
+        success, error, status = await self._post(
+            self.api_url, {"to": user_id, "messages": _text_messages(message)}
+        )
+        result = _aggregate([RecipientResult(user_id, success, error, status)])
+        if success:
+            result.message = "Notification sent successfully"
+        return result
+
+    async def _post(
+        self, url: str, data: dict, retry_key: Optional[str] = None
+    ) -> Tuple[bool, Optional[str], Optional[int]]:
+        """APIにPOSTし、(成功したか, エラー内容, HTTPステータス) を返す"""
+        headers = {
+            "Authorization": f"Bearer {self.channel_access_token}",
+            "Content-Type": "application/json"
+        }
+        if retry_key:
+            headers["X-Line-Retry-Key"] = retry_key
+
+        for _ in range(self.max_rate_limit_retries + 1):
+            success, error, status = await self._post_once(url, headers, data, retry_key)
+            if status != 429 or self.rate_limiter is None:
+                break
+        return success, error, status
+
+    async def _post_once(
+        self, url: str, headers: dict, data: dict, retry_key: Optional[str]
+    ) -> Tuple[bool, Optional[str], Optional[int]]:
+        """1回だけPOST（レート制御があれば送信枠を待つ）"""
+        if self.rate_limiter:
+            await self.rate_limiter.acquire()
+
+        started = time.perf_counter()
+        try:
+            session = self._get_session()
+            async with session.post(url, headers=headers, json=data) as response:
+                body = await response.text()
+            if self.rate_limiter:
+                self.rate_limiter.on_response(response.status, response.headers)
+
+            if response.status == 200:
+                return True, None, response.status
+            if response.status == 409 and retry_key:
+                # 同じリトライキーのリクエストは受付済み
+                return True, None, response.status
+            error_detail = body if body else "Unknown error"
+            return False, f"HTTP {response.status}: {error_detail}", response.status
+
+        except Exception as e:
+            return False, str(e) or type(e).__name__, None
+        finally:
+            self.send_latency.observe(time.perf_counter() - started)
+
+    def _get_session(self) -> "aiohttp.ClientSession":
+        """keep-alive接続を使い回すHTTPセッションを取得（aiohttpは初回送信時に読み込む）"""
+        if self._session is None or self._session.closed:
+            import aiohttp
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=max(self.max_connections, self.max_concurrency)),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+
+def _text_messages(message: Message) -> List[dict]:
+    """テキストメッセージのペイロード（複数通なら送る順に並べる）"""
+    if isinstance(message, str):
+        return [{"type": "text", "text": message}]
+    return [{"type": "text", "text": text} for text in message]
+
+
+def _aggregate(results: List[RecipientResult]) -> NotificationResult:
+    """送信先ごとの結果をまとめる"""
+    failed = [r for r in results if not r.success]
+    if not failed:
+        return NotificationResult(
+            success=True,
+            message=f"Notification sent to {len(results)} recipient(s)",
+            recipient_results=results,
+        )
+
+    errors = sorted({r.error_message or "Unknown error" for r in failed})
+    return NotificationResult(
+        success=False,
+        message=f"Sent to {len(results) - len(failed)}/{len(results)} recipient(s)",
+        error_message="; ".join(errors),
+        recipient_results=results,
+    )
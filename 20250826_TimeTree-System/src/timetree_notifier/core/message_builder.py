@@ -0,0 +1,177 @@
+"""文字数の上限に合わせたメッセージの組み立て
+
+行を追加するたびに残りの文字数を数え、1通に入りきらなければ次の通に送る。
+LINEは1リクエストで最大5通まで送れるため、その数を使い切ったら以降の追加を断り、
+呼び出し側はそこで予定の整形をやめて残りの件数だけを表示する。
+最後の1通には結び・フッターと省略表示の分を空けておく。
+"""
+
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Sequence, Tuple
+
+from .models import Event
+
+
+# LINEの1リクエストで送れるメッセージ数の上限
+MAX_MESSAGES_PER_REQUEST = 5
+
+# 省略表示（"  ... 他N件の予定"）のために最後の1通に空けておく文字数
+OVERFLOW_RESERVE = 40
+
+
+class MessageBuilder:
+    """文字数の上限を見ながら行を追加し、最大 max_messages 通のメッセージにする
+
+    add() に渡した行のまとまりは複数の通に分けない。
+    tail の行（結び・フッター）は build() で最後の通の末尾に付ける。
+    """
+
+    def __init__(self, max_length: int, max_messages: int = MAX_MESSAGES_PER_REQUEST, tail: Sequence[str] = ()):
+        self.max_length = max_length
+        self.max_messages = max_messages
+        self.tail = list(tail)
+        self._reserve = _joined_length(self.tail) + 1 + OVERFLOW_RESERVE
+        self._messages: List[List[str]] = [[]]
+        self._length = 0
+        # これ以上の行を追加できないか
+        self.full = False
+
+    def add(self, *lines: str) -> bool:
+        """行のまとまりを追加（入りきらなければ False を返し、以降も追加しない）"""
+        if self.full:
+            return False
+
+        lines = list(lines)
+        if self._fits(lines):
+            self._append(lines)
+            return True
+
+        # 次の通に送る（通の先頭の空行は除く）
+        if self._messages[-1] and len(self._messages) < self.max_messages:
+            self._messages.append([])
+            self._length = 0
+            lines = _strip_leading_blank(lines)
+            if self._fits(lines):
+                self._append(lines)
+                return True
+
+        # 1通の上限より長いまとまりは切り詰める
+        if not self._messages[-1] and _joined_length(lines) > self.max_length:
+            self._append([_clip("\n".join(lines), self._limit())])
+            return True
+
+        self.full = True
+        return False
+
+    def add_overflow(self, line: str):
+        """省略表示の行を追加（最後の通でも空けておいた分に入れる）"""
+        if self.add(line):
+            return
+        line = _clip(line, OVERFLOW_RESERVE)
+        self._append([line])
+        self.full = True
+
+    def build(self) -> List[str]:
+        """tail を付けて完成したメッセージ（1〜max_messages 通）"""
+        tail = self.tail
+        if tail and not self._fits(tail, self.max_length):
+            if self._messages[-1] and len(self._messages) < self.max_messages:
+                self._messages.append([])
+                self._length = 0
+                tail = _strip_leading_blank(tail)
+            if not self._fits(tail, self.max_length):
+                tail = [_clip("\n".join(tail), max(0, self.max_length - self._length - 1))]
+        self._append(tail)
+        return ["\n".join(lines) for lines in self._messages if lines]
+
+    def _limit(self) -> int:
+        """現在の通に使える文字数（最後の1通は tail と省略表示の分を空けておく）"""
+        if len(self._messages) < self.max_messages:
+            return self.max_length
+        return max(1, self.max_length - self._reserve)
+
+    def _fits(self, lines: Sequence[str], limit: int = 0) -> bool:
+        separator = 1 if self._messages[-1] else 0
+        return self._length + separator + _joined_length(lines) <= (limit or self._limit())
+
+    def _append(self, lines: Sequence[str]):
+        if not lines:
+            return
+        self._length += (1 if self._messages[-1] else 0) + _joined_length(lines)
+        self._messages[-1].extend(lines)
+
+
+class EventLineFormatter:
+    """予定1件分の表示行（同じ内容の予定は前回整形した結果を使う）
+
+    整形結果は最大 max_entries 件を古いものから捨てながら保持する。
+    """
+
+    def __init__(self, include_description: bool = True, include_location: bool = True, max_entries: int = 4096):
+        self.include_description = include_description
+        self.include_location = include_location
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[tuple, Tuple[str, ...]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def lines(self, event: Event) -> Tuple[str, ...]:
+        """「・時間 タイトル」と説明・場所の行"""
+        key = (
+            event.title, _wall(event.start_time), _wall(event.end_time), event.description, event.location
+        )
+        lines = self._cache.get(key)
+        if lines is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return lines
+
+        self.misses += 1
+        lines = self._format(event)
+        self._cache[key] = lines
+        if len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+        return lines
+
+    def _format(self, event: Event) -> Tuple[str, ...]:
+        lines = [f"・{event.format_time_range()} {event.title}"]
+
+        # 説明を追加
+        if self.include_description and event.description.strip():
+            desc = event.description.strip()[:100]  # 100文字制限
+            lines.append(f"  {desc}")
+
+        # 場所を追加
+        if self.include_location and event.location.strip():
+            lines.append(f"  📍 {event.location}")
+
+        return tuple(lines)
+
+
+def _wall(value):
+    """表示に使う壁時計の値（タイムゾーン付きは同じ時点でも表示が違うため外す）"""
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    return value
+
+
+def _joined_length(lines: Sequence[str]) -> int:
+    """改行でつないだときの文字数"""
+    if not lines:
+        return 0
+    return sum(len(line) for line in lines) + len(lines) - 1
+
+
+def _strip_leading_blank(lines: Sequence[str]) -> List[str]:
+    lines = list(lines)
+    while lines and not lines[0]:
+        lines.pop(0)
+    return lines
+
+
+def _clip(text: str, limit: int) -> str:
+    """limit 文字に収まるよう末尾を「…」にして切り詰める"""
+    if len(text) <= limit:
+        return text
+    return text[:max(0, limit - 1)] + "…"
@@ -1,26 +1,52 @@
 """データモデル定義"""
 
 from datetime import datetime, date
-from dataclasses import dataclass
-from typing import Optional, List
+from dataclasses import dataclass, field
+from typing import Optional, List, Sequence
 from pathlib import Path
 
 
-@dataclass
 class Event:
-    """予定イベントモデル"""
-    title: str
-    start_time: datetime
-    end_time: Optional[datetime] = None
-    description: str = ""
-    location: str = ""
+    """予定イベントモデル
+
+    大量に生成されるため __slots__ でインスタンスごとの __dict__ を持たない。
+    まとめて扱う場合は EventBatch を使う。
+    """
+    __slots__ = ("title", "start_time", "end_time", "description", "location")
+    
+    def __init__(
+        self,
+        title: str,
+        start_time: datetime,
+        end_time: Optional[datetime] = None,
+        description: str = "",
+        location: str = "",
+    ):
+        self.title = title
+        self.start_time = start_time
+        self.end_time = end_time
+        self.description = description
+        self.location = location
+    
+    def _astuple(self) -> tuple:
+        return (self.title, self.start_time, self.end_time, self.description, self.location)
+    
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._astuple() == other._astuple()
+    
+    __hash__ = None
+    
+    def __repr__(self) -> str:
+        return (f"Event(title={self.title!r}, start_time={self.start_time!r}, end_time={self.end_time!r}, "
+                f"description={self.description!r}, location={self.location!r})")
     
     @property
     def is_all_day(self) -> bool:
         """終日イベントかどうか"""
-        return self.end_time is None or (
-            isinstance(self.start_time, date) and isinstance(self.end_time, date)
-        )
+        # datetimeはdateのサブクラスなので、datetimeでないことで判定する
+        return not isinstance(self.start_time, datetime)
     
     def format_time_range(self) -> str:
         """時間範囲の文字列フォーマット"""
@@ -35,6 +61,16 @@ class Event:
             return start_time
 
 
+@dataclass
+class RecipientResult:
+    """送信先ごとの通知結果"""
+    user_id: str
+    success: bool
+    error_message: Optional[str] = None
+    # HTTPステータス（通信エラーなら None）
+    status: Optional[int] = None
+
+
 @dataclass
 class NotificationResult:
     """通知結果モデル"""
@@ -42,10 +78,16 @@ class NotificationResult:
     message: str = ""
     error_message: Optional[str] = None
     sent_at: Optional[datetime] = None
+    recipient_results: List[RecipientResult] = field(default_factory=list)
     
     def __post_init__(self):
         if self.success and self.sent_at is None:
             self.sent_at = datetime.now()
+    
+    @property
+    def failed_recipients(self) -> List[str]:
+        """送信に失敗した送信先"""
+        return [r.user_id for r in self.recipient_results if not r.success]
 
 
 @dataclass
@@ -56,17 +98,62 @@ class ExportResult:
     error_message: Optional[str] = None
     execution_time: float = 0.0
     error_type: Optional[str] = None
+    account: Optional[str] = None
+    # 同時実行数の枠が空くまで待った時間
+    queued_time: float = 0.0
 
 
 @dataclass
 class DailySummary:
     """日次サマリーモデル"""
     date: date
-    events: List[Event]
+    # List[Event] または EventBatch
+    events: Sequence[Event]
     total_events: int
-    message: str
+    # 1回の送信で送るメッセージ（文字数の上限で分けたもの）
+    messages: List[str]
     generated_at: datetime
+    # 対象期間の日数（週間・月間まとめでは2以上）
+    days: int = 1
     
     def __post_init__(self):
         if self.total_events is None:
-            self.total_events = len(self.events)
\ No newline at end of file
+            self.total_events = len(self.events)
+    
+    @property
+    def message(self) -> str:
+        """全メッセージをつないだ本文"""
+        return "\n\n".join(self.messages)
+
+
+@dataclass
+class Tenant:
+    """通知時刻を個別に持つ送信先"""
+    user_id: str
+    time: str  # HH:MM
+    timezone: str
+    last_sent: Optional[date] = None
+    
+    @property
+    def local_minute(self) -> int:
+        """現地時刻の0時からの分数"""
+        hour, minute = map(int, self.time.split(':'))
+        return hour * 60 + minute
+
+
+@dataclass
+class Delivery:
+    """送信単位（同じメッセージを受け取る送信先のまとまり）"""
+    recipients: List[str]
+    # 1回の送信で送るメッセージ（最大5通）
+    messages: List[str]
+    # メッセージの元になったアカウント（エラー通知では空）
+    accounts: List[str] = field(default_factory=list)
+    summary: Optional[DailySummary] = None
+    # 取得に失敗し、前回取得できた予定で代わりに作ったアカウント
+    stale_accounts: List[str] = field(default_factory=list)
+    
+    @property
+    def is_error(self) -> bool:
+        """エラー通知かどうか"""
+        return self.summary is None
@@ -0,0 +1,375 @@
+"""LINE送信の永続アウトボックス
+
+送信するメッセージは送る前にSQLiteへ記録し、送信に失敗したものは指数バックオフで
+再送する。各レコードは X-Line-Retry-Key 用のキーを持つため、送信途中で
+プロセスが落ちて再送しても LINE 側で重複配信されない。
+"""
+
+import asyncio
+import functools
+import json
+import random
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from loguru import logger
+
+from .line_notifier import MULTICAST_MAX_RECIPIENTS, LineNotifier, Message
+from .models import NotificationResult
+
+if TYPE_CHECKING:
+    from .executors import StageExecutors
+
+
+_SCHEMA_VERSION = 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY,
+    dedupe_key TEXT NOT NULL UNIQUE,
+    retry_key TEXT NOT NULL,
+    recipients TEXT NOT NULL,
+    message TEXT NOT NULL,
+    extra_messages TEXT,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON outbox(status, next_attempt_at);
+"""
+
+# レコードの状態
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+
+# 送信済み・失敗のレコードを残しておく期間
+PURGE_AFTER_SECONDS = 30 * 24 * 3600
+
+
+@dataclass
+class OutboxEntry:
+    """送信待ちの1リクエスト分"""
+    id: int
+    retry_key: str
+    recipients: List[str]
+    # 1リクエストで続けて送るメッセージ（1〜5通）
+    messages: List[str]
+    attempts: int
+
+
+class Outbox:
+    """SQLiteによる送信待ちキュー"""
+
+    def __init__(self, db_path: Union[str, Path]):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._init_schema()
+
+    def enqueue(
+        self, recipients: Sequence[str], message: Message, dedupe_key: Optional[str] = None
+    ) -> List[int]:
+        """メッセージを記録し、レコードIDを返す
+
+        送信先はmulticastの上限ごとに分けて1レコード＝1リクエストにする。
+        message に複数通を渡すと同じリクエストで続けて送る。
+        dedupe_key を指定すると、同じキーのレコードは追加せず既存のIDを返す
+        （省略時は毎回新しいレコードになる）。
+        """
+        return self.enqueue_many([(recipients, message, dedupe_key)])[0]
+
+    def enqueue_many(
+        self, items: Iterable[Tuple[Sequence[str], Message, Optional[str]]]
+    ) -> List[List[int]]:
+        """(送信先, 本文, dedupe_key) をまとめて1トランザクションで記録"""
+        now = time.time()
+        ids = []
+        with self._connect() as conn:
+            for recipients, message, dedupe_key in items:
+                recipients = list(recipients)
+                messages = [message] if isinstance(message, str) else list(message)
+                if dedupe_key is None:
+                    # 同じ本文を送り直す場合（手動の再実行など）も別の送信として記録する
+                    dedupe_key = uuid.uuid4().hex
+                extra_messages = json.dumps(messages[1:]) if len(messages) > 1 else None
+
+                item_ids = []
+                for i in range(0, len(recipients), MULTICAST_MAX_RECIPIENTS):
+                    key = f"{dedupe_key}:{i // MULTICAST_MAX_RECIPIENTS}"
+                    conn.execute(
+                        "INSERT OR IGNORE INTO outbox (dedupe_key, retry_key, recipients, message, extra_messages, "
+                        "status, next_attempt_at, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (key, str(uuid.uuid4()), json.dumps(recipients[i:i + MULTICAST_MAX_RECIPIENTS]),
+                         messages[0], extra_messages, PENDING, now, now, now)
+                    )
+                    item_ids.append(
+                        conn.execute("SELECT id FROM outbox WHERE dedupe_key = ?", (key,)).fetchone()[0]
+                    )
+                ids.append(item_ids)
+        return ids
+
+    def claim(self, ids: Sequence[int]) -> List[OutboxEntry]:
+        """指定したレコードのうち送信待ちのものを送信中にして返す（再送時刻は待たない）"""
+        placeholders = ",".join("?" * len(ids))
+        return self._claim(f"status = ? AND id IN ({placeholders})", [PENDING, *ids])
+
+    def claim_due(self, limit: int, now: Optional[float] = None) -> List[OutboxEntry]:
+        """再送時刻を迎えた送信待ちレコードを古い順に最大 limit 件、送信中にして返す"""
+        return self._claim(
+            "status = ? AND next_attempt_at <= ? ORDER BY next_attempt_at, id LIMIT ?",
+            [PENDING, now if now is not None else time.time(), limit]
+        )
+
+    def record(
+        self,
+        sent: Sequence[int] = (),
+        retries: Sequence[Tuple[int, str, float]] = (),
+        failed: Sequence[Tuple[int, str]] = (),
+    ):
+        """送信結果を記録（retries は (ID, エラー内容, 次回送信時刻)）"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE outbox SET status = ?, attempts = attempts + 1, updated_at = ?, last_error = NULL "
+                "WHERE id = ?",
+                [(SENT, now, entry_id) for entry_id in sent]
+            )
+            conn.executemany(
+                "UPDATE outbox SET status = ?, attempts = attempts + 1, updated_at = ?, last_error = ?, "
+                "next_attempt_at = ? WHERE id = ?",
+                [(PENDING, now, error, next_at, entry_id) for entry_id, error, next_at in retries]
+            )
+            conn.executemany(
+                "UPDATE outbox SET status = ?, attempts = attempts + 1, updated_at = ?, last_error = ? "
+                "WHERE id = ?",
+                [(FAILED, now, error, entry_id) for entry_id, error in failed]
+            )
+
+    def statuses(self, ids: Sequence[int]) -> Dict[int, str]:
+        """レコードごとの状態"""
+        placeholders = ",".join("?" * len(ids))
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT id, status FROM outbox WHERE id IN ({placeholders})", list(ids))
+            return dict(rows.fetchall())
+
+    def recover(self) -> int:
+        """送信中のまま残ったレコード（前回の異常終了時）を送信待ちに戻す"""
+        with self._connect() as conn:
+            return conn.execute(
+                "UPDATE outbox SET status = ?, next_attempt_at = ? WHERE status = ?",
+                (PENDING, time.time(), SENDING)
+            ).rowcount
+
+    def next_attempt_at(self) -> Optional[float]:
+        """次に送信待ちレコードの再送時刻を迎える時刻"""
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT MIN(next_attempt_at) FROM outbox WHERE status = ?", (PENDING,)
+            ).fetchone()[0]
+
+    def counts(self) -> Dict[str, int]:
+        """状態ごとのレコード数"""
+        with self._connect() as conn:
+            return dict(conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+
+    def purge(self, older_than: float) -> int:
+        """older_than 秒より前に送信済み・失敗になったレコードを削除"""
+        with self._connect() as conn:
+            return conn.execute(
+                "DELETE FROM outbox WHERE status IN (?, ?) AND updated_at < ?",
+                (SENT, FAILED, time.time() - older_than)
+            ).rowcount
+
+    def _claim(self, where: str, params: list) -> List[OutboxEntry]:
+        """条件に合うレコードを送信中にして返す"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT id, retry_key, recipients, message, extra_messages, attempts FROM outbox WHERE {where}",
+                params
+            ).fetchall()
+            conn.executemany(
+                "UPDATE outbox SET status = ?, updated_at = ? WHERE id = ?",
+                [(SENDING, time.time(), row[0]) for row in rows]
+            )
+        return [
+            OutboxEntry(id=row[0], retry_key=row[1], recipients=json.loads(row[2]),
+                        messages=[row[3], *json.loads(row[4] or "[]")], attempts=row[5])
+            for row in rows
+        ]
+
+    def _init_schema(self):
+        """スキーマを作成"""
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode = WAL")
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version not in (0, 1, _SCHEMA_VERSION):
+                raise RuntimeError(f"Unsupported outbox schema version {version}: {self.db_path}")
+            conn.executescript(_SCHEMA)
+            if version == 1:
+                # 送信待ちのレコードを残したまま複数通の列を追加する
+                conn.execute("ALTER TABLE outbox ADD COLUMN extra_messages TEXT")
+            conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        """トランザクション付きで接続（スレッドをまたがないよう都度接続する）"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute("PRAGMA synchronous = NORMAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+
+class OutboxWorker:
+    """アウトボックスの送信処理
+
+    deliver() は記録したメッセージをその場で送り、run() はバックグラウンドで
+    再送時刻を迎えたメッセージを batch_size 件ずつまとめて送り続ける。
+    再送間隔は retry_delay から倍々に延ばし（最大 max_retry_delay）、
+    retry_count 回再送しても失敗したもの、4xx（408・429を除く）で拒否されたものは失敗とする。
+    SQLiteの読み書きは executors のI/O用プール（省略時はイベントループの既定のプール）で行う。
+    """
+
+    def __init__(
+        self,
+        outbox: Outbox,
+        notifier: LineNotifier,
+        retry_count: int = 5,
+        retry_delay: float = 30.0,
+        max_retry_delay: float = 1800.0,
+        batch_size: int = 200,
+        executors: Optional["StageExecutors"] = None,
+    ):
+        self.outbox = outbox
+        self.notifier = notifier
+        self.retry_count = retry_count
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.batch_size = batch_size
+        self.executors = executors
+        self._wakeup: Optional[asyncio.Event] = None
+
+    async def deliver(self, ids: Sequence[int]) -> bool:
+        """記録済みのメッセージをすぐに送り、全て送信済みになったかを返す
+
+        送れなかったものは再送待ちとして残り、run() が後で送る。
+        """
+        entries = await self._run_io(self.outbox.claim, ids)
+        if entries:
+            await self._send_all(entries)
+        statuses = await self._run_io(self.outbox.statuses, ids)
+        if any(status == PENDING for status in statuses.values()):
+            self.notify()
+        return all(status == SENT for status in statuses.values())
+
+    async def drain(self, now: Optional[float] = None) -> int:
+        """再送時刻を迎えたメッセージがなくなるまで送り、送信を試みた件数を返す
+
+        now を指定すると、その時刻までに再送時刻を迎えるものを前倒しで送る。
+        """
+        attempted = 0
+        while True:
+            entries = await self._run_io(self.outbox.claim_due, self.batch_size, now)
+            if not entries:
+                return attempted
+            await self._send_all(entries)
+            attempted += len(entries)
+
+    def resume(self) -> int:
+        """前回の異常終了で送信中のまま残ったメッセージを送信待ちに戻す
+
+        送信を始める前（run() を起動する前）に呼ぶ。
+        """
+        recovered = self.outbox.recover()
+        if recovered:
+            logger.info(f"Resuming {recovered} unfinished outbox send(s)")
+        self.outbox.purge(PURGE_AFTER_SECONDS)
+        return recovered
+
+    async def run(self, idle_interval: float = 60.0):
+        """バックグラウンドで送信待ちを送り続ける（キャンセルされるまで）"""
+        while True:
+            try:
+                attempted = await self.drain()
+                if attempted:
+                    counts = await self._run_io(self.outbox.counts)
+                    logger.info(f"Outbox drained {attempted} message(s): {counts}")
+                next_at = await self._run_io(self.outbox.next_attempt_at)
+            except Exception as e:
+                logger.error(f"Outbox drain failed: {e}")
+                next_at = None
+
+            timeout = idle_interval if next_at is None else min(max(next_at - time.time(), 0.0), idle_interval)
+            wakeup = self._wakeup_event()
+            wakeup.clear()
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def notify(self):
+        """送信待ちが増えたことを run() に知らせる"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _wakeup_event(self) -> asyncio.Event:
+        """run() を起こすイベント（イベントループ上で初めて使うときに作成）"""
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        return self._wakeup
+
+    async def _run_io(self, func: Callable[..., Any], *args: Any) -> Any:
+        """SQLiteの読み書きをイベントループ外で実行"""
+        if self.executors is not None:
+            return await self.executors.run_io(func, *args)
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args))
+
+    async def _send_all(self, entries: List[OutboxEntry]):
+        """まとめて並行送信し、結果を1トランザクションで記録"""
+        semaphore = asyncio.Semaphore(self.notifier.max_concurrency)
+
+        async def send(entry: OutboxEntry) -> NotificationResult:
+            async with semaphore:
+                return await self.notifier.send_request(entry.recipients, entry.messages, entry.retry_key)
+
+        results = await asyncio.gather(*(send(entry) for entry in entries))
+
+        sent, retries, failed = [], [], []
+        now = time.time()
+        for entry, result in zip(entries, results):
+            if result.success:
+                sent.append(entry.id)
+                continue
+
+            error = result.error_message or "Unknown error"
+            status = result.recipient_results[0].status if result.recipient_results else None
+            if _is_permanent(status) or entry.attempts >= self.retry_count:
+                logger.error(f"Giving up outbox message {entry.id} after {entry.attempts + 1} attempt(s): {error}")
+                failed.append((entry.id, error))
+            else:
+                retries.append((entry.id, error, now + self._backoff(entry.attempts)))
+
+        await self._run_io(self.outbox.record, sent, retries, failed)
+        if retries:
+            logger.warning(f"{len(retries)} outbox message(s) will be retried")
+
+    def _backoff(self, attempts: int) -> float:
+        """attempts 回失敗した後の再送までの秒数（揺らぎ付き）"""
+        delay = min(self.retry_delay * (2 ** attempts), self.max_retry_delay)
+        return delay * random.uniform(0.8, 1.2)
+
+
+def _is_permanent(status: Optional[int]) -> bool:
+    """再送しても成功しない応答かどうか"""
+    return status is not None and 400 <= status < 500 and status not in (408, 429)
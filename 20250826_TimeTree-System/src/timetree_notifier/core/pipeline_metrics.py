@@ -0,0 +1,96 @@
+"""日次サマリー処理の段階ごとの計測
+
+send_daily_summary の各段階（export / parse / filter / render / send / backup）の
+処理時間と、予定数・ICSサイズ・エクスポート結果などの件数を MetricsRegistry に記録する。
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from .ingest import ExportDiff
+from .models import ExportResult
+from ..utils.metrics import Histogram, MetricsRegistry
+
+
+# エクスポート・インデックス更新は数十秒かかることがあるため上限を広げる
+STAGE_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+class PipelineMetrics:
+    """日次サマリー処理の計測値"""
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None):
+        self.registry = registry or MetricsRegistry()
+
+    def stage(self, name: str) -> Histogram:
+        """段階ごとの処理時間"""
+        return self.registry.histogram(
+            "timetree_stage_duration_seconds", "日次サマリー処理の段階ごとの処理時間", STAGE_BUCKETS, stage=name
+        )
+
+    @contextmanager
+    def run(self, kind: str) -> Iterator[Dict[str, bool]]:
+        """送信・事前取得1回分の処理時間と結果を記録
+
+        with ブロック内で yield された辞書の "success" に結果を設定する。
+        """
+        outcome = {"success": False}
+        started = time.perf_counter()
+        try:
+            yield outcome
+        finally:
+            self.registry.histogram(
+                "timetree_run_duration_seconds", "送信・事前取得1回の処理時間", STAGE_BUCKETS, kind=kind
+            ).observe(time.perf_counter() - started)
+            result = "success" if outcome["success"] else "failure"
+            self.registry.counter("timetree_runs_total", "送信・事前取得の実行回数", kind=kind, result=result).inc()
+            if outcome["success"]:
+                self.registry.gauge(
+                    "timetree_last_success_timestamp_seconds", "最後に成功した時刻（UNIX秒）", kind=kind
+                ).set_to_current_time()
+
+    def record_exports(self, results: Dict[str, ExportResult]):
+        """エクスポート結果（所要時間・終了種別・ICSサイズ）を記録"""
+        for name, result in results.items():
+            self.stage("export").observe(result.execution_time)
+            self.registry.histogram(
+                "timetree_export_queued_seconds", "エクスポートの同時実行枠が空くまでの待ち時間",
+                STAGE_BUCKETS, account=name
+            ).observe(result.queued_time)
+            outcome = "success" if result.success else (result.error_type or "error")
+            self.registry.counter(
+                "timetree_exports_total", "エクスポートの実行回数（終了種別ごと）", account=name, result=outcome
+            ).inc()
+
+            if result.success and result.output_file is not None:
+                try:
+                    size = result.output_file.stat().st_size
+                except OSError:
+                    continue
+                self.registry.gauge("timetree_ics_bytes", "直近のエクスポートのICSサイズ", account=name).set(size)
+                self.registry.counter(
+                    "timetree_ics_bytes_total", "読み込んだICSの累計サイズ", account=name
+                ).inc(size)
+
+    def record_index(self, account: str, diff: ExportDiff):
+        """予定インデックスへの反映結果を記録"""
+        self.registry.gauge("timetree_indexed_events", "インデックス上の予定数", account=account).set(diff.total)
+        for change, count in (("added", len(diff.added)), ("changed", len(diff.changed)),
+                              ("removed", len(diff.removed))):
+            self.registry.counter(
+                "timetree_index_changes_total", "エクスポート間の予定の変更数", account=account, change=change
+            ).inc(count)
+
+    def record_events(self, account: str, count: int):
+        """抽出した今日の予定数を記録"""
+        self.registry.gauge("timetree_today_events", "抽出した今日の予定数", account=account).set(count)
+        self.registry.counter(
+            "timetree_events_extracted_total", "抽出した予定の累計数", account=account
+        ).inc(count)
+
+    def record_deliveries(self, sent: int, queued: int, recipients: int):
+        """送信結果を記録（queued は再送待ちになったメッセージ数）"""
+        self.registry.counter("timetree_deliveries_total", "送信したメッセージ数", result="sent").inc(sent)
+        self.registry.counter("timetree_deliveries_total", "送信したメッセージ数", result="queued").inc(queued)
+        self.registry.counter("timetree_delivery_recipients_total", "メッセージの送信先数の累計").inc(recipients)
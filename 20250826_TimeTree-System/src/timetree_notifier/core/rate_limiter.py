@@ -0,0 +1,180 @@
+"""LINE APIへの送信レートの制御
+
+トークンバケットで送信間隔をならし、429 (Too Many Requests) を受けたら
+Retry-After の間は送信を止めて、直近1秒間に受け付けられたリクエスト数より
+少し低いところまでレートを下げる。以降はその値を上限の目安にしてゆっくり戻すため、
+上限を超えて拒否されてから下げる、という往復を繰り返さない。
+
+応答に X-RateLimit-Remaining / X-RateLimit-Reset があれば、
+残り回数をリセットまでの秒数で割ったレートに合わせる。
+X-RateLimit-Reset はリセットまでの秒数とUNIX時刻のどちらでも受け付ける。
+"""
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Mapping, Optional
+
+from loguru import logger
+
+from ..utils.metrics import Histogram, RateMeter
+
+
+# これより大きい X-RateLimit-Reset は秒数ではなくUNIX時刻とみなす（1年）
+_RESET_EPOCH_THRESHOLD = 365 * 24 * 3600
+
+class AdaptiveRateLimiter:
+    """応答に合わせてレートを調整するトークンバケット
+
+    acquire() は送信枠が空くまで待つ。送信後は on_response() に応答を渡す。
+    """
+
+    def __init__(
+        self,
+        rate: float = 100.0,
+        max_rate: float = 2000.0,
+        min_rate: float = 1.0,
+        burst: Optional[float] = None,
+        headroom: float = 0.9,
+        increase: float = 0.1,
+    ):
+        self.rate = min(rate, max_rate)
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        # burst を小さくして、枠が余っていても一度にまとめて送らない
+        self.burst = burst if burst is not None else max(1.0, rate * 0.05)
+        self.headroom = headroom
+        # 成功1回あたりのレート増加量（秒間 rate 回送れば毎秒 rate×increase 増える）
+        self.increase = increase
+        self.limit_estimate: Optional[float] = None
+        self.throttled = 0
+
+        self.wait_time = Histogram("line_rate_limit_wait_seconds", "送信枠が空くまでの待ち時間")
+        self.send_rate = RateMeter("line_requests", "LINE APIへのリクエスト数", window=5.0)
+        self.accept_rate = RateMeter("line_accepted_requests", "LINE APIが受け付けたリクエスト数", window=1.0)
+
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def acquire(self):
+        """送信枠を1つ取得（先に待っている送信から順に）"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        started = time.monotonic()
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    break
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+        self.wait_time.observe(time.monotonic() - started)
+        self.send_rate.mark()
+
+    def on_response(self, status: int, headers: Mapping[str, str]):
+        """応答のステータスとヘッダーからレートを調整"""
+        now = time.monotonic()
+        self._refill(now)
+
+        if status == 429:
+            self.throttled += 1
+            # 同時に送っていた分の429はまとめて1回として扱う
+            already_blocked = now < self._blocked_until
+            retry_after = _parse_retry_after(headers.get("Retry-After"))
+            self._blocked_until = max(self._blocked_until, now + (retry_after if retry_after is not None else 1.0))
+            self._tokens = 0.0
+            if already_blocked:
+                return
+
+            # 拒否される直前の1秒間に受け付けられた数を上限の目安にする
+            # （送信したレートは上限を超えた分を含むので目安にならない）
+            accepted = self.accept_rate.recent() / self.accept_rate.window
+            estimate = min(accepted, self.rate) if accepted > 0 else self.rate
+            if self.limit_estimate is None or estimate < self.limit_estimate:
+                self.limit_estimate = estimate
+            self._set_rate(min(self.rate, estimate) * self.headroom)
+            logger.warning(f"LINE API rate limited, pausing {self._blocked_until - now:.1f}s "
+                           f"and slowing to {self.rate:.1f} req/s")
+            return
+
+        if 200 <= status < 300:
+            self.accept_rate.mark()
+
+        remaining = _parse_float(headers.get("X-RateLimit-Remaining"))
+        reset = _parse_reset(headers.get("X-RateLimit-Reset"))
+        if remaining is not None and reset:
+            self._set_rate(remaining / reset * self.headroom)
+            return
+
+        if 200 <= status < 300:
+            ceiling = self.max_rate
+            if self.limit_estimate is not None:
+                ceiling = min(ceiling, self.limit_estimate * self.headroom)
+            if self.rate < ceiling:
+                self._set_rate(min(ceiling, self.rate + self.increase))
+
+    def snapshot(self) -> dict:
+        """現在の状態"""
+        return {
+            "rate": self.rate,
+            "achieved_rate": self.send_rate.rate(),
+            "accepted_rate": self.accept_rate.rate(),
+            "limit_estimate": self.limit_estimate,
+            "throttled": self.throttled,
+            "wait_p50": self.wait_time.quantile(0.5),
+            "wait_p95": self.wait_time.quantile(0.95),
+        }
+
+    def _set_rate(self, rate: float):
+        """レートを範囲内に収めて設定"""
+        self.rate = min(self.max_rate, max(self.min_rate, rate))
+
+    def _refill(self, now: float):
+        """経過時間分のトークンを補充"""
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After（秒数またはHTTP日付）を待ち秒数に変換"""
+    if not value:
+        return None
+    seconds = _parse_float(value)
+    if seconds is not None:
+        return max(seconds, 0.0)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def _parse_reset(value: Optional[str]) -> Optional[float]:
+    """X-RateLimit-Reset（秒数またはUNIX時刻）をリセットまでの秒数に変換（過ぎた時刻は None）"""
+    reset = _parse_float(value)
+    if reset is None or reset <= _RESET_EPOCH_THRESHOLD:
+        return reset
+    remaining = reset - time.time()
+    return remaining if remaining > 0 else None
+
+
+def _parse_float(value: Optional[str]) -> Optional[float]:
+    """数値ヘッダーを読む（なければ None）"""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
@@ -0,0 +1,260 @@
+"""繰り返し予定（RRULE/RDATE/EXDATE）の展開
+
+繰り返し予定は要求された期間の中だけを展開し、展開結果は予定ごとに
+キャッシュする。予定の内容やRECURRENCE-IDによる上書きが変わらない限り、
+日々の検索で同じ予定を展開し直さない。
+"""
+
+import bisect
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta, tzinfo
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .ics_stream import parse_vevent_block
+
+if TYPE_CHECKING:
+    from dateutil.rrule import rruleset
+
+
+# (開始UNIX秒, 終了UNIX秒, 開始日時, 終了日時)
+Occurrence = Tuple[int, int, object, Optional[object]]
+
+# 終了のない繰り返し予定の区間終端（分単位、rtree_i32の上限）
+OPEN_END_MINUTES = 2 ** 31 - 1
+
+
+def to_timestamp(value, tz: tzinfo) -> int:
+    """date/datetimeをUNIX秒に変換（日付・浮動時刻は tz で解釈）"""
+    if not isinstance(value, datetime):
+        value = datetime.combine(value, time.min)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=tz)
+    return int(value.timestamp())
+
+
+def is_recurring(component) -> bool:
+    """展開が必要な繰り返し予定（上書き用インスタンスを除く）かどうか"""
+    if component.get('recurrence-id'):
+        return False
+    return bool(component.get('rrule') or component.get('rdate'))
+
+
+class SeriesRule:
+    """1つの繰り返し予定の展開規則"""
+
+    def __init__(self, component, tz: tzinfo):
+        self.tz = tz
+        start = component.get('dtstart').dt
+        dtend = component.get('dtend')
+        duration = component.get('duration')
+
+        self.all_day = not isinstance(start, datetime)
+        self.aware = not self.all_day and start.tzinfo is not None
+        self.start = start
+        self.has_end = dtend is not None
+
+        if dtend is not None:
+            self.duration = dtend.dt - start
+        elif duration is not None:
+            self.duration = duration.dt
+        elif self.all_day:
+            self.duration = timedelta(days=1)
+        else:
+            self.duration = timedelta(0)
+
+        self.dtstart = self._normalize(start)
+        recurs = _as_list(component.get('rrule'))
+        self.is_finite = all('UNTIL' in recur or 'COUNT' in recur for recur in recurs)
+        self.rules = [self._build_rule(recur) for recur in recurs]
+        self.rdates = [self._normalize(value) for value in _dates_of(component.get('rdate'))]
+        self.exdates = [self._normalize(value) for value in _dates_of(component.get('exdate'))]
+
+    def span(self) -> Tuple[int, Optional[int]]:
+        """予定全体の区間 (開始UNIX秒, 終了UNIX秒)。終了がなければ None"""
+        start_ts = to_timestamp(self.start, self.tz)
+        if not self.is_finite:
+            return start_ts, None
+
+        last = self.dtstart
+        for occurrence in self._ruleset():
+            last = max(last, occurrence)
+        return start_ts, to_timestamp(self._denormalize(last) + self.duration, self.tz)
+
+    def expand(self, start_ts: int, end_ts: int) -> List[Occurrence]:
+        """[start_ts, end_ts) と重なる発生を返す"""
+        duration_s = int(self.duration.total_seconds())
+        after = self._from_timestamp(start_ts - max(duration_s, 0) - 86400)
+        before = self._from_timestamp(end_ts)
+
+        occurrences = []
+        for value in self._ruleset().between(after, before, inc=True):
+            occurrence_start = self._denormalize(value)
+            occurrence_end = occurrence_start + self.duration
+            occurrence_start_ts = to_timestamp(occurrence_start, self.tz)
+            occurrence_end_ts = max(to_timestamp(occurrence_end, self.tz), occurrence_start_ts + 1)
+            if occurrence_start_ts < end_ts and occurrence_end_ts > start_ts:
+                occurrences.append((
+                    occurrence_start_ts,
+                    occurrence_end_ts,
+                    occurrence_start,
+                    occurrence_end if self.has_end else None,
+                ))
+        return occurrences
+
+    def _ruleset(self) -> "rruleset":
+        """RRULE/RDATE/EXDATEをまとめた rruleset"""
+        from dateutil.rrule import rruleset
+        rset = rruleset()
+        for rule in self.rules:
+            rset.rrule(rule)
+        rset.rdate(self.dtstart)
+        for value in self.rdates:
+            rset.rdate(value)
+        for value in self.exdates:
+            rset.exdate(value)
+        return rset
+
+    def _build_rule(self, recur):
+        """icalendarのRRULEをdateutilのrruleに変換（UNTILは開始日時の形式に合わせる）"""
+        from dateutil.rrule import rrulestr
+        from icalendar import vRecur
+        recur = vRecur(recur)
+        until = recur.pop('UNTIL', None)
+        rule = rrulestr(recur.to_ical().decode(), dtstart=self.dtstart)
+        if until:
+            value = until[0]
+            if self.aware and not isinstance(value, datetime):
+                value = datetime.combine(value, time.max)
+            rule = rule.replace(until=self._normalize(value))
+        return rule
+
+    def _normalize(self, value) -> datetime:
+        """展開用にdtstartと同じ形式（aware/naive）のdatetimeに揃える"""
+        if self.all_day:
+            if isinstance(value, datetime):
+                if value.tzinfo is not None:
+                    value = value.astimezone(self.tz)
+                value = value.date()
+            return datetime.combine(value, time.min)
+
+        if not isinstance(value, datetime):
+            value = datetime.combine(value, self.start.time())
+        if self.aware:
+            return value if value.tzinfo else value.replace(tzinfo=self.start.tzinfo)
+        return value.astimezone(self.tz).replace(tzinfo=None) if value.tzinfo else value
+
+    def _denormalize(self, value: datetime):
+        """展開結果を元の形式（終日ならdate）に戻す"""
+        return value.date() if self.all_day else value
+
+    def _from_timestamp(self, ts: int) -> datetime:
+        """UNIX秒を展開用の形式に変換"""
+        value = datetime.fromtimestamp(ts, self.tz)
+        if self.aware:
+            return value
+        return value.replace(tzinfo=None)
+
+
+@dataclass
+class _ExpandedSeries:
+    """キャッシュ済みの展開結果"""
+    series_hash: str
+    horizon_start: int
+    horizon_end: int
+    max_duration: int
+    starts: List[int] = field(default_factory=list)
+    occurrences: List[Occurrence] = field(default_factory=list)
+
+
+class RecurrenceExpander:
+    """繰り返し予定の展開と発生キャッシュ"""
+
+    def __init__(self, tz: tzinfo, horizon: timedelta = timedelta(days=31)):
+        self.tz = tz
+        self.horizon = int(horizon.total_seconds())
+        self._cache: Dict[str, _ExpandedSeries] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def occurrences(
+        self,
+        series_key: str,
+        series_hash: str,
+        load_block: Callable[[], bytes],
+        start_ts: int,
+        end_ts: int,
+        overridden: Iterable[int] = (),
+    ) -> List[Occurrence]:
+        """[start_ts, end_ts) と重なる発生を返す
+
+        series_hash が変わらず、要求期間がキャッシュ済みの範囲内なら展開し直さない。
+        load_block は展開が必要になったときだけ呼ばれ、VEVENTブロックを返す。
+        overridden にはRECURRENCE-IDで上書きされた発生の元の開始UNIX秒を渡す。
+        """
+        overridden = set(overridden)
+        series_hash = f"{series_hash}:{','.join(map(str, sorted(overridden)))}"
+
+        cached = self._cache.get(series_key)
+        if (
+            cached is None
+            or cached.series_hash != series_hash
+            or start_ts < cached.horizon_start
+            or end_ts > cached.horizon_end
+        ):
+            self.misses += 1
+            cached = self._expand(series_hash, load_block(), start_ts, end_ts + self.horizon, overridden)
+            self._cache[series_key] = cached
+        else:
+            self.hits += 1
+
+        low = bisect.bisect_left(cached.starts, start_ts - cached.max_duration)
+        high = bisect.bisect_left(cached.starts, end_ts)
+        return [
+            occurrence for occurrence in cached.occurrences[low:high]
+            if occurrence[1] > start_ts
+        ]
+
+    def retain(self, series_keys: Set[str]):
+        """指定した予定以外のキャッシュを破棄"""
+        for key in list(self._cache):
+            if key not in series_keys:
+                del self._cache[key]
+
+    def clear(self):
+        """キャッシュを全て破棄"""
+        self._cache.clear()
+
+    def _expand(
+        self, series_hash: str, block: bytes, start_ts: int, end_ts: int, overridden: Set[int]
+    ) -> _ExpandedSeries:
+        """予定を解析して期間内を展開"""
+        rule = SeriesRule(parse_vevent_block(block), self.tz)
+        occurrences = [
+            occurrence for occurrence in rule.expand(start_ts, end_ts)
+            if occurrence[0] not in overridden
+        ]
+        return _ExpandedSeries(
+            series_hash=series_hash,
+            horizon_start=start_ts,
+            horizon_end=end_ts,
+            max_duration=max((o[1] - o[0] for o in occurrences), default=0),
+            starts=[o[0] for o in occurrences],
+            occurrences=occurrences,
+        )
+
+
+def _as_list(value) -> list:
+    """単一値・リスト・未指定をリストに揃える"""
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _dates_of(value) -> List[object]:
+    """RDATE/EXDATEの値を日付・日時のリストに展開（期間指定は無視）"""
+    values = []
+    for prop in _as_list(value):
+        for item in prop.dts:
+            if isinstance(item.dt, (date, datetime)):
+                values.append(item.dt)
+    return values
@@ -1,24 +1,47 @@
 """TimeTree通知スケジューラー"""
 
 import asyncio
-from datetime import datetime
-from typing import Optional
+from datetime import datetime, timedelta, timezone
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple
+from zoneinfo import ZoneInfo
 
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.cron import CronTrigger
 from loguru import logger
 
+from .change_alerts import ChangeAlertNotifier
 from .daily_notifier import DailySummaryNotifier
+from .tenants import TenantDispatcher, TenantRegistry
 from ..config import Config
+from ..config.settings import DigestConfig
+from ..utils.loop_monitor import LoopLagMonitor
+
+if TYPE_CHECKING:
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+    from ..utils.metrics_server import MetricsServer
+
+
+# 再読み込みでは反映せず、再起動が必要な設定
+RESTART_REQUIRED = ("paths", "executors", "metrics", "loop_monitor", "config_reload", "logging")
 
 
 class TimeTreeScheduler:
-    """TimeTree通知スケジュール管理"""
+    """TimeTree通知スケジュール管理
+
+    apscheduler は start() で初めて読み込む（手動実行では使わない）。
+    """
     
     def __init__(self, config: Config):
         self.config = config
-        self.scheduler = AsyncIOScheduler()
+        self.scheduler: Optional["AsyncIOScheduler"] = None
         self.daily_notifier = DailySummaryNotifier(config)
+        self.change_alerts = ChangeAlertNotifier(self.daily_notifier)
+        self.tenant_registry: Optional[TenantRegistry] = None
+        self.dispatcher: Optional[TenantDispatcher] = None
+        self._outbox_task: Optional[asyncio.Task] = None
+        self.metrics_server: Optional["MetricsServer"] = None
+        self.loop_monitor: Optional[LoopLagMonitor] = None
+        # 登録済みのジョブ（設定の再読み込み時に差分だけを登録し直す）
+        self._jobs: Dict[str, _JobSpec] = {}
         self.is_running = False
         
     async def start(self):
@@ -28,13 +51,38 @@ class TimeTreeScheduler:
                 logger.warning("Scheduler is already running")
                 return
                 
+            from apscheduler.schedulers.asyncio import AsyncIOScheduler
+            self.scheduler = AsyncIOScheduler()
+            
             # スケジュール設定
-            self._setup_daily_schedule()
+            self._sync_tenant_registry()
+            self._apply_jobs(self._job_specs(self.config))
             
             # スケジューラー開始
             self.scheduler.start()
             self.is_running = True
             
+            # 未送信・再送待ちのメッセージを送り続ける
+            self.daily_notifier.outbox_worker.resume()
+            self._outbox_task = asyncio.create_task(self.daily_notifier.outbox_worker.run())
+            
+            # イベントループの遅延監視
+            if self.config.loop_monitor.enabled:
+                self.loop_monitor = LoopLagMonitor(
+                    self.config.loop_monitor.interval,
+                    self.config.loop_monitor.threshold,
+                    self.daily_notifier.metrics.registry
+                )
+                self.loop_monitor.start()
+            
+            # 計測値の公開
+            if self.config.metrics.enabled:
+                from ..utils.metrics_server import MetricsServer
+                self.metrics_server = MetricsServer(
+                    self.daily_notifier.metrics.registry, self.config.metrics.host, self.config.metrics.port
+                )
+                await self.metrics_server.start()
+            
             logger.info("TimeTree scheduler started successfully")
             logger.info(f"Daily notification scheduled at {self.config.daily_summary.time}")
             
@@ -43,47 +91,242 @@ class TimeTreeScheduler:
             raise
     
     async def stop(self):
-        """スケジューラー停止"""
+        """スケジューラー停止（HTTP接続も閉じる）"""
         try:
-            if not self.is_running:
-                return
-                
-            self.scheduler.shutdown(wait=False)
-            self.is_running = False
-            logger.info("TimeTree scheduler stopped")
+            if self.is_running:
+                self.scheduler.shutdown(wait=False)
+                self._jobs = {}
+                self.is_running = False
+                logger.info("TimeTree scheduler stopped")
+            
+            if self._outbox_task:
+                self._outbox_task.cancel()
+                try:
+                    await self._outbox_task
+                except asyncio.CancelledError:
+                    pass
+                self._outbox_task = None
+            
+            if self.metrics_server:
+                await self.metrics_server.stop()
+                self.metrics_server = None
+            
+            if self.loop_monitor:
+                await self.loop_monitor.stop()
+                self.loop_monitor = None
+            
+            await self.change_alerts.close()
+            await self.daily_notifier.close()
             
         except Exception as e:
             logger.error(f"Failed to stop scheduler: {e}")
     
-    def _setup_daily_schedule(self):
+    async def apply_config(self, config: Config):
+        """再読み込みした設定に切り替え、変わったジョブだけを登録し直す
+        
+        ジョブのトリガーを作れない設定なら例外を送出し、現在の設定のまま動かし続ける。
+        パス・実行プール・計測値公開・ループ監視・ログの設定は再起動するまで反映しない。
+        """
+        jobs = self._job_specs(config)
+        if self.is_running:
+            # 不正なcron指定はここで分かる（切り替え前）
+            for spec in jobs.values():
+                _cron_trigger(**dict(spec.trigger))
+        
+        pending = [name for name in RESTART_REQUIRED if getattr(config, name) != getattr(self.config, name)]
+        if pending:
+            logger.warning(f"Changes to {', '.join(pending)} take effect after restart")
+        for name in RESTART_REQUIRED:
+            setattr(config, name, getattr(self.config, name))
+        
+        # ここから切り替え完了まで await しない（実行中のジョブに途中の状態を見せない）
+        retired = self.daily_notifier.apply_config(config)
+        self.config = config
+        if self.is_running:
+            self._sync_tenant_registry()
+            self._apply_jobs(jobs)
+        logger.info("Configuration reloaded")
+        
+        if retired is not None:
+            await retired.close()
+    
+    def _job_specs(self, config: Config) -> Dict[str, "_JobSpec"]:
+        """config で登録するジョブ（ジョブID → 内容）"""
+        jobs: Dict[str, _JobSpec] = {}
+        self._setup_daily_schedule(jobs, config)
+        self._setup_digest_schedules(jobs, config)
+        self._setup_change_alerts(jobs, config)
+        return jobs
+    
+    def _apply_jobs(self, jobs: Dict[str, "_JobSpec"]):
+        """登録済みのジョブとの差分だけを追加・置き換え・削除
+        
+        トリガーを全て作れた場合だけ登録を変更する（不正な指定があれば例外で、登録はそのまま）。
+        """
+        changed = {job_id: spec for job_id, spec in jobs.items() if self._jobs.get(job_id) != spec}
+        triggers = {job_id: _cron_trigger(**dict(spec.trigger)) for job_id, spec in changed.items()}
+        
+        for job_id in self._jobs.keys() - jobs.keys():
+            self.scheduler.remove_job(job_id)
+            logger.info(f"Job '{job_id}' removed")
+        
+        for job_id, spec in changed.items():
+            self.scheduler.add_job(
+                func=spec.func,
+                trigger=triggers[job_id],
+                args=list(spec.args),
+                id=job_id,
+                name=spec.name,
+                coalesce=True,  # 複数実行を防ぐ
+                max_instances=1,  # 同時実行数制限
+                replace_existing=True
+            )
+            logger.info(spec.message)
+        
+        self._jobs = jobs
+    
+    def _setup_daily_schedule(self, jobs: Dict[str, "_JobSpec"], config: Config):
         """毎朝の定時通知スケジュール設定"""
-        if not self.config.daily_summary.enabled:
+        if not config.daily_summary.enabled:
             logger.info("Daily summary is disabled, skipping schedule setup")
             return
         
+        if config.daily_summary.schedules:
+            self._setup_tenant_dispatch(jobs)
+            return
+        
         # 時間解析
-        time_str = self.config.daily_summary.time  # "07:30"
+        time_str = config.daily_summary.time  # "07:30"
         hour, minute = map(int, time_str.split(':'))
         
-        # Cronトリガー作成
-        trigger = CronTrigger(
-            hour=hour,
-            minute=minute,
-            timezone=self.config.daily_summary.timezone
-        )
-        
-        # ジョブ登録
-        self.scheduler.add_job(
+        jobs['daily_summary'] = _JobSpec(
             func=self._execute_daily_summary,
-            trigger=trigger,
-            id='daily_summary',
+            trigger=_fields(hour=hour, minute=minute, timezone=config.daily_summary.timezone),
             name='Daily Schedule Summary',
-            coalesce=True,  # 複数実行を防ぐ
-            max_instances=1,  # 同時実行数制限
-            replace_existing=True
+            message=f"Daily summary job scheduled: {hour:02d}:{minute:02d} {config.daily_summary.timezone}"
+        )
+        
+        self._setup_prefetch_schedule(jobs, config, hour, minute)
+    
+    def _setup_prefetch_schedule(self, jobs: Dict[str, "_JobSpec"], config: Config, hour: int, minute: int):
+        """送信前の事前取得スケジュール設定"""
+        prefetch_minutes = config.daily_summary.prefetch_minutes
+        if prefetch_minutes <= 0:
+            return
+        
+        # 日付をまたぐ場合も考慮して送信時刻から逆算
+        send_minutes = hour * 60 + minute
+        prefetch_at = (send_minutes - prefetch_minutes) % (24 * 60)
+        
+        jobs['daily_prefetch'] = _JobSpec(
+            func=self._execute_prefetch,
+            trigger=_fields(hour=prefetch_at // 60, minute=prefetch_at % 60, timezone=config.daily_summary.timezone),
+            name='Daily Summary Prefetch',
+            message=f"Daily prefetch job scheduled: {prefetch_at // 60:02d}:{prefetch_at % 60:02d} "
+                    f"({prefetch_minutes} min before send)"
         )
+    
+    def _setup_digest_schedules(self, jobs: Dict[str, "_JobSpec"], config: Config):
+        """週間・月間まとめの送信スケジュール設定"""
+        for digest in config.digests:
+            if not digest.enabled:
+                continue
+            
+            hour, minute = map(int, digest.time.split(':'))
+            jobs[f'digest_{digest.name}'] = _JobSpec(
+                func=self._execute_digest,
+                trigger=_fields(
+                    day=digest.day,
+                    day_of_week=digest.day_of_week,
+                    hour=hour,
+                    minute=minute,
+                    timezone=config.daily_summary.timezone
+                ),
+                args=(digest,),
+                name=f'Digest ({digest.name})',
+                message=f"Digest job '{digest.name}' scheduled: {digest.time} "
+                        f"(day={digest.day}, day_of_week={digest.day_of_week}, {digest.days} days)"
+            )
+    
+    def _setup_change_alerts(self, jobs: Dict[str, "_JobSpec"], config: Config):
+        """予定変更を確認するジョブ設定"""
+        if not config.change_alerts.enabled:
+            return
+        
+        interval = config.change_alerts.interval_minutes
+        jobs['change_alerts'] = _JobSpec(
+            func=self._execute_change_poll,
+            trigger=_fields(minute=f'*/{interval}', timezone='UTC'),
+            name='Event Change Alerts',
+            message=f"Change alert job scheduled (every {interval} min, "
+                    f"next {config.change_alerts.lookahead_days} day(s))"
+        )
+    
+    def _setup_tenant_dispatch(self, jobs: Dict[str, "_JobSpec"]):
+        """送信先ごとの通知時刻に送る配信ジョブ設定（1分ごとに1ジョブ）"""
+        jobs['tenant_dispatch'] = _JobSpec(
+            func=self._execute_dispatch,
+            trigger=_fields(minute='*', timezone='UTC'),
+            name='Daily Summary Dispatcher',
+            message="Dispatcher job scheduled (every minute)"
+        )
+    
+    def _sync_tenant_registry(self):
+        """全送信先を通知時刻ごとに登録（個別設定のない送信先は既定の時刻）
         
-        logger.info(f"Daily summary job scheduled: {hour:02d}:{minute:02d} {self.config.daily_summary.timezone}")
+        登録済みの送信先は時刻・タイムゾーンを更新し、送信済みの日付を引き継ぐ。
+        送信先ごとの通知時刻を使わない設定なら登録を破棄する。
+        """
+        config = self.config.daily_summary
+        if not (config.enabled and config.schedules):
+            self.tenant_registry = None
+            self.dispatcher = None
+            return
+        
+        if self.tenant_registry is None:
+            self.tenant_registry = TenantRegistry()
+            self.dispatcher = TenantDispatcher(
+                self.tenant_registry,
+                lambda target_date, user_ids: self.daily_notifier.send_daily_summary(target_date, user_ids),
+                state_file=self.config.paths.dispatch_state,
+            )
+        
+        schedules = {schedule.user_id: schedule for schedule in config.schedules}
+        registry = self.tenant_registry
+        
+        recipients = self.daily_notifier.recipient_ids()
+        for user_id in recipients:
+            schedule = schedules.pop(user_id, None)
+            registry.add(
+                user_id,
+                (schedule and schedule.time) or config.time,
+                (schedule and schedule.timezone) or config.timezone
+            )
+        
+        current = set(recipients)
+        for tenant in registry:
+            if tenant.user_id not in current:
+                registry.remove(tenant.user_id)
+        
+        for user_id in schedules:
+            logger.warning(f"Schedule for {user_id} ignored: not a recipient of any account")
+        
+        logger.info(f"Dispatching to {len(registry)} recipient(s) "
+                    f"in {len(registry.slot_sizes())} time slot(s)")
+    
+    async def _execute_dispatch(self):
+        """通知時刻を迎えた送信先への配信実行"""
+        try:
+            await self.dispatcher.dispatch(datetime.now(timezone.utc))
+        except Exception as e:
+            logger.error(f"Unexpected error in dispatch execution: {e}")
+    
+    async def _execute_change_poll(self):
+        """予定変更の確認実行"""
+        try:
+            await self.change_alerts.poll()
+        except Exception as e:
+            logger.error(f"Unexpected error in change alert execution: {e}")
     
     async def _execute_daily_summary(self):
         """毎朝の定時通知実行"""
@@ -100,9 +343,37 @@ class TimeTreeScheduler:
         except Exception as e:
             logger.error(f"Unexpected error in daily summary execution: {e}")
     
-    async def run_manual_summary(self, target_date: Optional[datetime] = None):
-        """手動での日次サマリー実行（テスト用）"""
+    async def _execute_digest(self, digest: DigestConfig):
+        """週間・月間まとめの送信実行"""
+        try:
+            if not await self.daily_notifier.send_digest(digest):
+                logger.error(f"Digest '{digest.name}' failed")
+        except Exception as e:
+            logger.error(f"Unexpected error in digest execution: {e}")
+    
+    async def _execute_prefetch(self):
+        """送信前の事前取得実行"""
         try:
+            tz = ZoneInfo(self.config.daily_summary.timezone)
+            send_at = datetime.now(tz) + timedelta(minutes=self.config.daily_summary.prefetch_minutes)
+            hour, minute = map(int, self.config.daily_summary.time.split(':'))
+            send_at = send_at.replace(hour=hour, minute=minute, second=0, microsecond=0)
+            
+            await self.daily_notifier.prefetch_daily_summary(send_at.date(), send_at)
+            
+        except Exception as e:
+            logger.error(f"Unexpected error in prefetch execution: {e}")
+    
+    async def run_manual_summary(self, target_date: Optional[datetime] = None, digest_name: Optional[str] = None):
+        """手動での日次サマリー実行（テスト用、digest_name を指定するとそのまとめを送る）"""
+        try:
+            if digest_name:
+                digest = next((d for d in self.config.digests if d.name == digest_name), None)
+                if digest is None:
+                    raise ValueError(f"Unknown digest: {digest_name}")
+                logger.info(f"Running manual digest '{digest_name}'")
+                return await self.daily_notifier.send_digest(digest, target_date.date() if target_date else None)
+            
             logger.info("Running manual daily summary")
             
             if target_date:
@@ -110,6 +381,8 @@ class TimeTreeScheduler:
             else:
                 success = await self.daily_notifier.send_daily_summary()
             
+            # 前回の予定で送った場合は訂正の確認まで済ませる
+            await self.daily_notifier.wait_revalidations()
             return success
             
         except Exception as e:
@@ -119,7 +392,9 @@ class TimeTreeScheduler:
     def get_next_run_time(self) -> Optional[datetime]:
         """次回実行時刻を取得"""
         try:
-            job = self.scheduler.get_job('daily_summary')
+            if self.scheduler is None:
+                return None
+            job = self.scheduler.get_job('daily_summary') or self.scheduler.get_job('tenant_dispatch')
             if job and job.next_run_time:
                 return job.next_run_time
             return None
@@ -132,15 +407,41 @@ class TimeTreeScheduler:
         
         return {
             "is_running": self.is_running,
-            "scheduler_state": self.scheduler.state if hasattr(self.scheduler, 'state') else 'unknown',
+            "scheduler_state": getattr(self.scheduler, 'state', 'unknown'),
             "daily_summary_enabled": self.config.daily_summary.enabled,
             "scheduled_time": self.config.daily_summary.time,
             "timezone": self.config.daily_summary.timezone,
             "next_run_time": next_run.isoformat() if next_run else None,
-            "jobs_count": len(self.scheduler.get_jobs())
+            "jobs_count": len(self.scheduler.get_jobs()) if self.scheduler else 0,
+            "tenants_count": len(self.tenant_registry) if self.tenant_registry else None,
+            "change_alerts_enabled": self.config.change_alerts.enabled,
+            "outbox": self.daily_notifier.outbox.counts(),
+            "metrics_url": self.metrics_server.url if self.metrics_server else None
         }
 
 
+@dataclass
+class _JobSpec:
+    """登録するジョブ（trigger は CronTrigger のフィールド）"""
+    func: Callable
+    trigger: Tuple[Tuple[str, Any], ...]
+    name: str
+    args: tuple = ()
+    # 登録時のログ（比較には使わない）
+    message: str = field(default="", compare=False)
+
+
+def _fields(**fields) -> Tuple[Tuple[str, Any], ...]:
+    """比較できる形の CronTrigger のフィールド"""
+    return tuple(sorted(fields.items()))
+
+
+def _cron_trigger(**fields):
+    """apscheduler の CronTrigger"""
+    from apscheduler.triggers.cron import CronTrigger
+    return CronTrigger(**fields)
+
+
 class SchedulerManager:
     """スケジューラー管理クラス（シングルトン）"""
     
@@ -162,9 +463,13 @@ class SchedulerManager:
         """スケジューラー停止"""
         await self.scheduler.stop()
     
-    async def run_manual(self, target_date: Optional[datetime] = None):
+    async def apply_config(self, config: Config):
+        """再読み込みした設定に切り替え"""
+        await self.scheduler.apply_config(config)
+    
+    async def run_manual(self, target_date: Optional[datetime] = None, digest_name: Optional[str] = None):
         """手動実行"""
-        return await self.scheduler.run_manual_summary(target_date)
+        return await self.scheduler.run_manual_summary(target_date, digest_name)
     
     def get_status(self) -> dict:
         """状態取得"""
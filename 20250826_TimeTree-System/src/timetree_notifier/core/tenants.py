@@ -0,0 +1,244 @@
+"""送信先ごとの通知時刻の管理と配信
+
+送信先をUTCの「1日の中の分」（0〜1439）ごとのスロットに振り分けておき、
+1分ごとに1回だけ呼ばれる配信処理がそのスロットの送信先をまとめて送る。
+送信先の追加・削除はスロットの辞書を1回更新するだけで、ジョブは作り直さない。
+
+夏時間などでタイムゾーンのUTCオフセットが変わった場合は、配信のたびに
+タイムゾーン単位でオフセットを確認し、変わったタイムゾーンの送信先だけ
+スロットを振り直す。時計が進んで現地時刻が存在しなくなった送信先は、
+切り替わった時点で送る。
+
+最後に確認した分と送信先ごとの送信済みの日付は状態ファイルに保存し、
+再起動後も同じ日に二重に送らず、停止中に迎えた通知時刻もさかのぼって送る。
+"""
+
+import json
+import os
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Set, Union
+from zoneinfo import ZoneInfo
+
+from loguru import logger
+
+from .models import Tenant
+
+
+MINUTES_PER_DAY = 24 * 60
+
+# (対象日, 送信先) を受け取って送信する関数
+SendBatch = Callable[[date, List[str]], Awaitable[bool]]
+
+
+class TenantRegistry:
+    """送信先をUTCの分スロットごとに保持する"""
+
+    def __init__(self, now: Optional[datetime] = None):
+        self._tenants: Dict[str, Tenant] = {}
+        self._slots: Dict[int, Dict[str, Tenant]] = {}
+        self._slot_of: Dict[str, int] = {}
+        self._by_timezone: Dict[str, Set[str]] = {}
+        self._zones: Dict[str, ZoneInfo] = {}
+        self._offsets: Dict[str, int] = {}
+        self._now = now or datetime.now(timezone.utc)
+
+    def __len__(self) -> int:
+        return len(self._tenants)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._tenants
+
+    def __iter__(self) -> Iterator[Tenant]:
+        return iter(list(self._tenants.values()))
+
+    def get(self, user_id: str) -> Optional[Tenant]:
+        """送信先を取得"""
+        return self._tenants.get(user_id)
+
+    def add(self, user_id: str, time: str, timezone_name: str) -> Tenant:
+        """送信先を追加（登録済みなら時刻・タイムゾーンを更新）"""
+        previous = self._tenants.get(user_id)
+        if previous is not None:
+            self.remove(user_id)
+
+        tenant = Tenant(user_id=user_id, time=time, timezone=timezone_name,
+                        last_sent=previous.last_sent if previous else None)
+        if timezone_name not in self._zones:
+            self._zones[timezone_name] = ZoneInfo(timezone_name)
+            self._offsets[timezone_name] = self._offset_minutes(timezone_name, self._now)
+
+        self._tenants[user_id] = tenant
+        self._by_timezone.setdefault(timezone_name, set()).add(user_id)
+        self._place(tenant)
+        return tenant
+
+    def remove(self, user_id: str) -> bool:
+        """送信先を削除"""
+        tenant = self._tenants.pop(user_id, None)
+        if tenant is None:
+            return False
+
+        self._unplace(user_id)
+        members = self._by_timezone[tenant.timezone]
+        members.discard(user_id)
+        if not members:
+            del self._by_timezone[tenant.timezone]
+            del self._zones[tenant.timezone]
+            del self._offsets[tenant.timezone]
+        return True
+
+    def due(self, at: datetime) -> List[Tenant]:
+        """at（UTCの分）に通知時刻を迎える送信先"""
+        at = at.astimezone(timezone.utc)
+        skipped = self.refresh_offsets(at)
+        slot = self._slots.get(at.hour * 60 + at.minute)
+        return skipped + list(slot.values()) if slot else skipped
+
+    def refresh_offsets(self, at: datetime) -> List[Tenant]:
+        """UTCオフセットが変わったタイムゾーンの送信先をスロットに振り直す
+
+        時計が進んだことで通知時刻を飛ばされた送信先を返す。
+        """
+        self._now = at
+        minute = at.hour * 60 + at.minute
+        skipped = []
+        for name in list(self._by_timezone):
+            offset = self._offset_minutes(name, at)
+            jump = offset - self._offsets[name]
+            if jump == 0:
+                continue
+
+            logger.info(f"UTC offset of {name} changed, rescheduling {len(self._by_timezone[name])} recipient(s)")
+            self._offsets[name] = offset
+            for user_id in self._by_timezone[name]:
+                self._unplace(user_id)
+                slot = self._place(self._tenants[user_id])
+                if 0 < (minute - slot) % MINUTES_PER_DAY <= jump:
+                    skipped.append(self._tenants[user_id])
+        return skipped
+
+    def slot_sizes(self) -> Dict[int, int]:
+        """スロットごとの送信先数（空のスロットは含まない）"""
+        return {slot: len(members) for slot, members in self._slots.items()}
+
+    def _place(self, tenant: Tenant) -> int:
+        """送信先をスロットに入れ、スロット番号を返す"""
+        slot = (tenant.local_minute - self._offsets[tenant.timezone]) % MINUTES_PER_DAY
+        self._slots.setdefault(slot, {})[tenant.user_id] = tenant
+        self._slot_of[tenant.user_id] = slot
+        return slot
+
+    def _unplace(self, user_id: str):
+        """送信先をスロットから外す"""
+        slot = self._slot_of.pop(user_id)
+        members = self._slots[slot]
+        del members[user_id]
+        if not members:
+            del self._slots[slot]
+
+    def _offset_minutes(self, name: str, at: datetime) -> int:
+        """タイムゾーンの at 時点のUTCオフセット（分）"""
+        offset = at.astimezone(self._zones[name]).utcoffset()
+        return int(offset.total_seconds() // 60)
+
+
+class TenantDispatcher:
+    """1分ごとに呼ばれ、通知時刻を迎えた送信先を対象日ごとにまとめて送る
+
+    呼び出しが遅れて分を飛ばした場合は、max_catch_up_minutes までさかのぼって送る。
+    同じ送信先には現地の1日につき1回しか送らない。
+    state_file を指定すると分が進むたびに状態を保存し、次に起動したときに引き継ぐ
+    （再起動をまたいでも、停止していた間の分を max_catch_up_minutes までさかのぼる）。
+    """
+
+    def __init__(
+        self,
+        registry: TenantRegistry,
+        send_batch: SendBatch,
+        max_catch_up_minutes: int = 60,
+        state_file: Optional[Union[str, Path]] = None,
+    ):
+        self.registry = registry
+        self.send_batch = send_batch
+        self.max_catch_up_minutes = max_catch_up_minutes
+        self.state_file = Path(state_file) if state_file else None
+        self._last_minute: Optional[datetime] = None
+        # 前回の起動時に送った日付（登録された送信先に最初に配信を確認するときに引き継ぐ）
+        self._restored: Dict[str, date] = {}
+        if self.state_file:
+            self._load_state()
+
+    async def dispatch(self, now: datetime) -> int:
+        """now までに通知時刻を迎えた送信先に送信し、送信対象の数を返す"""
+        current = now.astimezone(timezone.utc).replace(second=0, microsecond=0)
+        if self._last_minute is None or current <= self._last_minute:
+            minutes = [current]
+        else:
+            missed = int((current - self._last_minute).total_seconds() // 60)
+            if missed > self.max_catch_up_minutes:
+                logger.warning(f"Dispatcher skipped {missed - self.max_catch_up_minutes} minute(s)")
+                missed = self.max_catch_up_minutes
+            minutes = [current - timedelta(minutes=i) for i in range(missed - 1, -1, -1)]
+        previous_minute = self._last_minute
+        self._last_minute = max(current, self._last_minute or current)
+
+        batches: Dict[date, List[str]] = {}
+        for minute in minutes:
+            for tenant in self.registry.due(minute):
+                if tenant.last_sent is None and tenant.user_id in self._restored:
+                    tenant.last_sent = self._restored.pop(tenant.user_id)
+                local_date = minute.astimezone(ZoneInfo(tenant.timezone)).date()
+                if tenant.last_sent == local_date:
+                    continue
+                tenant.last_sent = local_date
+                batches.setdefault(local_date, []).append(tenant.user_id)
+
+        for target_date, user_ids in sorted(batches.items()):
+            logger.info(f"Dispatching daily summary for {target_date} to {len(user_ids)} recipient(s)")
+            try:
+                if not await self.send_batch(target_date, user_ids):
+                    logger.error(f"Daily summary batch for {target_date} failed")
+            except Exception as e:
+                logger.error(f"Unexpected error in dispatch batch: {e}")
+
+        # 送り終えてから記録する（送信中に落ちた場合は再起動後にもう一度送る）
+        if batches or self._last_minute != previous_minute:
+            self._save_state()
+        return sum(len(user_ids) for user_ids in batches.values())
+
+    def _load_state(self):
+        """前回保存した状態を読む（読めなければ何も引き継がない）"""
+        try:
+            state = json.loads(self.state_file.read_text(encoding="utf-8"))
+            last_minute = state.get("last_minute")
+            self._last_minute = datetime.fromisoformat(last_minute) if last_minute else None
+            self._restored = {
+                user_id: date.fromisoformat(sent) for user_id, sent in state.get("last_sent", {}).items()
+            }
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, AttributeError) as e:
+            logger.warning(f"Ignoring unreadable dispatch state {self.state_file}: {e}")
+            return
+        logger.info(f"Restored dispatch state from {self._last_minute} for {len(self._restored)} recipient(s)")
+
+    def _save_state(self):
+        """最後に確認した分と送信済みの日付を保存（書き込み途中で落ちても前の内容が残るよう置き換える）"""
+        if self.state_file is None:
+            return
+        last_sent = {user_id: sent.isoformat() for user_id, sent in self._restored.items()}
+        last_sent.update(
+            (tenant.user_id, tenant.last_sent.isoformat()) for tenant in self.registry if tenant.last_sent
+        )
+        state = {
+            "last_minute": self._last_minute.isoformat() if self._last_minute else None,
+            "last_sent": last_sent,
+        }
+        try:
+            self.state_file.parent.mkdir(parents=True, exist_ok=True)
+            temp_file = self.state_file.with_suffix(self.state_file.suffix + ".tmp")
+            temp_file.write_text(json.dumps(state), encoding="utf-8")
+            os.replace(temp_file, self.state_file)
+        except OSError as e:
+            logger.error(f"Failed to save dispatch state {self.state_file}: {e}")
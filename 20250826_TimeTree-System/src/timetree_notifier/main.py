@@ -1,17 +1,18 @@
-"""TimeTree毎朝通知システム - メインアプリケーション"""
+"""TimeTree毎朝通知システム - メインアプリケーション
+
+起動を速くするため、各モードで必要なモジュールだけをそのモードの中で読み込む
+（status・backups・restore は設定の読み込みだけ、apscheduler は daemon モードの開始時だけ）。
+"""
 
 import asyncio
 import signal
 import sys
 from pathlib import Path
-from datetime import datetime
+from datetime import date, datetime, timedelta
+from typing import Optional
 
 from loguru import logger
 
-from .config import Config
-from .core.scheduler import SchedulerManager
-from .utils.logger import setup_logging
-
 
 class TimeTreeNotifierApp:
     """TimeTree通知アプリケーション"""
@@ -19,23 +20,34 @@ class TimeTreeNotifierApp:
     def __init__(self, config_path: str = "config.yaml"):
         self.config = None
         self.scheduler_manager = None
+        self.config_watcher = None
         self.config_path = config_path
         self.is_running = False
         
+    async def load_config(self):
+        """設定ファイルの読み込みとログ設定（スケジューラーは作らない）"""
+        from .config import Config
+        from .utils.logger import setup_logging
+        
+        # 設定ファイル読み込み（YAML解析でイベントループを止めないよう別スレッドで）
+        logger.info(f"Loading configuration from {self.config_path}")
+        self.config = await asyncio.get_running_loop().run_in_executor(
+            None, Config.load_from_file, self.config_path
+        )
+        
+        # ディレクトリ作成
+        self.config.ensure_directories()
+        
+        # ログ設定
+        setup_logging(self.config.logging)
+    
     async def initialize(self):
         """アプリケーション初期化"""
         try:
-            # 設定ファイル読み込み
-            logger.info(f"Loading configuration from {self.config_path}")
-            self.config = Config.load_from_file(self.config_path)
-            
-            # ディレクトリ作成
-            self.config.ensure_directories()
-            
-            # ログ設定
-            setup_logging(self.config.logging)
+            await self.load_config()
             
             # スケジューラー初期化
+            from .core.scheduler import SchedulerManager
             self.scheduler_manager = SchedulerManager(self.config)
             
             logger.info("TimeTree Notifier initialized successfully")
@@ -45,6 +57,24 @@ class TimeTreeNotifierApp:
             logger.error(f"Failed to initialize application: {e}")
             raise
     
+    async def reload_config(self) -> bool:
+        """設定ファイルを読み込み直して反映（不正な設定なら現在の設定のまま False を返す）"""
+        from .config import Config
+        
+        try:
+            # 検証を含む読み込みはイベントループを止めないよう別スレッドで
+            config = await asyncio.get_running_loop().run_in_executor(
+                None, lambda: Config.load_from_file(self.config_path, override_env=True)
+            )
+            await self.scheduler_manager.apply_config(config)
+        except Exception as e:
+            logger.error(f"Invalid configuration in {self.config_path}, keeping the current one:\n{e}")
+            return False
+        
+        self.config = config
+        self._log_configuration()
+        return True
+    
     def _log_configuration(self):
         """設定内容をログ出力"""
         logger.info(f"Daily notification time: {self.config.daily_summary.time}")
@@ -65,6 +95,14 @@ class TimeTreeNotifierApp:
             # スケジューラー開始
             await self.scheduler_manager.start()
             
+            # 設定ファイルの変更を監視して再起動せずに反映
+            if self.config.config_reload.enabled:
+                from .config.settings import env_file_path
+                from .utils.config_watcher import ConfigWatcher
+                watched = [self.config_path] + [path for path in [env_file_path()] if path]
+                self.config_watcher = ConfigWatcher(watched, self.reload_config, self.config.config_reload.interval)
+                self.config_watcher.start()
+            
             self.is_running = True
             logger.info("TimeTree Notifier started successfully")
             
@@ -85,6 +123,10 @@ class TimeTreeNotifierApp:
             
             logger.info("Stopping TimeTree Notifier...")
             
+            if self.config_watcher:
+                await self.config_watcher.stop()
+                self.config_watcher = None
+            
             if self.scheduler_manager:
                 await self.scheduler_manager.stop()
             
@@ -94,14 +136,14 @@ class TimeTreeNotifierApp:
         except Exception as e:
             logger.error(f"Failed to stop application: {e}")
     
-    async def run_manual_notification(self, target_date: datetime = None):
+    async def run_manual_notification(self, target_date: datetime = None, digest_name: str = None):
         """手動通知実行（テスト用）"""
         try:
             if not self.scheduler_manager:
                 raise RuntimeError("Application not initialized")
             
             logger.info("Running manual notification...")
-            success = await self.scheduler_manager.run_manual(target_date)
+            success = await self.scheduler_manager.run_manual(target_date, digest_name)
             
             if success:
                 logger.info("Manual notification completed successfully")
@@ -125,15 +167,92 @@ class TimeTreeNotifierApp:
         if self.scheduler_manager:
             scheduler_status = self.scheduler_manager.get_status()
             base_status.update(scheduler_status)
+        elif self.config:
+            base_status.update(self._config_status())
         
         return base_status
+    
+    def _config_status(self) -> dict:
+        """スケジューラーを作らずに設定から分かる状態（status モード用）"""
+        from .core.outbox import Outbox
+        
+        daily_summary = self.config.daily_summary
+        next_run = _next_run_time(daily_summary.time, daily_summary.timezone) if daily_summary.enabled else None
+        return {
+            "daily_summary_enabled": daily_summary.enabled,
+            "scheduled_time": daily_summary.time,
+            "timezone": daily_summary.timezone,
+            "next_run_time": next_run.isoformat() if next_run else None,
+            "digests": [digest.name for digest in self.config.digests if digest.enabled],
+            "outbox": Outbox(self.config.paths.outbox).counts()
+        }
+
 
+def _next_run_time(time_str: str, timezone: str, now: Optional[datetime] = None) -> datetime:
+    """毎日 time_str（"07:30"）に実行する場合の次回実行時刻"""
+    from zoneinfo import ZoneInfo
+    
+    tz = ZoneInfo(timezone)
+    now = now or datetime.now(tz)
+    hour, minute = map(int, time_str.split(':'))
+    run_at = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if run_at <= now:
+        run_at += timedelta(days=1)
+    return run_at
 
-# グローバルアプリケーションインスタンス
-app = TimeTreeNotifierApp()
+
+def list_backups(config, account: Optional[str] = None) -> int:
+    """エクスポートの履歴の一覧を表示"""
+    from .core.backup_store import BackupStore
+    
+    store = BackupStore(config.paths.backup_history)
+    print(f"{'id':>6}  {'account':<12} {'created_at':<19}  {'size KiB':>9}  {'chunks':>7}")
+    for snapshot in store.snapshots(account):
+        print(f"{snapshot.id:>6}  {snapshot.account:<12} {snapshot.created_at:%Y-%m-%d %H:%M:%S}  "
+              f"{snapshot.size / 1024:>9.1f}  {snapshot.chunk_count:>7}")
+    stats = store.stats()
+    print(f"{stats['snapshots']} snapshot(s): {stats['stored_bytes'] / 1024:.1f} KiB stored "
+          f"for {stats['original_bytes'] / 1024:.1f} KiB of exports")
+    return 0
+
+
+def restore_backup(
+    config,
+    output: str,
+    snapshot_id: Optional[int] = None,
+    day: Optional[date] = None,
+    account: Optional[str] = None,
+) -> int:
+    """履歴のスナップショット（ID、または日付の終わりの時点のもの）をICSファイルに書き出す"""
+    from .core.backup_store import BackupStore
+    
+    store = BackupStore(config.paths.backup_history)
+    if snapshot_id is None:
+        if day is None:
+            print("--snapshot か --date を指定してください")
+            return 1
+        if account is None:
+            accounts = [a.name for a in config.timetree.get_accounts()]
+            if len(accounts) != 1:
+                print(f"--account を指定してください: {', '.join(accounts)}")
+                return 1
+            account = accounts[0]
+        snapshot = store.find(account, day)
+        if snapshot is None:
+            print(f"{day} 時点の {account} の履歴はありません")
+            return 1
+        snapshot_id = snapshot.id
+    
+    try:
+        path = store.restore(snapshot_id, output)
+    except (KeyError, ValueError) as e:
+        print(f"復元に失敗しました: {e.args[0]}")
+        return 1
+    print(f"Restored snapshot {snapshot_id} to {path}")
+    return 0
 
 
-async def run_daemon():
+async def run_daemon(app: TimeTreeNotifierApp):
     """デーモンモードで実行"""
     
     # シグナルハンドラー設定
@@ -169,13 +288,13 @@ async def run_daemon():
         await app.stop()
 
 
-async def run_manual():
+async def run_manual(app: TimeTreeNotifierApp, digest_name: str = None):
     """手動実行モード"""
     try:
         await app.initialize()
         
         logger.info("Running manual notification...")
-        success = await app.run_manual_notification()
+        success = await app.run_manual_notification(digest_name=digest_name)
         
         if success:
             logger.info("Manual notification completed successfully")
@@ -187,6 +306,9 @@ async def run_manual():
     except Exception as e:
         logger.error(f"Manual execution failed: {e}")
         return 1
+    finally:
+        if app.scheduler_manager:
+            await app.scheduler_manager.stop()
 
 
 def main():
@@ -196,7 +318,7 @@ def main():
     parser = argparse.ArgumentParser(description="TimeTree毎朝通知システム")
     parser.add_argument(
         "--mode", 
-        choices=['daemon', 'manual', 'status'],
+        choices=['daemon', 'manual', 'status', 'backups', 'restore'],
         default='daemon',
         help="実行モード (default: daemon)"
     )
@@ -205,27 +327,42 @@ def main():
         default="config.yaml",
         help="設定ファイルパス (default: config.yaml)"
     )
+    parser.add_argument(
+        "--digest",
+        help="manual モードで日次サマリーの代わりに送るまとめの名前 (digests[].name)"
+    )
+    parser.add_argument("--account", help="backups / restore モードの対象アカウント")
+    parser.add_argument("--snapshot", type=int, help="restore モードで復元するスナップショットのID")
+    parser.add_argument(
+        "--date", type=date.fromisoformat, help="restore モードでその日の終わりの時点の履歴を復元 (YYYY-MM-DD)"
+    )
+    parser.add_argument("--output", default="restored.ics", help="restore モードの出力先 (default: restored.ics)")
     
     args = parser.parse_args()
     
-    # 設定ファイルパスを設定
-    app.config_path = args.config
+    app = TimeTreeNotifierApp(args.config)
     
     try:
         if args.mode == 'daemon':
             # デーモンモード
-            asyncio.run(run_daemon())
+            asyncio.run(run_daemon(app))
         elif args.mode == 'manual':
             # 手動実行モード
-            exit_code = asyncio.run(run_manual())
+            exit_code = asyncio.run(run_manual(app, args.digest))
             sys.exit(exit_code)
         elif args.mode == 'status':
-            # ステータス表示モード
-            asyncio.run(app.initialize())
+            # ステータス表示モード（設定の読み込みだけで、スケジューラーは作らない）
+            asyncio.run(app.load_config())
             status = app.get_status()
             print("=== TimeTree Notifier Status ===")
             for key, value in status.items():
                 print(f"{key}: {value}")
+        elif args.mode == 'backups':
+            asyncio.run(app.load_config())
+            sys.exit(list_backups(app.config, args.account))
+        elif args.mode == 'restore':
+            asyncio.run(app.load_config())
+            sys.exit(restore_backup(app.config, args.output, args.snapshot, args.date, args.account))
     
     except KeyboardInterrupt:
         print("\nApplication interrupted by user")
@@ -1,5 +1,11 @@
 """ユーティリティモジュール"""
 
-from .logger import setup_logging
+import importlib
 
-__all__ = ["setup_logging"]
\ No newline at end of file
+__all__ = ["setup_logging"]
+
+
+def __getattr__(name):
+    if name == "setup_logging":
+        return importlib.import_module(".logger", __name__).setup_logging
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,98 @@
+"""設定ファイルの変更監視
+
+interval 秒ごとに監視対象の更新時刻とサイズを確認し、変わっていたときだけ
+内容のハッシュを計算して前回と比べる。内容が変わっていれば on_change を呼ぶ。
+保存し直しただけ（内容が同じ）の場合は呼ばない。
+"""
+
+import asyncio
+import hashlib
+import os
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Tuple, Union
+
+from loguru import logger
+
+
+# (更新時刻ns, サイズ)。ファイルがなければ None
+Stamp = Optional[Tuple[int, int]]
+
+
+class ConfigWatcher:
+    """設定ファイル（config.yaml・.env）の変更を監視"""
+
+    def __init__(
+        self,
+        paths: Iterable[Union[str, Path]],
+        on_change: Callable[[], Awaitable],
+        interval: float = 5.0,
+    ):
+        self.paths = [Path(path) for path in paths]
+        self.on_change = on_change
+        self.interval = interval
+        self._stamps: Dict[Path, Stamp] = {}
+        self._digests: Dict[Path, Optional[str]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.snapshot()
+
+    def start(self):
+        """監視を開始（イベントループ上で呼ぶ）"""
+        if self._task is not None:
+            return
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.debug(f"Watching {', '.join(str(path) for path in self.paths)} for changes")
+
+    async def stop(self):
+        """監視を停止"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def snapshot(self):
+        """現在の内容を変更判定の基準にする"""
+        for path in self.paths:
+            self._stamps[path] = _stamp(path)
+            self._digests[path] = _digest(path)
+
+    def changed(self) -> bool:
+        """前回の確認から内容が変わったファイルがあるか（基準も更新する）"""
+        changed = False
+        for path in self.paths:
+            stamp = _stamp(path)
+            if stamp == self._stamps[path]:
+                continue
+            self._stamps[path] = stamp
+            digest = _digest(path)
+            if digest != self._digests[path]:
+                self._digests[path] = digest
+                logger.info(f"Detected change in {path}")
+                changed = True
+        return changed
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                if self.changed():
+                    await self.on_change()
+            except Exception as e:
+                logger.error(f"Config reload error: {e}")
+
+
+def _stamp(path: Path) -> Stamp:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _digest(path: Path) -> Optional[str]:
+    try:
+        return hashlib.sha1(path.read_bytes()).hexdigest()
+    except OSError:
+        return None
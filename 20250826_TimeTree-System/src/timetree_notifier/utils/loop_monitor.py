@@ -0,0 +1,94 @@
+"""イベントループの遅延監視
+
+一定間隔で眠るタスクの起床の遅れをループの遅延として記録する。
+別スレッドの監視役がループの応答を確認し、threshold 秒を超えて
+ループを占有している処理があればそのスタックをログに出す。
+"""
+
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from typing import Optional
+
+from loguru import logger
+
+from .metrics import Counter, Histogram, MetricsRegistry
+
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class LoopLagMonitor:
+    """イベントループの遅延と長時間ブロックする処理を監視"""
+
+    def __init__(
+        self,
+        interval: float = 0.5,
+        threshold: float = 0.25,
+        registry: Optional[MetricsRegistry] = None,
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.lag = Histogram("event_loop_lag_seconds", "イベントループの処理待ちの遅れ", LAG_BUCKETS)
+        self.stalls = Counter("event_loop_stalls_total", "threshold を超えてループを占有した回数")
+        if registry is not None:
+            registry.register(self.lag)
+            registry.register(self.stalls)
+
+        self._heartbeat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """監視を開始（イベントループ上で呼ぶ）"""
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._measure())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.debug(f"Event loop monitor started (threshold {self.threshold:.3f}s)")
+
+    async def stop(self):
+        """監視を停止"""
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=self.threshold * 2)
+            self._watchdog = None
+
+    async def _measure(self):
+        """interval ごとに起床し、予定時刻からの遅れを記録"""
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._heartbeat = now
+            self.lag.observe(max(0.0, now - expected))
+
+    def _watch(self):
+        """ループが threshold 秒以上応答しなければ実行中のスタックを記録（別スレッド）"""
+        reported = None
+        while not self._stopped.wait(self.threshold / 2):
+            heartbeat = self._heartbeat
+            blocked = time.monotonic() - heartbeat - self.interval
+            if blocked < self.threshold or reported == heartbeat:
+                continue
+
+            reported = heartbeat
+            self.stalls.inc()
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "(no stack)"
+            logger.warning(f"Event loop blocked for more than {blocked:.2f}s, current stack:\n{stack}")
@@ -0,0 +1,311 @@
+"""計測ユーティリティ
+
+MetricsRegistry に登録した計測値は Prometheus のテキスト形式で出力できる。
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+
+class Histogram:
+    """累積バケット方式のヒストグラム（Prometheusのhistogramと同じ形式）"""
+
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(
+        self,
+        name: str,
+        description: str = "",
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        labels: Optional[Dict[str, str]] = None,
+    ):
+        self.name = name
+        self.description = description
+        self.labels = labels or {}
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * len(self.buckets)
+        self._count = 0
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        """観測値を追加"""
+        with self._lock:
+            self._count += 1
+            self._sum += value
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self._counts[i] += 1
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """with ブロックの処理時間(秒)を観測"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    @property
+    def count(self) -> int:
+        """観測数"""
+        return self._count
+
+    @property
+    def sum(self) -> float:
+        """観測値の合計"""
+        return self._sum
+
+    def quantile(self, q: float) -> float:
+        """バケットから分位点を近似（バケット内は線形補間）"""
+        with self._lock:
+            if self._count == 0:
+                return 0.0
+            rank = q * self._count
+            lower_bound, lower_count = 0.0, 0
+            for bound, count in zip(self.buckets, self._counts):
+                if count >= rank:
+                    if count == lower_count:
+                        return bound
+                    return lower_bound + (bound - lower_bound) * (rank - lower_count) / (count - lower_count)
+                lower_bound, lower_count = bound, count
+            return self.buckets[-1]
+
+    def snapshot(self) -> Dict[str, object]:
+        """現在値を辞書で取得"""
+        with self._lock:
+            return {
+                "count": self._count,
+                "sum": self._sum,
+                "buckets": dict(zip(self.buckets, self._counts)),
+            }
+
+
+class RateMeter:
+    """直近 window 秒間の発生率（回/秒）と累計回数"""
+
+    def __init__(self, name: str, description: str = "", window: float = 10.0):
+        self.name = name
+        self.description = description
+        self.labels: Dict[str, str] = {}
+        self.window = window
+        self._events: Deque[Tuple[float, int]] = deque()
+        self._count = 0
+        self._first: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def mark(self, n: int = 1):
+        """発生を記録"""
+        now = time.monotonic()
+        with self._lock:
+            if self._first is None:
+                self._first = now
+            self._count += n
+            self._events.append((now, n))
+            self._expire(now)
+
+    @property
+    def count(self) -> int:
+        """累計回数"""
+        return self._count
+
+    def recent(self) -> int:
+        """直近 window 秒間の回数"""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            return sum(n for _, n in self._events)
+
+    def rate(self) -> float:
+        """直近 window 秒間の平均発生率（記録開始から window 秒未満ならその期間で割る）"""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            if self._first is None:
+                return 0.0
+            elapsed = min(self.window, now - self._first)
+            return sum(n for _, n in self._events) / elapsed if elapsed > 0 else 0.0
+
+    def _expire(self, now: float):
+        """window より古い記録を捨てる"""
+        while self._events and self._events[0][0] < now - self.window:
+            self._events.popleft()
+
+
+class Counter:
+    """増加のみの累計値"""
+
+    def __init__(self, name: str, description: str = "", labels: Optional[Dict[str, str]] = None):
+        self.name = name
+        self.description = description
+        self.labels = labels or {}
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        """値を増やす"""
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        """現在値"""
+        return self._value
+
+
+class Gauge:
+    """増減する現在値（func を渡すと出力のたびに呼び出して値を得る）"""
+
+    def __init__(
+        self,
+        name: str,
+        description: str = "",
+        labels: Optional[Dict[str, str]] = None,
+        func: Optional[Callable[[], float]] = None,
+    ):
+        self.name = name
+        self.description = description
+        self.labels = labels or {}
+        self._func = func
+        self._value = 0.0
+
+    def set(self, value: float):
+        """値を設定"""
+        self._value = value
+
+    def set_to_current_time(self):
+        """現在時刻（UNIX秒）を設定"""
+        self._value = time.time()
+
+    @property
+    def value(self) -> float:
+        """現在値"""
+        return float(self._func()) if self._func else self._value
+
+
+Metric = Union[Histogram, RateMeter, Counter, Gauge]
+
+
+class MetricsRegistry:
+    """計測値の登録と Prometheus テキスト形式での出力
+
+    同じ名前の計測値はラベルだけを変えて複数登録できる。
+    """
+
+    def __init__(self):
+        self._metrics: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        """作成済みの計測値を登録（同じ名前・ラベルのものは置き換える）"""
+        with self._lock:
+            self._metrics[(metric.name, _label_key(metric.labels))] = metric
+        return metric
+
+    def counter(self, name: str, description: str = "", **labels: str) -> Counter:
+        """カウンターを取得（なければ作成）"""
+        return self._get_or_create(Counter, name, labels, lambda: Counter(name, description, labels))
+
+    def gauge(self, name: str, description: str = "", **labels: str) -> Gauge:
+        """ゲージを取得（なければ作成）"""
+        return self._get_or_create(Gauge, name, labels, lambda: Gauge(name, description, labels))
+
+    def histogram(
+        self,
+        name: str,
+        description: str = "",
+        buckets: Sequence[float] = Histogram.DEFAULT_BUCKETS,
+        **labels: str,
+    ) -> Histogram:
+        """ヒストグラムを取得（なければ作成）"""
+        return self._get_or_create(Histogram, name, labels, lambda: Histogram(name, description, buckets, labels))
+
+    def render(self) -> str:
+        """Prometheus のテキスト形式（version 0.0.4）で出力"""
+        with self._lock:
+            metrics = sorted(self._metrics.items(), key=lambda item: item[0])
+
+        lines: List[str] = []
+        described = set()
+        for _, metric in metrics:
+            name = metric.name + "_total" if isinstance(metric, RateMeter) else metric.name
+            if name not in described:
+                described.add(name)
+                if metric.description:
+                    lines.append(f"# HELP {name} {_escape_help(metric.description)}")
+                lines.append(f"# TYPE {name} {_metric_type(metric)}")
+
+            if isinstance(metric, Histogram):
+                snapshot = metric.snapshot()
+                for bound, count in snapshot["buckets"].items():
+                    lines.append(f"{name}_bucket{_format_labels(metric.labels, le=_format_value(bound))} {count}")
+                lines.append(f"{name}_bucket{_format_labels(metric.labels, le='+Inf')} {snapshot['count']}")
+                lines.append(f"{name}_sum{_format_labels(metric.labels)} {_format_value(snapshot['sum'])}")
+                lines.append(f"{name}_count{_format_labels(metric.labels)} {snapshot['count']}")
+            elif isinstance(metric, RateMeter):
+                lines.append(f"{name}{_format_labels(metric.labels)} {metric.count}")
+            else:
+                try:
+                    value = metric.value
+                except Exception:
+                    continue
+                lines.append(f"{name}{_format_labels(metric.labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def _get_or_create(self, kind: type, name: str, labels: Dict[str, str], create: Callable[[], Metric]):
+        """同じ名前・ラベルの計測値があれば返し、なければ作成して登録"""
+        key = (name, _label_key(labels))
+        with self._lock:
+            metric = self._metrics.get(key)
+            if metric is None:
+                metric = self._metrics[key] = create()
+        if not isinstance(metric, kind):
+            raise ValueError(f"Metric {name} is already registered as {type(metric).__name__}")
+        return metric
+
+
+def _label_key(labels: Dict[str, str]) -> Tuple[Tuple[str, str], ...]:
+    """ラベルの比較用キー"""
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _metric_type(metric: Metric) -> str:
+    """Prometheus の TYPE"""
+    if isinstance(metric, Histogram):
+        return "histogram"
+    if isinstance(metric, (Counter, RateMeter)):
+        return "counter"
+    return "gauge"
+
+
+def _format_labels(labels: Dict[str, str], **extra: str) -> str:
+    """{key="value",...} 形式（ラベルがなければ空文字）"""
+    items = [*sorted(labels.items()), *extra.items()]
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label(str(value))}"' for key, value in items) + "}"
+
+
+def _format_value(value: float) -> str:
+    """数値の出力形式"""
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_help(text: str) -> str:
+    """HELP行のエスケープ"""
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _escape_label(value: str) -> str:
+    """ラベル値のエスケープ"""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,50 @@
+"""計測値を公開するローカルHTTPサーバー
+
+GET /metrics で MetricsRegistry の内容を Prometheus のテキスト形式で返す。
+"""
+
+from typing import Optional
+
+from aiohttp import web
+from loguru import logger
+
+from .metrics import MetricsRegistry
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class MetricsServer:
+    """/metrics エンドポイント"""
+
+    def __init__(self, registry: MetricsRegistry, host: str = "127.0.0.1", port: int = 9108):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def url(self) -> str:
+        """エンドポイントのURL"""
+        return f"http://{self.host}:{self.port}/metrics"
+
+    async def start(self):
+        """サーバーを起動（port=0 なら空きポートを使う）"""
+        app = web.Application()
+        app.router.add_get("/metrics", self._handle_metrics)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        logger.info(f"Metrics endpoint listening on {self.url}")
+
+    async def stop(self):
+        """サーバーを停止"""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def _handle_metrics(self, request: web.Request) -> web.Response:
+        """計測値を返す"""
+        return web.Response(body=self.registry.render().encode("utf-8"), headers={"Content-Type": CONTENT_TYPE})
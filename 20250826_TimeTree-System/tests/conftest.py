@@ -0,0 +1,51 @@
+"""テスト共通の設定
+
+src/ と benchmarks/（ICS生成・擬似エクスポーター・擬似LINEサーバー）を読み込めるようにする。
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from fake_line_server import FakeLineServer  # noqa: E402
+
+
+@pytest.fixture
+async def line_server():
+    """擬似LINEサーバー（空きポートで起動）"""
+    async with FakeLineServer() as server:
+        yield server
+
+
+def _vevent(uid: str, summary: str, start: str, end: str = None, extra: str = "", stamp: str = "20250101T000000Z"):
+    """1件分のVEVENT（start/end は "20250615T090000" か終日の "20250615"）"""
+    lines = ["BEGIN:VEVENT", f"UID:{uid}", f"DTSTAMP:{stamp}"]
+    for name, value in (("DTSTART", start), ("DTEND", end)):
+        if value is None:
+            continue
+        if "T" in value:
+            lines.append(f"{name};TZID=Asia/Tokyo:{value}")
+        else:
+            lines.append(f"{name};VALUE=DATE:{value}")
+    lines.append(f"SUMMARY:{summary}")
+    lines.extend(line for line in extra.splitlines() if line)
+    lines.append("END:VEVENT")
+    return "\r\n".join(lines) + "\r\n"
+
+
+@pytest.fixture
+def write_ics():
+    """(uid, summary, start, end[, extra[, stamp]]) の組からICSファイルを書く関数"""
+    def write(path: Path, events) -> Path:
+        body = "".join(_vevent(*event) for event in events)
+        path.write_bytes(
+            ("BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//test//timetree//JA\r\n" + body
+             + "END:VCALENDAR\r\n").encode("utf-8")
+        )
+        return path
+    return write
@@ -0,0 +1,55 @@
+"""予定変更の通知のテスト"""
+
+import pytest
+
+from bench_suite import build_config
+from timetree_notifier.core.change_alerts import ADDED, MOVED, ChangeAlertNotifier
+from timetree_notifier.core.daily_notifier import DailySummaryNotifier
+
+from test_daily_summary import EVENTS, TARGET_DATE, _texts
+
+
+@pytest.fixture
+async def alerts(tmp_path, line_server, write_ics):
+    source = write_ics(tmp_path / "source.ics", EVENTS)
+    notifier = DailySummaryNotifier(build_config(tmp_path, source, line_server.base_url, 1))
+    alerts = ChangeAlertNotifier(notifier)
+    yield alerts
+    await alerts.close()
+    await notifier.close()
+
+
+async def _change_events(alerts, tmp_path, write_ics):
+    """朝会を移動し、予定を1件追加して確認する"""
+    assert await alerts.poll(TARGET_DATE) == []
+    moved = [("a", "朝会", "20250615T100000", "20250615T103000")] + EVENTS[:1] + EVENTS[2:]
+    write_ics(tmp_path / "source.ics", moved + [("e", "歯医者", "20250616T150000", "20250616T160000")])
+    return await alerts.poll(TARGET_DATE)
+
+
+async def test_poll_finds_moved_and_added_events(alerts, line_server, tmp_path, write_ics):
+    found = await _change_events(alerts, tmp_path, write_ics)
+    assert sorted((change.kind, change.key) for change in found) == [(ADDED, "e"), (MOVED, "a")]
+
+    assert await alerts.flush()
+    [body] = line_server.received
+    text = _texts(body)
+    assert "🔁" in text and "10:00-10:30 朝会" in text
+    assert "➕" in text and "歯医者" in text
+
+
+async def test_failed_flush_keeps_pending_changes(alerts, line_server, tmp_path, write_ics, monkeypatch):
+    await _change_events(alerts, tmp_path, write_ics)
+
+    async def broken(deliveries):
+        raise RuntimeError("outbox is broken")
+    monkeypatch.setattr(alerts.notifier, "send_deliveries", broken)
+    await alerts._flush_later(0)
+    assert len(alerts._pending) == 2
+    assert alerts._flush_task is not None
+
+    monkeypatch.undo()
+    alerts._flush_task.cancel()
+    alerts._flush_task = None
+    assert await alerts.flush()
+    assert len(line_server.received) == 1
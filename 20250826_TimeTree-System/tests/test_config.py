@@ -0,0 +1,69 @@
+"""設定の読み込みのテスト"""
+
+import os
+
+import pytest
+from pydantic import ValidationError
+
+from timetree_notifier.config import settings
+from timetree_notifier.config.settings import Config
+
+
+CONFIG_YAML = """\
+timetree:
+  email: ${TEST_TIMETREE_EMAIL}
+  password: secret
+notification:
+  line_channel_access_token: ${TEST_LINE_TOKEN}
+  line_user_id: U0000
+daily_summary:
+  time: ${TEST_DAILY_TIME}
+"""
+
+
+@pytest.fixture
+def config_files(tmp_path, monkeypatch):
+    """config.yaml と .env（.env は常にこのファイルを読む）"""
+    env_file = tmp_path / ".env"
+    monkeypatch.setattr(settings, "env_file_path", lambda: str(env_file))
+    monkeypatch.setattr(settings, "_dotenv_applied", {})
+    for key in ("TEST_TIMETREE_EMAIL", "TEST_LINE_TOKEN", "TEST_DAILY_TIME"):
+        monkeypatch.delenv(key, raising=False)
+
+    config_file = tmp_path / "config.yaml"
+    config_file.write_text(CONFIG_YAML, encoding="utf-8")
+    return config_file, env_file
+
+
+def test_reload_applies_and_removes_dotenv_values(config_files, monkeypatch):
+    config_file, env_file = config_files
+    monkeypatch.setenv("TEST_TIMETREE_EMAIL", "shell@example.com")
+    env_file.write_text("TEST_LINE_TOKEN=token1\nTEST_DAILY_TIME=07:00\n", encoding="utf-8")
+
+    config = Config.load_from_file(str(config_file))
+    assert config.notification.line_channel_access_token == "token1"
+    assert config.timetree.email == "shell@example.com"
+
+    # .env の値が既存の環境変数より優先され、.env から消えた変数は元に戻る
+    env_file.write_text("TEST_TIMETREE_EMAIL=dotenv@example.com\nTEST_DAILY_TIME=08:00\n", encoding="utf-8")
+    config = Config.load_from_file(str(config_file), override_env=True)
+    assert config.timetree.email == "dotenv@example.com"
+    assert config.daily_summary.time == "08:00"
+    assert "TEST_LINE_TOKEN" not in os.environ
+    assert config.notification.line_channel_access_token == "${TEST_LINE_TOKEN}"
+
+    env_file.write_text("TEST_DAILY_TIME=08:00\n", encoding="utf-8")
+    Config.load_from_file(str(config_file), override_env=True)
+    assert os.environ["TEST_TIMETREE_EMAIL"] == "shell@example.com"
+
+
+def test_invalid_dotenv_leaves_environment_unchanged(config_files):
+    config_file, env_file = config_files
+    env_file.write_text("TEST_LINE_TOKEN=token1\nTEST_DAILY_TIME=07:00\n", encoding="utf-8")
+    Config.load_from_file(str(config_file))
+
+    env_file.write_text("TEST_LINE_TOKEN=token2\nTEST_DAILY_TIME=25:00\n", encoding="utf-8")
+    with pytest.raises(ValidationError):
+        Config.load_from_file(str(config_file), override_env=True)
+    assert os.environ["TEST_LINE_TOKEN"] == "token1"
+    assert os.environ["TEST_DAILY_TIME"] == "07:00"
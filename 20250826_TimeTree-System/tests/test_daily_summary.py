@@ -0,0 +1,107 @@
+"""擬似エクスポーター・擬似LINEサーバーを使った send_daily_summary のテスト"""
+
+from datetime import date
+
+import pytest
+
+from bench_suite import build_config
+from timetree_notifier.core.daily_notifier import DailySummaryNotifier
+from timetree_notifier.core.export_pool import ExportPool
+
+TARGET_DATE = date(2025, 6, 15)
+
+EVENTS = [
+    ("b", "昼食", "20250615T120000", "20250615T130000"),
+    ("a", "朝会", "20250615T090000", "20250615T093000"),
+    ("c", "翌日の予定", "20250616T100000", "20250616T110000"),
+    ("d", "旅行", "20250614", "20250617"),
+]
+
+
+@pytest.fixture
+async def notifier(tmp_path, line_server, write_ics):
+    source = write_ics(tmp_path / "source.ics", EVENTS)
+    notifier = DailySummaryNotifier(build_config(tmp_path, source, line_server.base_url, 3))
+    yield notifier
+    await notifier.close()
+
+
+def _fail_exports(notifier):
+    """以降のエクスポートを失敗させる"""
+    config = notifier.config
+    config.timetree.exporter.command += " --fail"
+    notifier.export_pool = ExportPool(config.timetree, config.paths.temp_ics)
+
+
+def _texts(body):
+    return "\n".join(message["text"] for message in body["messages"])
+
+
+async def test_sends_todays_events_to_all_recipients(notifier, line_server, tmp_path):
+    assert await notifier.send_daily_summary(TARGET_DATE)
+
+    [body] = line_server.received
+    assert body["to"] == ["U0000", "U0001", "U0002"]
+    text = _texts(body)
+    assert "2025年06月15日" in text
+    assert "翌日の予定" not in text
+    # 終日予定を先に、時刻のある予定は開始時刻順
+    positions = [text.index(title) for title in ("旅行", "09:00-09:30 朝会", "12:00-13:00 昼食")]
+    assert positions == sorted(positions)
+    # 送った内容はバックアップとして残る
+    assert (tmp_path / "backup.ics").read_bytes() == (tmp_path / "source.ics").read_bytes()
+
+
+async def test_rerun_with_unchanged_export_sends_again(notifier, line_server):
+    assert await notifier.send_daily_summary(TARGET_DATE)
+    assert await notifier.send_daily_summary(TARGET_DATE)
+
+    assert len(line_server.received) == 2
+    assert _texts(line_server.received[0]) == _texts(line_server.received[1])
+
+
+async def test_other_day_uses_same_index(notifier, line_server):
+    assert await notifier.send_daily_summary(TARGET_DATE)
+    assert await notifier.send_daily_summary(date(2025, 6, 16))
+
+    text = _texts(line_server.received[1])
+    assert "翌日の予定" in text and "旅行" in text
+    assert "朝会" not in text
+
+
+async def test_failed_export_falls_back_to_last_events(notifier, line_server):
+    assert await notifier.send_daily_summary(TARGET_DATE)
+
+    _fail_exports(notifier)
+    await notifier.send_daily_summary(TARGET_DATE)
+
+    text = _texts(line_server.received[-1])
+    assert "時点のデータです" in text
+    assert "朝会" in text
+
+
+async def test_failed_export_without_history_sends_error(notifier, line_server):
+    notifier.config.daily_summary.fallback_days = 0
+    _fail_exports(notifier)
+
+    await notifier.send_daily_summary(TARGET_DATE)
+    [body] = line_server.received
+    assert body["to"] == ["U0000", "U0001", "U0002"]
+    assert "login failed" in _texts(body)
+
+
+async def test_unexpected_error_is_queued_in_outbox(notifier, line_server, monkeypatch):
+    async def broken(*args, **kwargs):
+        raise RuntimeError("index is broken")
+    monkeypatch.setattr(notifier, "_prepare_deliveries", broken)
+
+    # LINEが止まっていてもエラー通知はアウトボックスに残り、後で再送される
+    line_server.fail_status = 503
+    assert not await notifier.send_daily_summary(TARGET_DATE)
+    assert notifier.outbox.counts() == {"pending": 1}
+
+    line_server.fail_status = None
+    assert await notifier.outbox_worker.drain(now=float("inf")) == 1
+    [body] = line_server.received
+    assert body["to"] == ["U0000", "U0001", "U0002"]
+    assert "index is broken" in _texts(body)
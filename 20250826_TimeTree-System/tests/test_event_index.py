@@ -0,0 +1,107 @@
+"""予定インデックスの取り込み・検索のテスト"""
+
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+from icalendar import Calendar
+
+from ics_generator import generate_ics
+from timetree_notifier.core.event_index import EventIndex
+
+TZ = ZoneInfo("Asia/Tokyo")
+
+BASE_EVENTS = [
+    ("a", "朝会", "20250615T090000", "20250615T093000"),
+    ("b", "昼食", "20250615T120000", "20250615T130000"),
+    ("c", "翌日の予定", "20250616T100000", "20250616T110000"),
+    ("d", "旅行", "20250614", "20250617"),
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    return EventIndex(tmp_path / "index.sqlite3", "Asia/Tokyo")
+
+
+def _titles(events):
+    return [event.title for event in events]
+
+
+def test_query_returns_overlapping_events_in_order(index, tmp_path, write_ics):
+    diff = index.ingest(write_ics(tmp_path / "a.ics", BASE_EVENTS))
+
+    assert sorted(diff.added) == ["a", "b", "c", "d"]
+    assert _titles(index.events_on(date(2025, 6, 15))) == ["旅行", "朝会", "昼食"]
+    assert _titles(index.events_on(date(2025, 6, 16))) == ["旅行", "翌日の予定"]
+    assert _titles(index.events_on(date(2025, 6, 17))) == []
+    # 終了時刻ちょうどに始まる区間とは重ならない
+    found = index.query(datetime(2025, 6, 15, 9, 30, tzinfo=TZ), datetime(2025, 6, 15, 12, tzinfo=TZ))
+    assert _titles(found) == ["旅行"]
+
+
+def test_incremental_ingest_reports_diff(index, tmp_path, write_ics):
+    index.ingest(write_ics(tmp_path / "a.ics", BASE_EVENTS))
+
+    updated = [
+        # DTSTAMP だけ変わった予定は変更として扱わない
+        ("a", "朝会", "20250615T090000", "20250615T093000", "", "20250701T000000Z"),
+        ("b", "ランチ", "20250615T120000", "20250615T130000"),
+        ("d", "旅行", "20250614", "20250617"),
+        ("e", "追加", "20250615T180000", "20250615T190000"),
+    ]
+    diff = index.ingest(write_ics(tmp_path / "b.ics", updated))
+
+    assert diff.added == ["e"]
+    assert diff.changed == ["b"]
+    assert diff.removed == ["c"]
+    assert diff.unchanged == 2
+    assert _titles(index.events_on(date(2025, 6, 15))) == ["旅行", "朝会", "ランチ", "追加"]
+    assert index.events_on(date(2025, 6, 16))[-1].title == "旅行"
+    assert index.count() == 4
+
+
+def test_recurring_events_are_expanded_in_window(index, tmp_path, write_ics):
+    events = [
+        ("w", "定例", "20250602T100000", "20250602T110000",
+         "RRULE:FREQ=WEEKLY;COUNT=6\nEXDATE;TZID=Asia/Tokyo:20250616T100000"),
+    ]
+    index.ingest(write_ics(tmp_path / "a.ics", events))
+
+    found = index.events_between(date(2025, 6, 1), date(2025, 7, 31))
+    assert [e.start_time.date() for e in found] == [
+        date(2025, 6, 2), date(2025, 6, 9), date(2025, 6, 23), date(2025, 6, 30), date(2025, 7, 7)
+    ]
+    assert found[0].start_time == datetime(2025, 6, 2, 10, tzinfo=TZ)
+    assert index.events_on(date(2025, 6, 16)) == []
+
+
+def test_index_matches_full_scan(index, tmp_path):
+    start = date(2025, 1, 1)
+    path = generate_ics(tmp_path / "a.ics", 2000, start_date=start, days=60)
+    index.ingest(path)
+
+    expected = {}
+    for component in Calendar.from_ical(path.read_bytes()).walk("VEVENT"):
+        day = component.decoded("DTSTART").astimezone(TZ).date()
+        expected.setdefault(day, set()).add(str(component["SUMMARY"]))
+
+    for offset in range(0, 60, 7):
+        day = start + timedelta(days=offset)
+        assert set(_titles(index.events_on(day))) == expected.get(day, set())
+
+
+def test_source_hash_is_recorded_with_ingest(index, tmp_path, write_ics):
+    path = write_ics(tmp_path / "a.ics", BASE_EVENTS)
+    assert index.source_hash() is None
+
+    index.ingest(path, source_hash="abc")
+    assert index.source_hash() == "abc"
+    # ハッシュを渡さない取り込みでは、どの内容かわからなくなる
+    index.ingest(path)
+    assert index.source_hash() is None
+
+    index.ingest(path, source_hash="abc")
+    index.clear()
+    assert index.source_hash() is None
+    assert index.count() == 0
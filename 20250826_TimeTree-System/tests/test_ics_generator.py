@@ -0,0 +1,59 @@
+"""ベンチマーク用ICS生成のテスト"""
+
+from datetime import date, datetime
+
+from icalendar import Calendar
+
+from ics_generator import generate_ics
+
+
+def _events(path):
+    calendar = Calendar.from_ical(path.read_bytes())
+    return list(calendar.walk("VEVENT"))
+
+
+def test_event_count_and_range(tmp_path):
+    start = date(2025, 1, 1)
+    path = generate_ics(tmp_path / "a.ics", 200, start_date=start, days=30, recurring_count=5)
+
+    events = _events(path)
+    assert len(events) == 205
+    assert len({str(e["UID"]) for e in events}) == 205
+    for event in events:
+        value = event.decoded("DTSTART")
+        day = value.date() if isinstance(value, datetime) else value
+        assert start <= day < date(2025, 1, 31)
+
+
+def test_same_seed_is_deterministic(tmp_path):
+    first = generate_ics(tmp_path / "a.ics", 100, seed=1).read_bytes()
+    second = generate_ics(tmp_path / "b.ics", 100, seed=1).read_bytes()
+    other = generate_ics(tmp_path / "c.ics", 100, seed=2).read_bytes()
+    assert first == second
+    assert first != other
+
+
+def test_ratios_and_timezones(tmp_path):
+    path = generate_ics(tmp_path / "a.ics", 100, recurring_ratio=0.2, all_day_ratio=1.0,
+                        timezones=("UTC", "Europe/Berlin"))
+
+    events = _events(path)
+    recurring = [e for e in events if "RRULE" in e]
+    singles = [e for e in events if "RRULE" not in e]
+    assert len(recurring) == 20
+    # 繰り返し以外は全て終日予定
+    assert all(not isinstance(e.decoded("DTSTART"), datetime) for e in singles)
+    zones = {str(e.decoded("DTSTART").tzinfo) for e in recurring}
+    assert zones <= {"UTC", "Europe/Berlin"}
+
+
+def test_long_descriptions_are_folded(tmp_path):
+    path = generate_ics(tmp_path / "a.ics", 50, description_size=300)
+
+    lines = path.read_bytes().split(b"\r\n")
+    assert max(len(line) for line in lines) <= 75
+    assert any(line.startswith(b" ") for line in lines)
+    # 折り返しを戻すと元の長さの説明になる
+    descriptions = [str(e["DESCRIPTION"]) for e in _events(path)]
+    assert len(descriptions) == 50
+    assert all(150 <= len(d) <= 450 for d in descriptions)
@@ -0,0 +1,151 @@
+"""アウトボックスの記録・送信・再送のテスト"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from timetree_notifier.config.settings import ExecutorConfig
+from timetree_notifier.core.executors import StageExecutors
+from timetree_notifier.core.line_notifier import LineNotifier
+from timetree_notifier.core.outbox import FAILED, PENDING, SENT, Outbox, OutboxWorker
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    return Outbox(tmp_path / "outbox.sqlite3")
+
+
+@pytest.fixture
+async def notifier(line_server):
+    notifier = LineNotifier("test", api_base_url=line_server.base_url)
+    yield notifier
+    await notifier.close()
+
+
+def test_enqueue_splits_by_multicast_limit(outbox):
+    recipients = [f"U{i:04d}" for i in range(1200)]
+    [ids] = outbox.enqueue_many([(recipients, "本文", None)])
+
+    assert len(ids) == 3
+    entries = outbox.claim(ids)
+    assert [len(entry.recipients) for entry in entries] == [500, 500, 200]
+    assert len({entry.retry_key for entry in entries}) == 3
+
+
+def test_dedupe_key_only_when_given(outbox):
+    first = outbox.enqueue(["U1"], "同じ本文", dedupe_key="run-1")
+    again = outbox.enqueue(["U1"], "同じ本文", dedupe_key="run-1")
+    assert first == again
+
+    # キーを省略した場合は同じ本文でも別の送信になる
+    a = outbox.enqueue(["U1"], "同じ本文")
+    b = outbox.enqueue(["U1"], "同じ本文")
+    assert a != b
+    assert outbox.counts() == {PENDING: 3}
+
+
+async def test_identical_messages_are_both_sent(outbox, notifier, line_server):
+    worker = OutboxWorker(outbox, notifier)
+    for _ in range(2):
+        [ids] = outbox.enqueue_many([(["U1"], "同じ本文", None)])
+        assert await worker.deliver(ids)
+
+    assert line_server.delivered == 2
+    assert outbox.counts() == {SENT: 2}
+
+
+async def test_multiple_messages_go_in_one_request(outbox, notifier, line_server):
+    worker = OutboxWorker(outbox, notifier)
+    ids = outbox.enqueue(["U1", "U2"], ["1通目", "2通目"])
+    assert await worker.deliver(ids)
+
+    [body] = line_server.received
+    assert body["to"] == ["U1", "U2"]
+    assert [m["text"] for m in body["messages"]] == ["1通目", "2通目"]
+
+
+async def test_failed_send_is_retried_later(outbox, notifier, line_server):
+    worker = OutboxWorker(outbox, notifier, retry_delay=60.0)
+    ids = outbox.enqueue(["U1"], "本文")
+
+    line_server.fail_status = 503
+    assert not await worker.deliver(ids)
+    assert outbox.statuses(ids) == {ids[0]: PENDING}
+    # 再送時刻（約60秒後）まではまだ送らない
+    assert await worker.drain() == 0
+    assert outbox.next_attempt_at() > time.time() + 30
+
+    line_server.fail_status = None
+    assert await worker.drain(now=time.time() + 3600) == 1
+    assert outbox.statuses(ids) == {ids[0]: SENT}
+    assert line_server.delivered == 1
+
+
+async def test_permanent_errors_and_retry_limit_give_up(outbox, notifier, line_server):
+    worker = OutboxWorker(outbox, notifier, retry_count=1, retry_delay=0.0)
+    rejected = outbox.enqueue(["U1"], "拒否される")
+    line_server.fail_status = 400
+    assert not await worker.deliver(rejected)
+    assert outbox.statuses(rejected) == {rejected[0]: FAILED}
+
+    unavailable = outbox.enqueue(["U2"], "障害中")
+    line_server.fail_status = 503
+    assert not await worker.deliver(unavailable)
+    await worker.drain(now=time.time() + 60)
+    assert outbox.statuses(unavailable) == {unavailable[0]: FAILED}
+
+
+async def test_resume_after_crash_does_not_duplicate(outbox, notifier, line_server, tmp_path):
+    ids = outbox.enqueue(["U1"], "送信中に落ちた")
+    # 送信は受け付けられたが、結果を記録する前にプロセスが終了した
+    [entry] = outbox.claim(ids)
+    await notifier.send_request(entry.recipients, entry.messages, entry.retry_key)
+
+    restarted = Outbox(tmp_path / "outbox.sqlite3")
+    worker = OutboxWorker(restarted, notifier)
+    assert worker.resume() == 1
+    assert await worker.drain() == 1
+
+    # 同じリトライキーの再送は409（受付済み）で成功扱いになり、二重に届かない
+    assert restarted.statuses(ids) == {ids[0]: SENT}
+    assert line_server.delivered == 1
+
+
+async def test_sqlite_runs_off_the_event_loop(outbox, notifier):
+    executors = StageExecutors(ExecutorConfig())
+    worker = OutboxWorker(outbox, notifier, executors=executors)
+    threads = set()
+    for name in ("claim", "statuses", "record"):
+        original = getattr(outbox, name)
+
+        def wrapped(*args, _original=original):
+            threads.add(threading.current_thread().name)
+            return _original(*args)
+        setattr(outbox, name, wrapped)
+
+    try:
+        assert await worker.deliver(outbox.enqueue(["U1"], "本文"))
+    finally:
+        executors.shutdown()
+    assert threads and all(name.startswith("timetree-io") for name in threads)
+
+
+def test_worker_can_be_created_outside_the_loop(outbox):
+    # イベントループの外で作っても、後で起動したループで run()/notify() を使える
+    worker = OutboxWorker(outbox, LineNotifier("test", api_base_url="http://127.0.0.1:9"))
+    worker.notify()
+
+    async def run_briefly():
+        task = asyncio.create_task(worker.run(idle_interval=0.05))
+        await asyncio.sleep(0.1)
+        worker.notify()
+        await asyncio.sleep(0.05)
+        assert not task.done()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await worker.notifier.close()
+
+    asyncio.run(run_briefly())
@@ -0,0 +1,96 @@
+"""送信レート制御のテスト"""
+
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from fake_line_server import FakeLineServer
+from timetree_notifier.core.line_notifier import LineNotifier
+from timetree_notifier.core.rate_limiter import AdaptiveRateLimiter, _parse_reset, _parse_retry_after
+
+
+def test_parse_retry_after():
+    assert _parse_retry_after(None) is None
+    assert _parse_retry_after("2") == 2.0
+    assert _parse_retry_after("-1") == 0.0
+    assert _parse_retry_after("soon") is None
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=30)
+    assert 28 <= _parse_retry_after(format_datetime(retry_at, usegmt=True)) <= 30
+
+
+def test_parse_reset_accepts_seconds_and_epoch():
+    assert _parse_reset(None) is None
+    assert _parse_reset("0.5") == 0.5
+    assert 9 <= _parse_reset(str(time.time() + 10)) <= 10
+    # 過ぎたUNIX時刻は使わない
+    assert _parse_reset(str(time.time() - 10)) is None
+
+
+async def test_acquire_paces_requests():
+    limiter = AdaptiveRateLimiter(rate=50.0, burst=1.0)
+    started = time.monotonic()
+    for _ in range(11):
+        await limiter.acquire()
+    # 最初の1回はすぐ、残り10回は 1/50 秒ずつ
+    assert time.monotonic() - started >= 0.18
+
+
+async def test_throttle_pauses_and_lowers_rate():
+    limiter = AdaptiveRateLimiter(rate=100.0)
+    await limiter.acquire()
+    limiter.on_response(429, {"Retry-After": "0.2"})
+    rate = limiter.rate
+    assert rate < 100.0
+    assert limiter.limit_estimate is not None
+
+    # 同じ停止中に届いた429はまとめて1回として扱う
+    limiter.on_response(429, {"Retry-After": "0.2"})
+    assert limiter.rate == rate
+    assert limiter.throttled == 2
+
+    started = time.monotonic()
+    await limiter.acquire()
+    assert time.monotonic() - started >= 0.15
+
+
+def test_throttle_estimates_limit_from_accepted_requests():
+    limiter = AdaptiveRateLimiter(rate=100.0)
+    limiter.send_rate.mark(100)
+    limiter.accept_rate.mark(20)
+    limiter.on_response(429, {"Retry-After": "1"})
+    assert limiter.limit_estimate == 20.0
+    assert limiter.rate == 20.0 * limiter.headroom
+
+
+def test_success_raises_rate_up_to_ceiling():
+    limiter = AdaptiveRateLimiter(rate=10.0, increase=1.0)
+    limiter.limit_estimate = 20.0
+    for _ in range(100):
+        limiter.on_response(200, {})
+    assert limiter.rate == 20.0 * limiter.headroom
+
+
+def test_rate_is_kept_within_bounds():
+    limiter = AdaptiveRateLimiter(rate=5000.0, max_rate=200.0, min_rate=2.0)
+    assert limiter.rate == 200.0
+    limiter.on_response(200, {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": "1"})
+    assert limiter.rate == 2.0
+
+
+def test_epoch_reset_header_sets_rate():
+    limiter = AdaptiveRateLimiter(rate=100.0)
+    limiter.on_response(200, {"X-RateLimit-Remaining": "10", "X-RateLimit-Reset": str(time.time() + 2)})
+    assert 4.0 <= limiter.rate <= 10 / 2 * limiter.headroom + 0.1
+
+
+async def test_rate_converges_below_quota():
+    quota = 50
+    async with FakeLineServer(rate_limit=quota) as server:
+        notifier = LineNotifier("test", api_base_url=server.base_url, max_concurrency=10,
+                                max_connections=10, rate_limit=500.0)
+        result = await notifier.send_personalized({f"U{i:04d}": "今日の予定" for i in range(200)})
+        await notifier.close()
+
+    assert result.failed_recipients == []
+    assert server.throttled > 0
+    assert notifier.rate_limiter.rate <= quota
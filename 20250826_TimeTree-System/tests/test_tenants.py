@@ -0,0 +1,153 @@
+"""送信先ごとの通知時刻による配信のテスト（時計を1分ずつ進めて模擬する）"""
+
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from timetree_notifier.core.tenants import TenantDispatcher, TenantRegistry
+
+
+def _utc(*args) -> datetime:
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+class Recorder:
+    """send_batch として渡し、(送信先, 対象日, 送信時刻) を記録する"""
+
+    def __init__(self):
+        self.sent = []
+        self.clock = None
+
+    async def __call__(self, target_date, user_ids):
+        self.sent.extend((user_id, target_date, self.clock) for user_id in user_ids)
+        return True
+
+    def per_day(self) -> Counter:
+        return Counter((user_id, target_date) for user_id, target_date, _ in self.sent)
+
+    def local_times(self, user_id: str, zone: str):
+        return [at.astimezone(ZoneInfo(zone)).strftime("%m/%d %H:%M") for uid, _, at in self.sent if uid == user_id]
+
+
+def _registry(start: datetime, tenants) -> TenantRegistry:
+    registry = TenantRegistry(now=start)
+    for user_id, time, zone in tenants:
+        registry.add(user_id, time, zone)
+    return registry
+
+
+async def _run(dispatcher: TenantDispatcher, recorder: Recorder, start: datetime, end: datetime):
+    """start から end の前の分まで、各分の途中（秒はずらす）で dispatch を呼ぶ"""
+    clock = start
+    while clock < end:
+        recorder.clock = clock
+        await dispatcher.dispatch(clock + timedelta(seconds=clock.minute % 7))
+        clock += timedelta(minutes=1)
+
+
+async def test_spring_forward_gap_sends_exactly_once():
+    tenants = [(f"B{time}", time, "Europe/Berlin") for time in ("01:30", "02:00", "02:30", "03:00", "03:30")]
+    tenants += [("NY0230", "02:30", "America/New_York"), ("TKY0800", "08:00", "Asia/Tokyo")]
+    start, end = _utc(2025, 3, 8), _utc(2025, 4, 1)
+    recorder = Recorder()
+    await _run(TenantDispatcher(_registry(start, tenants), recorder), recorder, start, end)
+
+    per_day = recorder.per_day()
+    assert max(per_day.values()) == 1
+    for user_id, _, zone in tenants:
+        days = {target_date for uid, target_date in per_day if uid == user_id}
+        first = start.astimezone(ZoneInfo(zone)).date()
+        last = (end - timedelta(minutes=1)).astimezone(ZoneInfo(zone)).date()
+        expected = {first + timedelta(days=i) for i in range((last - first).days + 1)}
+        # 開始・終了日の通知時刻が範囲外になる送信先は両端の日を除いて比べる
+        assert expected - {first, last} <= days <= expected, user_id
+
+    # 存在しない現地時刻の通知は、切り替わった時点（03:00）に1回だけ送る
+    assert "03/30 03:00" in recorder.local_times("B02:30", "Europe/Berlin")
+    assert "03/30 03:00" in recorder.local_times("B02:00", "Europe/Berlin")
+    assert "03/09 03:00" in recorder.local_times("NY0230", "America/New_York")
+    # 他の日・他の送信先は通知時刻どおり
+    assert "03/30 03:30" in recorder.local_times("B03:30", "Europe/Berlin")
+    assert "03/31 02:30" in recorder.local_times("B02:30", "Europe/Berlin")
+
+
+async def test_fall_back_repeated_hour_sends_once():
+    tenants = [("B0230", "02:30", "Europe/Berlin"), ("B0130", "01:30", "Europe/Berlin")]
+    start, end = _utc(2025, 10, 25, 12), _utc(2025, 10, 27, 12)
+    recorder = Recorder()
+    await _run(TenantDispatcher(_registry(start, tenants), recorder), recorder, start, end)
+
+    assert recorder.local_times("B0230", "Europe/Berlin") == ["10/26 02:30", "10/27 02:30"]
+    assert recorder.local_times("B0130", "Europe/Berlin") == ["10/26 01:30", "10/27 01:30"]
+
+
+async def test_repeated_and_late_calls_in_one_minute_send_once():
+    start = _utc(2025, 6, 15, 7, 59)
+    recorder = Recorder()
+    dispatcher = TenantDispatcher(_registry(start, [("U1", "08:00", "UTC")]), recorder)
+
+    for at in (_utc(2025, 6, 15, 8, 0, 1), _utc(2025, 6, 15, 8, 0, 59), _utc(2025, 6, 15, 8, 0, 30)):
+        recorder.clock = at
+        await dispatcher.dispatch(at)
+    # 呼び出しが数分遅れても、飛ばした分をさかのぼって送る
+    recorder.clock = _utc(2025, 6, 16, 7, 55)
+    await dispatcher.dispatch(recorder.clock)
+    recorder.clock = _utc(2025, 6, 16, 8, 20)
+    await dispatcher.dispatch(recorder.clock)
+
+    assert [(target_date, at.strftime("%H:%M")) for _, target_date, at in recorder.sent] == [
+        (date(2025, 6, 15), "08:00"), (date(2025, 6, 16), "08:20")
+    ]
+
+
+async def test_restart_inside_catch_up_window_sends_exactly_once(tmp_path):
+    state_file = tmp_path / "dispatch_state.json"
+    tenants = [("U0730", "16:30", "Asia/Tokyo"), ("U0800", "17:00", "Asia/Tokyo"), ("U0900", "18:00", "Asia/Tokyo")]
+    recorder = Recorder()
+
+    # 07:58 UTC に停止（16:30 の送信先には送信済み）
+    start = _utc(2025, 6, 15, 6)
+    first = TenantDispatcher(_registry(start, tenants), recorder, state_file=state_file)
+    await _run(first, recorder, start, _utc(2025, 6, 15, 7, 58))
+    assert [uid for uid, _, _ in recorder.sent] == ["U0730"]
+
+    # 08:03 UTC に再起動: 停止中の 08:00 をさかのぼって送り、送信済みの送信先には送らない
+    restart = _utc(2025, 6, 15, 8, 3)
+    second = TenantDispatcher(_registry(restart, tenants), recorder, state_file=state_file)
+    await _run(second, recorder, restart, _utc(2025, 6, 15, 8, 10))
+    assert [uid for uid, _, _ in recorder.sent] == ["U0730", "U0800"]
+    assert recorder.sent[-1][2] == restart
+
+    # 送った直後にもう一度再起動しても二重に送らない
+    third = TenantDispatcher(_registry(restart, tenants), recorder, state_file=state_file)
+    await _run(third, recorder, _utc(2025, 6, 15, 8, 10), _utc(2025, 6, 16, 8, 10))
+
+    per_day = recorder.per_day()
+    assert max(per_day.values()) == 1
+    assert per_day == Counter({
+        ("U0730", date(2025, 6, 15)): 1, ("U0800", date(2025, 6, 15)): 1, ("U0900", date(2025, 6, 15)): 1,
+        ("U0730", date(2025, 6, 16)): 1, ("U0800", date(2025, 6, 16)): 1,
+    })
+
+
+async def test_restart_after_catch_up_window_skips_missed_minutes(tmp_path):
+    state_file = tmp_path / "dispatch_state.json"
+    tenants = [("U0800", "08:00", "UTC"), ("U0930", "09:30", "UTC")]
+    recorder = Recorder()
+
+    start = _utc(2025, 6, 15, 7)
+    first = TenantDispatcher(_registry(start, tenants), recorder, state_file=state_file)
+    await _run(first, recorder, start, _utc(2025, 6, 15, 7, 50))
+
+    # 2時間止まっていた場合は、直前の60分（09:30）だけさかのぼる
+    restart = _utc(2025, 6, 15, 9, 50)
+    second = TenantDispatcher(_registry(restart, tenants), recorder, state_file=state_file)
+    await _run(second, recorder, restart, _utc(2025, 6, 15, 10))
+    assert [uid for uid, _, _ in recorder.sent] == ["U0930"]
+
+
+def test_unreadable_state_is_ignored(tmp_path):
+    state_file = tmp_path / "dispatch_state.json"
+    state_file.write_text("{broken", encoding="utf-8")
+    dispatcher = TenantDispatcher(TenantRegistry(), Recorder(), state_file=state_file)
+    assert dispatcher._last_minute is None